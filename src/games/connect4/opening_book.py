@@ -0,0 +1,288 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from games.connect4.action import Connect4Action
+from games.connect4.search import AlphaBetaSearch
+from games.connect4.solver import Connect4Solver
+from games.connect4.state import Connect4State
+
+
+class OpeningBook:
+    """
+    table of the best column of every Connect4 position up to a number of plies, built offline (see build_book) and
+    read through a memory mapped file, so the processes that use the same book share its pages and opening it costs
+    nothing. The file holds:
+        - a header of 8 little endian int64: magic number, version, rows, columns, connect length, number of plies,
+          search depth (0 if the positions were solved) and number of positions
+        - the keys of the positions, as sorted uint64 (see get_key), followed by their scores (int32, from the point of
+          view of the acting player, see AlphaBetaSearch, or Connect4Solver if the positions were solved) and their
+          best columns (int8)
+    A position and its mirror image (columns in reverse order) are stored once, under the smaller of their two keys.
+    """
+
+    MAGIC = 0x4b4f4f4234433a   # ":C4BOOK"
+    VERSION = 1
+    HEADER_SIZE = 64
+
+    """
+    the book that the players use when no other is given
+    """
+    DEFAULT_PATH = Path(__file__).parent / "data" / "opening_book.bin"
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.__path = Path(path)
+        """
+        the header fields and the arrays of the file, mapped the first time the book is used (None if the file does
+        not exist)
+        """
+        self.__loaded = False
+        self.__board_shape = None
+        self.__num_plies = 0
+        self.__search_depth = 0
+        self.__keys = None
+        self.__scores = None
+        self.__cols = None
+
+    def get_path(self):
+        return self.__path
+
+    """
+    checks if the book can be used, i.e. if its file exists
+    """
+    def is_available(self):
+        self.__load()
+        return self.__keys is not None
+
+    """
+    retrieves the board the book was built for, as (rows, cols, connect length)
+    """
+    def get_board_shape(self):
+        self.__load()
+        return self.__board_shape
+
+    def get_num_plies(self):
+        self.__load()
+        return self.__num_plies
+
+    """
+    retrieves the depth of the searches of the positions (None if they were solved)
+    """
+    def get_search_depth(self):
+        self.__load()
+        return self.__search_depth or None
+
+    def get_num_positions(self):
+        self.__load()
+        return len(self.__keys) if self.__keys is not None else 0
+
+    """
+    looks a position up with a binary search over the keys
+    :return: the best column and its score, or None if the position is not in the book
+    """
+    def lookup(self, state: Connect4State):
+        self.__load()
+        if self.__keys is None or state.is_finished():
+            return None
+        if (state.get_num_rows(), state.get_num_cols(), state.get_connect_length()) != self.__board_shape:
+            return None
+
+        key, mirrored = OpeningBook.get_key(state)
+        index = int(np.searchsorted(self.__keys, np.uint64(key)))
+        if index == len(self.__keys) or int(self.__keys[index]) != key:
+            return None
+
+        col = int(self.__cols[index])
+        if mirrored:
+            col = state.get_num_cols() - 1 - col
+        return col, int(self.__scores[index])
+
+    """
+    computes the key of a position, the same for a position and its mirror image
+    The key of a board is the board of the acting player plus the occupied cells plus the bottom cell of every column:
+    the lowest empty cell of each column is set, and the cells under it are set for the acting player's checkers, so
+    every position has its own key (it needs one bit more per column than the board, like the bitboards of
+    Connect4State).
+    :return: the key, and whether it is the key of the mirror image of the position
+    """
+    @staticmethod
+    def get_key(state: Connect4State):
+        boards = state.get_boards()
+        player = state.get_acting_player()
+        num_cols = state.get_num_cols()
+        col_height = state.get_num_rows() + 1
+        bottoms = sum(1 << (col * col_height) for col in range(num_cols))
+
+        key = boards[player] + (boards[0] | boards[1]) + bottoms
+
+        col_mask = (1 << col_height) - 1
+        mirrored_key = 0
+        for col in range(num_cols):
+            mirrored_key |= ((key >> (col * col_height)) & col_mask) << ((num_cols - 1 - col) * col_height)
+
+        if mirrored_key < key:
+            return mirrored_key, True
+        return key, False
+
+    """
+    checks if the positions of a board have keys of 64 bits
+    """
+    @staticmethod
+    def fits(num_rows: int, num_cols: int) -> bool:
+        return num_cols * (num_rows + 1) <= 64
+
+    """
+    writes a book file
+    :param entries: the (key, score, col) of the positions, in any order
+    """
+    @staticmethod
+    def write(path, board_shape, num_plies, search_depth, entries):
+        entries = sorted(entries)
+        header = np.array([OpeningBook.MAGIC, OpeningBook.VERSION, *board_shape, num_plies, search_depth or 0,
+                           len(entries)], dtype='<i8')
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(header.tobytes())
+            file.write(np.array([key for key, _, _ in entries], dtype='<u8').tobytes())
+            file.write(np.array([score for _, score, _ in entries], dtype='<i4').tobytes())
+            file.write(np.array([col for _, _, col in entries], dtype='<i1').tobytes())
+
+    def __load(self):
+        if self.__loaded:
+            return
+        self.__loaded = True
+        if not self.__path.is_file():
+            return
+
+        header = np.fromfile(self.__path, dtype='<i8', count=OpeningBook.HEADER_SIZE // 8)
+        magic, version, num_rows, num_cols, connect_length, num_plies, search_depth, count = (int(v) for v in header)
+        if magic != OpeningBook.MAGIC or version != OpeningBook.VERSION:
+            raise ValueError(f"{self.__path} is not a Connect4 opening book of version {OpeningBook.VERSION}")
+
+        self.__board_shape = (num_rows, num_cols, connect_length)
+        self.__num_plies = num_plies
+        self.__search_depth = search_depth
+        if count == 0:
+            self.__keys = np.zeros(0, dtype='<u8')
+            self.__scores = np.zeros(0, dtype='<i4')
+            self.__cols = np.zeros(0, dtype='<i1')
+            return
+
+        offset = OpeningBook.HEADER_SIZE
+        self.__keys = np.memmap(self.__path, dtype='<u8', mode='r', offset=offset, shape=(count,))
+        offset += 8 * count
+        self.__scores = np.memmap(self.__path, dtype='<i4', mode='r', offset=offset, shape=(count,))
+        offset += 4 * count
+        self.__cols = np.memmap(self.__path, dtype='<i1', mode='r', offset=offset, shape=(count,))
+
+
+"""
+Lists the positions of a board reached after 0 to num_plies moves (the finished ones excluded), one per key (see
+OpeningBook.get_key)
+:return: the moves that lead to each position, by key
+"""
+def enumerate_positions(num_rows, num_cols, connect_length, num_plies):
+    positions = {}
+    state = Connect4State(num_rows, num_cols, connect_length)
+    moves = []
+
+    def visit():
+        key, _ = OpeningBook.get_key(state)
+        if key in positions:
+            return
+        positions[key] = list(moves)
+        if len(moves) == num_plies:
+            return
+
+        for action in state.get_possible_actions():
+            state.play(action)
+            if not state.is_finished():
+                moves.append(action.get_col())
+                visit()
+                moves.pop()
+            state.undo()
+
+    visit()
+    return positions
+
+
+"""
+Entry point of the workers of build_book: searches a batch of positions to search_depth plies, or solves them with
+Connect4Solver if search_depth is None. Each search starts with an empty transposition table, so that its result does
+not depend on the other positions of the batch (the bounds kept by the solver are exact, so it keeps its table)
+:return: the (key, score, col) of each position, with the column of the position of the key
+"""
+def search_positions(num_rows, num_cols, connect_length, search_depth, batch):
+    search = AlphaBetaSearch()
+    solver = Connect4Solver()
+    entries = []
+    for moves in batch:
+        state = Connect4State(num_rows, num_cols, connect_length)
+        for col in moves:
+            state.play(Connect4Action(col))
+
+        if search_depth is None:
+            col, score = solver.get_best_col(state)
+        else:
+            search.reset()
+            col = search.search(state, search_depth)
+            score = search.get_last_score()
+        key, mirrored = OpeningBook.get_key(state)
+        entries.append((key, score, num_cols - 1 - col if mirrored else col))
+    return entries
+
+
+"""
+Builds an opening book: every position up to num_plies moves is searched to search_depth plies (or solved with
+Connect4Solver, if search_depth is None), in batches spread over worker processes, and the book is written to path.
+Solving is exact but only practical on small boards, or for positions that are close to the end of the game
+"""
+def build_book(path, num_rows=6, num_cols=7, connect_length=4, num_plies=4, search_depth=8, workers=None,
+               batch_size=16):
+    if not OpeningBook.fits(num_rows, num_cols):
+        raise ValueError(f"The positions of a {num_rows}x{num_cols} board do not fit in 64 bits")
+
+    positions = enumerate_positions(num_rows, num_cols, connect_length, num_plies)
+    # the deepest positions are the cheapest, the batches are given to the workers from the most expensive ones
+    sequences = sorted(positions.values(), key=len)
+    batches = [sequences[start:start + batch_size] for start in range(0, len(sequences), batch_size)]
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(search_positions, num_rows, num_cols, connect_length, search_depth, batch)
+                   for batch in batches]
+        for future in futures:
+            entries.extend(future.result())
+
+    OpeningBook.write(path, (num_rows, num_cols, connect_length), num_plies, search_depth, entries)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a Connect4 opening book.')
+    parser.add_argument('--output', type=Path, default=OpeningBook.DEFAULT_PATH,
+                        help='The book file to write (by default, the book used by the players).')
+    parser.add_argument('--num-rows', type=int, default=6, help='The number of rows of the board.')
+    parser.add_argument('--num-cols', type=int, default=7, help='The number of columns of the board.')
+    parser.add_argument('--connect-length', type=int, default=4, help='The number of aligned checkers that win.')
+    parser.add_argument('--num-plies', type=int, default=4, help='The positions up to this number of moves are stored.')
+    parser.add_argument('--search-depth', type=int, default=8,
+                        help='The depth of the search of each position (0 to solve them with Connect4Solver, which '
+                             'is only practical on small boards).')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='The number of worker processes (by default, the number of cores).')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    num_positions = build_book(args.output, args.num_rows, args.num_cols, args.connect_length, args.num_plies,
+                               args.search_depth or None, args.workers)
+    print(f"{num_positions} positions written to {args.output} in {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-from random import choice
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
 from games.connect4.state import Connect4State
@@ -26,7 +25,7 @@ class GreedyConnect4Player(Connect4Player):
                     count += 1
 
             # it swap the column if we exceed the count. if the count of chips is the same, we swap 50% of the times
-            if selected_col is None or count > max_count or (count == max_count and choice([False, True])):
+            if selected_col is None or count > max_count or (count == max_count and self.get_rng().choice([False, True])):
                 selected_col = col
                 max_count = count
 
@@ -1,64 +1,292 @@
+import math
+import time
+from array import array
+
 import numpy as np
 from games.connect4.action import Connect4Action
+from games.connect4.opening_book import OpeningBook
 from games.connect4.player import Connect4Player
 from games.connect4.state import Connect4State
 from games.connect4.result import Connect4Result
+from games.connect4.rollout import BatchRollout
 from games.state import State
-import random
-import time
 
-class MCTSNode:
-    def __init__(self, state: Connect4State, parent=None):
-        self.state = state
-        self.parent = parent
-        self.children = {}
-        self.visits = 0
-        self.wins = 0
-
-    def select_action(self):
-        return max(self.children.keys(), key=lambda action: self.children[action].wins / (self.children[action].visits + 1e-6))
-
-    def expand(self):
-        actions = self.state.get_possible_actions()
-        for action in actions:
-            next_state = self.state.clone()
-            next_state.play(action)
-            self.children[action] = MCTSNode(next_state, parent=self)
-
-    def backpropagate(self, result):
-        self.visits += 1
-        self.wins += result
-        if self.parent:
-            self.parent.backpropagate(result)
 
 class MCTSConnect4Player(Connect4Player):
-    def __init__(self, name, iterations=10):
+    """
+    UCT player: Monte Carlo tree search that selects the children with the UCB1 rule.
+    The tree is stored in preallocated parallel arrays indexed by node (number of visits, total reward and index of
+    the first child) instead of node objects. The children of a node are allocated together, one slot per column,
+    the first time the node is selected, and the states of the nodes are never stored: they are rebuilt by playing
+    the moves from the root. The reward of a node is counted for the player that made the move leading to it, so each
+    level of the tree maximizes the reward of its own player (a win counts 1 and a draw 0.5).
+    The tree is kept between moves: every action (ours and the opponent's) moves the root down to the child of that
+    action, so the simulations made below it are reused.
+    """
+
+    """
+    first child index of the nodes that were not expanded yet
+    """
+    NO_CHILDREN = -1
+
+    """
+    :param opening_book: the opening book file, whose positions are played without searching (None to always search).
+    The default book is only used if it was built (see games.connect4.opening_book)
+    """
+    def __init__(self, name, iterations=10, rollouts=64, exploration=math.sqrt(2), capacity=65536,
+                 opening_book=OpeningBook.DEFAULT_PATH):
         super().__init__(name)
         self.iterations = iterations
+        """
+        number of random games played from each new node
+        """
+        self.rollouts = rollouts
+        """
+        the exploration constant of UCB1
+        """
+        self.exploration = exploration
+        """
+        the batch rollout engine, created for the board of the current game (None if the board is too large for it)
+        """
+        self.__batch_rollout = None
+        self.__board_shape = None
+        """
+        the tree: number of visits, total reward and index of the first child of each node
+        """
+        self.__capacity = capacity
+        self.__visits = array('q', bytes(8 * capacity))
+        self.__values = array('d', bytes(8 * capacity))
+        self.__first_child = array('q', bytes(8 * capacity))
+        self.__num_nodes = 0
+        self.__num_cols = 0
+        """
+        the root of the tree and the bitboards of the state it represents (None if there is no tree)
+        """
+        self.__root = 0
+        self.__root_boards = None
+        self.__opening_book = OpeningBook(opening_book) if opening_book is not None else None
 
     def get_action(self, state: Connect4State):
-        
-        root = MCTSNode(state)
-        for _ in range(self.iterations):
-            node = root
-            while node.children:
-                action = random.choice(list(node.children.keys()))
-                node = node.children[action]
-            node.expand()
-            result = self.simulate(node.state)
-            node.backpropagate(result)
-        
-        return root.select_action()
-
-    def simulate(self, state: Connect4State):
+        if self.__opening_book is not None:
+            entry = self.__opening_book.lookup(state)
+            if entry is not None:
+                return Connect4Action(entry[0])
+
+        visits = self.search(state)
+
+        # the most visited child is the most robust choice
+        legal_cols = state.get_legal_cols()
+        best_col = max((col for col in range(state.get_num_cols()) if legal_cols & (1 << col)),
+                       key=lambda col: visits[col])
+        return Connect4Action(best_col)
+
+    """
+    runs the search from a state
+    :param time_budget: if given, the search runs for this number of seconds instead of a fixed number of iterations
+    :return: the number of visits (i.e. of random games) of each column at the root
+    """
+    def search(self, state: Connect4State, time_budget: float = None):
+        self.__prepare_rollout(state)
+
+        # the tree is only reused if it still matches the state
+        if self.__root_boards != state.get_boards():
+            self.__reset_tree(state)
+        elif self.__num_nodes > self.__capacity // 2:
+            self.__compact_tree()
+
+        # the NumPy generator is seeded from the player's own random stream, so the games stay reproducible
+        np_rng = np.random.default_rng(self.get_rng().getrandbits(64))
+
+        # the iterations play and undo the moves on their own copy of the state
+        search_state = state.clone()
+        if time_budget is None:
+            for _ in range(max(1, self.iterations)):
+                self.__run_iteration(search_state, np_rng)
+        else:
+            deadline = time.perf_counter() + time_budget
+            self.__run_iteration(search_state, np_rng)
+            while time.perf_counter() < deadline:
+                self.__run_iteration(search_state, np_rng)
+
+        first_child = self.__first_child[self.__root]
+        return [self.__visits[first_child + col] for col in range(self.__num_cols)]
+
+    """
+    plays random games from a state, which is not changed
+    :param pos: the player from whose point of view the games are counted
+    :return: the number of games won, drawn and lost by the player
+    """
+    def simulate(self, state: Connect4State, np_rng, pos: int):
+        self.__prepare_rollout(state)
+        if self.__batch_rollout is not None:
+            return self.__batch_rollout.run(state, self.rollouts, np_rng, pos)
+
+        # boards larger than 64 bits are played one game at a time
+        counts = {Connect4Result.WIN.value: 0, Connect4Result.DRAW.value: 0, Connect4Result.LOOSE.value: 0}
+        rollout_state = state.clone()
+        for _ in range(self.rollouts):
+            num_moves = 0
+            while not rollout_state.is_finished():
+                rollout_state.play(self.get_rng().choice(rollout_state.get_possible_actions()))
+                num_moves += 1
+            counts[rollout_state.get_result(pos)] += 1
+
+            for _ in range(num_moves):
+                rollout_state.undo()
+        return counts[Connect4Result.WIN.value], counts[Connect4Result.DRAW.value], counts[Connect4Result.LOOSE.value]
+
+    """
+    creates the batch rollout engine for the board of a state, unless it was created for the same board
+    """
+    def __prepare_rollout(self, state: Connect4State):
+        board_shape = (state.get_num_rows(), state.get_num_cols(), state.get_connect_length())
+        if board_shape != self.__board_shape:
+            self.__board_shape = board_shape
+            self.__batch_rollout = BatchRollout(*board_shape) if BatchRollout.fits(*board_shape[:2]) else None
+            self.__root_boards = None
+
+    """
+    selection, expansion, simulation and backpropagation, from the root
+    :param state: the state of the root, which is changed during the iteration and restored at the end
+    """
+    def __run_iteration(self, state: Connect4State, np_rng):
+        node = self.__root
+        path = [node]
+
+        # selection: descend until a node that was never visited (or the end of the game)
         while not state.is_finished():
-            action = random.choice(state.get_possible_actions())
-            state.play(action)
-        result = state.get_result(self.get_current_pos())
-        return 1 if result == Connect4Result.WIN.value else 0
+            if self.__first_child[node] == MCTSConnect4Player.NO_CHILDREN:
+                self.__expand(node)
+
+            col = MCTSConnect4Player.select_col(self.__visits, self.__values, self.__first_child[node],
+                                                self.__visits[node], state.get_legal_cols(), self.exploration)
+            state.play(Connect4Action(col))
+            node = self.__first_child[node] + col
+            path.append(node)
+
+            if self.__visits[node] == 0:
+                break
+
+        # simulation, counted for the player that moved into the last node
+        wins, draws, losses = self.simulate(state, np_rng, 1 - state.get_acting_player())
+
+        for _ in range(len(path) - 1):
+            state.undo()
+
+        # backpropagation: the point of view changes at every level
+        reward = wins + draws / 2
+        opponent_reward = losses + draws / 2
+        num_games = wins + draws + losses
+        for node in reversed(path):
+            self.__visits[node] += num_games
+            self.__values[node] += reward
+            reward, opponent_reward = opponent_reward, reward
+
+    """
+    selects the column of a node with UCB1, the columns that were never visited first
+    the tree arrays are given, so that trees stored elsewhere (e.g. in shared memory) can use the same rule
+    :param first_child: the index of the first child of the node
+    :param parent_visits: the number of visits of the node
+    """
+    @staticmethod
+    def select_col(visits, values, first_child, parent_visits, legal_cols, exploration):
+        log_visits = math.log(parent_visits) if parent_visits > 0 else 0
+
+        best_col = None
+        best_score = -math.inf
+        col = 0
+        while legal_cols >> col:
+            if legal_cols & (1 << col):
+                child_visits = visits[first_child + col]
+                if child_visits == 0:
+                    return col
+
+                score = values[first_child + col] / child_visits + exploration * math.sqrt(log_visits / child_visits)
+                if score > best_score:
+                    best_col = col
+                    best_score = score
+            col += 1
+        return best_col
+
+    """
+    allocates the children of a node, one per column
+    """
+    def __expand(self, node):
+        first_child = self.__allocate(self.__num_cols)
+        self.__first_child[node] = first_child
+        for child in range(first_child, first_child + self.__num_cols):
+            self.__visits[child] = 0
+            self.__values[child] = 0
+            self.__first_child[child] = MCTSConnect4Player.NO_CHILDREN
+
+    """
+    reserves consecutive nodes at the end of the arrays, which grow when they are full
+    """
+    def __allocate(self, num_nodes):
+        first_node = self.__num_nodes
+        self.__num_nodes += num_nodes
+        if self.__num_nodes > self.__capacity:
+            self.__visits.extend(array('q', bytes(8 * self.__capacity)))
+            self.__values.extend(array('d', bytes(8 * self.__capacity)))
+            self.__first_child.extend(array('q', bytes(8 * self.__capacity)))
+            self.__capacity *= 2
+        return first_node
+
+    """
+    starts a new tree whose root is the given state
+    """
+    def __reset_tree(self, state: Connect4State):
+        self.__num_cols = state.get_num_cols()
+        self.__num_nodes = 0
+        self.__root = self.__allocate(1)
+        self.__visits[self.__root] = 0
+        self.__values[self.__root] = 0
+        self.__first_child[self.__root] = MCTSConnect4Player.NO_CHILDREN
+        self.__root_boards = state.get_boards()
+
+    """
+    moves the subtree of the root to the beginning of the arrays, dropping the nodes that can't be reached anymore
+    """
+    def __compact_tree(self):
+        visits = array('q', [self.__visits[self.__root]])
+        values = array('d', [self.__values[self.__root]])
+        first_child = array('q', [MCTSConnect4Player.NO_CHILDREN])
+
+        # the old and new indexes of the nodes whose children still have to be copied, in breadth first order
+        queue = [(self.__root, 0)]
+        for old_node, new_node in queue:
+            old_first_child = self.__first_child[old_node]
+            if old_first_child == MCTSConnect4Player.NO_CHILDREN:
+                continue
+
+            first_child[new_node] = len(visits)
+            for old_child in range(old_first_child, old_first_child + self.__num_cols):
+                queue.append((old_child, len(visits)))
+                visits.append(self.__visits[old_child])
+                values.append(self.__values[old_child])
+                first_child.append(MCTSConnect4Player.NO_CHILDREN)
+
+        self.__num_nodes = len(visits)
+        self.__root = 0
+        self.__visits[:self.__num_nodes] = visits
+        self.__values[:self.__num_nodes] = values
+        self.__first_child[:self.__num_nodes] = first_child
+
+    def event_new_game(self):
+        # trees are never shared between games, so that each game only depends on its own random stream
+        self.__root_boards = None
 
     def event_action(self, pos: int, action, new_state: State):
-        pass
+        if self.__root_boards is None:
+            return
+
+        # the root moves down to the child of the action, if it was expanded
+        first_child = self.__first_child[self.__root]
+        if first_child == MCTSConnect4Player.NO_CHILDREN or new_state.is_finished():
+            self.__root_boards = None
+        else:
+            self.__root = first_child + action.get_col()
+            self.__root_boards = new_state.get_boards()
 
     def event_end_game(self, final_state: State):
         pass
@@ -1,79 +1,55 @@
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
+from games.connect4.opening_book import OpeningBook
+from games.connect4.search import AlphaBetaSearch
 from games.connect4.state import Connect4State
-from games.connect4.result import Connect4Result
 from games.state import State
-from math import inf
+
 
 class MinimaxConnect4Player(Connect4Player):
-    def __init__(self, name):
+    """
+    alpha-beta player (see AlphaBetaSearch). The transposition table is kept between the moves of a game.
+    With a time budget, the moves depend on the speed of the machine, so seeded simulations can't be reproduced
+    """
+
+    """
+    :param max_depth: the maximum depth of the search, in plies
+    :param time_budget: if given, the maximum number of seconds of each move
+    :param opening_book: the opening book file, whose positions are played without searching (None to always search).
+    The default book is only used if it was built (see games.connect4.opening_book)
+    """
+    def __init__(self, name, max_depth=6, time_budget=None, opening_book=OpeningBook.DEFAULT_PATH):
         super().__init__(name)
-        self.states_evaluated = {}
-        self.iteration_count = 0
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.__search = AlphaBetaSearch()
+        self.__opening_book = OpeningBook(opening_book) if opening_book is not None else None
+        self.__num_book_moves = 0
 
     def get_action(self, state: Connect4State):
-        self.states_evaluated.clear()  # Limpar a tabela de transposição a cada novo movimento
-        self.iteration_count = 0
-        best_action, _ = self.minimax(state, depth=2, maximizing_player=True, alpha=-inf, beta=inf)
-        return best_action
+        if self.__opening_book is not None:
+            entry = self.__opening_book.lookup(state)
+            if entry is not None:
+                self.__num_book_moves += 1
+                return Connect4Action(entry[0])
 
-    def minimax(self, state: Connect4State, depth, maximizing_player, alpha, beta):
-        self.iteration_count += 1
-        if depth == 0 or state.is_finished():
-            return None, self.evaluate_state(state) or 0  # Retorna 0 se a avaliação for None
+        return Connect4Action(self.__search.search(state, self.max_depth, self.time_budget))
 
-        if state in self.states_evaluated:  # Verificar se o estado já foi avaliado
-            return None, self.states_evaluated[state]
+    def print_stats(self):
+        print(f"Player {self.get_name()} | Nodes: {self.__search.get_num_nodes()} | "
+              f"Nodes per second: {self.__search.get_nodes_per_second():.0f} | "
+              f"TT hit rate: {self.__search.get_table_hit_rate():.1%} | Book moves: {self.__num_book_moves}")
 
-        if maximizing_player:
-            max_eval = -inf
-            best_action = None
-            actions = self.order_actions(state.get_possible_actions())  # Ordenar as ações
-            for action in actions:
-                next_state = self.get_next_state(state, action)
-                _, eval_value = self.minimax(next_state, depth-1, False, alpha, beta)
-                if eval_value is not None and eval_value > max_eval:  # Verifica se a avaliação é None
-                    max_eval = eval_value
-                    best_action = action
-                alpha = max(alpha, max_eval)
-                if beta <= alpha:
-                    break
-            self.states_evaluated[state] = max_eval  # Salvar o valor avaliado na tabela de transposição
-            return best_action, max_eval
-        else:
-            min_eval = inf
-            best_action = None
-            actions = self.order_actions(state.get_possible_actions())  # Ordenar as ações
-            for action in actions:
-                next_state = self.get_next_state(state, action)
-                _, eval_value = self.minimax(next_state, depth-1, True, alpha, beta)
-                if eval_value is not None and eval_value < min_eval:  # Verifica se a avaliação é None
-                    min_eval = eval_value
-                    best_action = action
-                beta = min(beta, min_eval)
-                if beta <= alpha:
-                    break
-            self.states_evaluated[state] = min_eval  # Salvar o valor avaliado na tabela de transposição
-            return best_action, min_eval
-        
-    def get_next_state(self, state, action):
-        next_state = state.clone()
-        next_state.play(action)
-        return next_state
+    def get_stats(self):
+        return {**self.__search.get_stats(), "book_moves": self.__num_book_moves}
 
-    def evaluate_state(self, state):
-        if state.is_finished():
-            result = state.get_result(self.get_current_pos())
-            if result == Connect4Result.WIN.value:
-                return 100
-            elif result == Connect4Result.LOOSE.value:
-                return -100
-            else:
-                return 0
+    def merge_stats(self, stats):
+        self.__search.merge_stats(stats)
+        self.__num_book_moves += stats["book_moves"]
 
-    def order_actions(self, actions):
-        # Ordenar as ações de acordo com alguma heurística (por exemplo, preferir o centro)
-        return sorted(actions, key=lambda action: abs(action.get_col() - 3))
+    def event_new_game(self):
+        # every game starts with an empty table, so that it does not depend on the previous games
+        self.__search.reset()
 
     def event_action(self, pos: int, action, new_state: State):
         # ignore
@@ -0,0 +1,270 @@
+import math
+import os
+import random
+import time
+from multiprocessing import Lock, Pool, RawArray
+
+import numpy as np
+from games.connect4.action import Connect4Action
+from games.connect4.opening_book import OpeningBook
+from games.connect4.player import Connect4Player
+from games.connect4.players.mcts import MCTSConnect4Player
+from games.connect4.state import Connect4State
+from games.state import State
+
+"""
+The worker pools (with their shared tree in tree mode), shared by all the parallel players of the process, by mode,
+number of workers and capacity. The players of a game never search at the same time, so they can share them.
+The workers are daemonic processes, so they are terminated when the process exits (e.g. a tournament worker process)
+"""
+POOLS = {}
+
+"""
+The shared tree of a tree parallel worker process, set when the process starts (see init_tree_worker)
+"""
+shared_tree = None
+
+
+class ParallelMCTSConnect4Player(Connect4Player):
+    """
+    MCTS player (see MCTSConnect4Player) that searches with several worker processes. Two modes are available:
+        - root: each worker builds its own tree from the current state, and the visits of the root columns of all the
+          trees are added up. With a budget in playouts, the moves do not depend on the timing of the workers
+        - tree: all the workers build the same tree, stored in shared memory. The tree is only locked to select and
+          to backpropagate, not during the random games. A virtual loss (the games that are about to be played are
+          counted as lost in advance) keeps the workers from exploring the same path at the same time
+    The search stops after a number of playouts (random games) or after a time budget. The number of playouts per
+    second is printed after each matchup (see print_stats), so it can be compared between numbers of workers.
+    """
+
+    """
+    :param mode: "root" or "tree"
+    :param workers: the number of worker processes (by default, the number of cores)
+    :param playouts: the number of random games of each move, used if there is no time budget
+    :param time_budget: if given, the number of seconds of each move
+    :param rollouts: the number of random games played from each new node
+    :param capacity: the number of nodes of the shared tree (tree mode), which is never resized
+    :param opening_book: the opening book file, whose positions are played without searching (None to always search)
+    """
+    def __init__(self, name, mode="root", workers=None, playouts=2560, time_budget=None, rollouts=64,
+                 exploration=math.sqrt(2), capacity=262144, opening_book=OpeningBook.DEFAULT_PATH):
+        super().__init__(name)
+        if mode not in ("root", "tree"):
+            raise ValueError(f"Unknown parallel mode '{mode}'")
+
+        self.mode = mode
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.rollouts = rollouts
+        self.exploration = exploration
+        self.capacity = capacity
+        self.__opening_book = OpeningBook(opening_book) if opening_book is not None else None
+        """
+        totals of all the searches, to report the number of playouts per second
+        """
+        self.__num_playouts = 0
+        self.__search_time = 0.0
+
+    def get_action(self, state: Connect4State):
+        if self.__opening_book is not None:
+            entry = self.__opening_book.lookup(state)
+            if entry is not None:
+                return Connect4Action(entry[0])
+
+        start_time = time.perf_counter()
+
+        # each worker has its own random stream, derived from the player's one
+        seeds = [self.get_rng().getrandbits(64) for _ in range(self.workers)]
+        root_state = state.clone()
+        if self.mode == "root":
+            visits = self.__search_root_parallel(root_state, seeds)
+        else:
+            visits = self.__search_tree_parallel(root_state, seeds)
+
+        self.__num_playouts += sum(visits)
+        self.__search_time += time.perf_counter() - start_time
+
+        legal_cols = state.get_legal_cols()
+        best_col = max((col for col in range(state.get_num_cols()) if legal_cols & (1 << col)),
+                       key=lambda col: visits[col])
+        return Connect4Action(best_col)
+
+    def __search_root_parallel(self, state: Connect4State, seeds):
+        pool, _ = get_pool("root", self.workers)
+        iterations = self.__get_iterations_per_worker()
+        results = [pool.apply_async(run_root_worker, (state, seed, iterations, self.rollouts, self.exploration,
+                                                      self.time_budget))
+                   for seed in seeds]
+
+        visits = [0] * state.get_num_cols()
+        for result in results:
+            for col, col_visits in enumerate(result.get()):
+                visits[col] += col_visits
+        return visits
+
+    def __search_tree_parallel(self, state: Connect4State, seeds):
+        pool, tree = get_pool("tree", self.workers, self.capacity)
+        reset_tree(tree)
+
+        iterations = self.__get_iterations_per_worker()
+        results = [pool.apply_async(run_tree_worker, (state, seed, iterations, self.rollouts, self.exploration,
+                                                      self.time_budget))
+                   for seed in seeds]
+        for result in results:
+            result.get()
+
+        visits, _, first_child, _, _ = tree
+        return [visits[first_child[0] + col] for col in range(state.get_num_cols())]
+
+    """
+    the number of iterations of each worker, so that the playouts of the move are split between the workers
+    """
+    def __get_iterations_per_worker(self):
+        return max(1, math.ceil(self.playouts / (self.workers * self.rollouts)))
+
+    """
+    retrieves the number of random games played per second, over all the moves
+    """
+    def get_playouts_per_second(self):
+        return self.__num_playouts / self.__search_time if self.__search_time > 0 else 0.0
+
+    def print_stats(self):
+        print(f"Player {self.get_name()} | {self.mode} parallel MCTS with {self.workers} workers | "
+              f"Playouts: {self.__num_playouts} | Playouts per second: {self.get_playouts_per_second():.0f}")
+
+    def get_stats(self):
+        return {"playouts": self.__num_playouts, "search_time": self.__search_time}
+
+    def merge_stats(self, stats):
+        self.__num_playouts += stats["playouts"]
+        self.__search_time += stats["search_time"]
+
+    def event_action(self, pos: int, action, new_state: State):
+        pass
+
+    def event_end_game(self, final_state: State):
+        pass
+
+
+class RootParallelMCTSConnect4Player(ParallelMCTSConnect4Player):
+
+    def __init__(self, name):
+        super().__init__(name, mode="root")
+
+
+class TreeParallelMCTSConnect4Player(ParallelMCTSConnect4Player):
+
+    def __init__(self, name):
+        super().__init__(name, mode="tree")
+
+
+"""
+Retrieves the worker pool of a mode and its shared tree (None in root mode), which are created the first time.
+The shared tree is given to the workers when they start
+"""
+def get_pool(mode, workers, capacity=None):
+    key = (mode, workers, capacity)
+    if key not in POOLS:
+        if mode == "tree":
+            tree = create_tree(capacity)
+            POOLS[key] = Pool(workers, initializer=init_tree_worker, initargs=(tree,)), tree
+        else:
+            POOLS[key] = Pool(workers), None
+    return POOLS[key]
+
+
+"""
+Entry point of the root parallel workers: searches with an independent tree
+:return: the number of visits of each column at the root
+"""
+def run_root_worker(state: Connect4State, seed, iterations, rollouts, exploration, time_budget):
+    player = MCTSConnect4Player("root worker", iterations, rollouts, exploration)
+    player.set_rng(random.Random(seed))
+    return player.search(state, time_budget)
+
+
+"""
+Creates a tree in shared memory: number of visits, total reward and first child of each node (see
+MCTSConnect4Player), the number of allocated nodes and the lock of the tree
+"""
+def create_tree(capacity):
+    return RawArray('q', capacity), RawArray('d', capacity), RawArray('q', capacity), RawArray('q', 1), Lock()
+
+
+"""
+Empties a shared tree, leaving only its root
+"""
+def reset_tree(tree):
+    visits, values, first_child, num_nodes, lock = tree
+    with lock:
+        visits[0] = 0
+        values[0] = 0
+        first_child[0] = MCTSConnect4Player.NO_CHILDREN
+        num_nodes[0] = 1
+
+
+def init_tree_worker(tree):
+    global shared_tree
+    shared_tree = tree
+
+
+"""
+Entry point of the tree parallel workers: runs iterations on the shared tree
+"""
+def run_tree_worker(state: Connect4State, seed, iterations, rollouts, exploration, time_budget):
+    visits, values, first_child, num_nodes, lock = shared_tree
+    num_cols = state.get_num_cols()
+
+    # the random games are played by a single threaded player, on its own random stream
+    player = MCTSConnect4Player("tree worker", rollouts=rollouts)
+    player.set_rng(random.Random(seed))
+    np_rng = np.random.default_rng(player.get_rng().getrandbits(64))
+
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    iteration = 0
+    while (iteration < iterations) if deadline is None else (iteration == 0 or time.perf_counter() < deadline):
+        iteration += 1
+        node = 0
+        path = [node]
+
+        # selection, with a virtual loss: the visits of the games about to be played are counted right away
+        with lock:
+            visits[node] += rollouts
+            while not state.is_finished():
+                if first_child[node] == MCTSConnect4Player.NO_CHILDREN:
+                    # a full tree is not expanded anymore, the games are played from the node itself
+                    if num_nodes[0] + num_cols > len(visits):
+                        break
+                    first_child[node] = num_nodes[0]
+                    for child in range(num_nodes[0], num_nodes[0] + num_cols):
+                        visits[child] = 0
+                        values[child] = 0
+                        first_child[child] = MCTSConnect4Player.NO_CHILDREN
+                    num_nodes[0] += num_cols
+
+                col = MCTSConnect4Player.select_col(visits, values, first_child[node], visits[node],
+                                                    state.get_legal_cols(), exploration)
+                state.play(Connect4Action(col))
+                node = first_child[node] + col
+                path.append(node)
+
+                new_node = visits[node] == 0
+                visits[node] += rollouts
+                if new_node:
+                    break
+
+        # simulation, without the lock
+        wins, draws, losses = player.simulate(state, np_rng, 1 - state.get_acting_player())
+
+        # the state is the worker's own copy, the moves of the iteration are undone
+        for _ in range(len(path) - 1):
+            state.undo()
+
+        # backpropagation: the visits were already counted, only the rewards are added
+        reward = wins + draws / 2
+        opponent_reward = losses + draws / 2
+        with lock:
+            for node in reversed(path):
+                values[node] += reward
+                reward, opponent_reward = opponent_reward, reward
@@ -1,5 +1,3 @@
-from random import randint, choice
-
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
 from games.connect4.state import Connect4State
@@ -12,7 +10,7 @@ class RandomConnect4Player(Connect4Player):
         super().__init__(name)
 
     def get_action(self, state: Connect4State):
-        return choice(state.get_possible_actions())
+        return self.get_rng().choice(state.get_possible_actions())
 
     def event_action(self, pos: int, action, new_state: State):
         # ignore
@@ -0,0 +1,72 @@
+from games.connect4.action import Connect4Action
+from games.connect4.opening_book import OpeningBook
+from games.connect4.player import Connect4Player
+from games.connect4.search import AlphaBetaSearch
+from games.connect4.solver import Connect4Solver
+from games.connect4.state import Connect4State
+from games.state import State
+
+
+class SolverConnect4Player(Connect4Player):
+    """
+    perfect player (see Connect4Solver) once the board has few enough empty cells to be solved quickly. Before that,
+    it plays the moves of the opening book, or searches with AlphaBetaSearch. On the boards that do not fit in 64 bits,
+    it always searches.
+    """
+
+    """
+    :param solve_cells: the positions with at most this number of empty cells are solved
+    :param max_depth: the depth of the search of the positions that are not solved
+    :param opening_book: the opening book file, whose positions are played without searching (None to always search).
+    The default book is only used if it was built (see games.connect4.opening_book)
+    """
+    def __init__(self, name, solve_cells=24, max_depth=6, opening_book=OpeningBook.DEFAULT_PATH):
+        super().__init__(name)
+        self.solve_cells = solve_cells
+        self.max_depth = max_depth
+        """
+        the positions solved by the solver are exact, so its table is kept for the whole simulation
+        """
+        self.__solver = Connect4Solver()
+        self.__search = AlphaBetaSearch()
+        self.__opening_book = OpeningBook(opening_book) if opening_book is not None else None
+        self.__num_solved_moves = 0
+
+    def get_action(self, state: Connect4State):
+        if self.__opening_book is not None:
+            entry = self.__opening_book.lookup(state)
+            if entry is not None:
+                return Connect4Action(entry[0])
+
+        num_rows = state.get_num_rows()
+        num_cols = state.get_num_cols()
+        boards = state.get_boards()
+        num_empty_cells = num_rows * num_cols - (boards[0] | boards[1]).bit_count()
+        if num_empty_cells <= self.solve_cells and Connect4Solver.fits(num_rows, num_cols):
+            self.__num_solved_moves += 1
+            col, _ = self.__solver.get_best_col(state)
+            return Connect4Action(col)
+
+        return Connect4Action(self.__search.search(state, self.max_depth))
+
+    def print_stats(self):
+        print(f"Player {self.get_name()} | Solved moves: {self.__num_solved_moves} | "
+              f"Solver nodes per second: {self.__solver.get_nodes_per_second():.0f}")
+
+    def get_stats(self):
+        return {**self.__solver.get_stats(), "solved_moves": self.__num_solved_moves}
+
+    def merge_stats(self, stats):
+        self.__solver.merge_stats(stats)
+        self.__num_solved_moves += stats["solved_moves"]
+
+    def event_new_game(self):
+        self.__search.reset()
+
+    def event_action(self, pos: int, action, new_state: State):
+        # ignore
+        pass
+
+    def event_end_game(self, final_state: State):
+        # ignore
+        pass
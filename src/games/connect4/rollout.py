@@ -0,0 +1,140 @@
+import numpy as np
+
+from games.connect4.state import Connect4State
+
+
+class BatchRollout:
+    """
+    plays many random games at once from the same position, with NumPy.
+    Each game is stored as the two bitboards of Connect4State (see its documentation for the layout) in uint64
+    integers, so the board must fit in 64 bits (see fits). All the games start from the same position, so on every ply
+    the same player moves in every unfinished game:
+        - the column of each game is sampled uniformly among its legal columns
+        - the winners are found with shifts over the whole boards
+        - the finished games are removed from the arrays, so the cost of a ply only depends on the unfinished games
+    """
+
+    """
+    :param num_rows: the number of rows of the board
+    :param num_cols: the number of columns of the board
+    :param connect_length: the number of aligned checkers needed to win
+    """
+    def __init__(self, num_rows: int = 6, num_cols: int = 7, connect_length: int = 4):
+        if not BatchRollout.fits(num_rows, num_cols):
+            raise ValueError(f"A {num_rows}x{num_cols} board does not fit in 64 bits")
+
+        self.__num_rows = num_rows
+        self.__num_cols = num_cols
+        self.__connect_length = connect_length
+        """
+        the number of bits of each column (the rows plus the extra row)
+        """
+        self.__col_height = num_rows + 1
+        """
+        the index of the bottom bit of each column, and the index of its extra bit (a column is full when its next
+        bit index reaches it)
+        """
+        self.__bottoms = np.arange(num_cols, dtype=np.int64) * self.__col_height
+        self.__tops = self.__bottoms + num_rows
+        """
+        the shifts of each direction (vertical, horizontal and both diagonals), for each checker of a line but the
+        first one
+        """
+        self.__line_shifts = [
+            [np.uint64(direction * step) for step in range(1, connect_length)]
+            for direction in (1, self.__col_height, self.__col_height - 1, self.__col_height + 1)
+        ]
+
+    """
+    checks if a board can be used by a batch rollout, i.e. if it fits in 64 bits
+    """
+    @staticmethod
+    def fits(num_rows: int, num_cols: int) -> bool:
+        return num_cols * (num_rows + 1) <= 64
+
+    """
+    creates a batch rollout for the board of a state
+    """
+    @staticmethod
+    def from_state(state: Connect4State):
+        return BatchRollout(state.get_num_rows(), state.get_num_cols(), state.get_connect_length())
+
+    """
+    plays random games until the end from a position
+    :param state: the start position, which is not changed
+    :param num_rollouts: the number of games to play
+    :param rng: the NumPy random generator used to sample the moves
+    :param pos: the player from whose point of view the games are counted (by default, the acting player)
+    :return: the number of games won, drawn and lost by the player
+    """
+    def run(self, state: Connect4State, num_rollouts: int, rng: np.random.Generator, pos: int = None):
+        if pos is None:
+            pos = state.get_acting_player()
+
+        if state.is_finished():
+            result = state.get_result(pos)
+            return (num_rollouts if result > 0 else 0,
+                    num_rollouts if result == 0 else 0,
+                    num_rollouts if result < 0 else 0)
+
+        boards = [np.full(num_rollouts, board, dtype=np.uint64) for board in state.get_boards()]
+        heights = np.tile(self.__get_heights(state), (num_rollouts, 1))
+        num_moves = int(sum(heights[0] - self.__bottoms))
+
+        player = state.get_acting_player()
+        wins = 0
+        losses = 0
+        remaining = num_rollouts
+        while num_moves < self.__num_rows * self.__num_cols:
+            games = np.arange(remaining)
+
+            # the largest random key among the legal columns gives a uniformly sampled column
+            keys = rng.random((remaining, self.__num_cols))
+            keys[heights >= self.__tops] = -1
+            cols = keys.argmax(axis=1)
+
+            bits = heights[games, cols]
+            heights[games, cols] += 1
+            boards[player] |= np.left_shift(np.uint64(1), bits.astype(np.uint64))
+            num_moves += 1
+
+            won = self.__find_lines(boards[player])
+            num_won = int(np.count_nonzero(won))
+            if num_won:
+                if player == pos:
+                    wins += num_won
+                else:
+                    losses += num_won
+
+                remaining -= num_won
+                if remaining == 0:
+                    break
+                playing = ~won
+                boards = [board[playing] for board in boards]
+                heights = heights[playing]
+
+            player = 1 - player
+
+        # the games that are still playing have a full board
+        return wins, num_rollouts - wins - losses, losses
+
+    """
+    retrieves, for each column, the index of the bit where its next checker will be dropped
+    """
+    def __get_heights(self, state: Connect4State):
+        occupied = state.get_boards()[0] | state.get_boards()[1]
+        column_mask = (1 << self.__num_rows) - 1
+        return np.array([bottom + bin((occupied >> int(bottom)) & column_mask).count("1") for bottom in self.__bottoms],
+                        dtype=np.int64)
+
+    """
+    checks which boards have connect_length aligned checkers
+    """
+    def __find_lines(self, boards):
+        found = np.zeros(len(boards), dtype=bool)
+        for shifts in self.__line_shifts:
+            line = boards.copy()
+            for shift in shifts:
+                line &= boards >> shift
+            found |= line != 0
+        return found
@@ -0,0 +1,337 @@
+import time
+from array import array
+
+from games.connect4.action import Connect4Action
+from games.connect4.state import Connect4State
+
+
+class SearchTimeout(Exception):
+    """
+    raised inside the search when the time budget of the move runs out
+    """
+    pass
+
+
+class TranspositionTable:
+    """
+    bounded transposition table, indexed by the low bits of the Zobrist keys of the states (see Connect4State).
+    Each slot keeps a single entry (full key, depth, score, bound, best column and generation) in parallel arrays.
+    A new entry replaces the one of its slot if it is for the same position, if it was searched at least as deep, or
+    if the entry of the slot comes from an older search (every move is a new generation)
+    """
+
+    """
+    the types of bounds of the scores
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    """
+    :param size_bits: the table has 2 ** size_bits slots
+    """
+    def __init__(self, size_bits: int = 20):
+        size = 1 << size_bits
+        self.__mask = size - 1
+        self.__keys = array('Q', bytes(8 * size))
+        self.__depths = array('h', bytes(2 * size))
+        self.__scores = array('i', bytes(4 * size))
+        self.__bounds = array('b', bytes(size))
+        self.__moves = array('h', bytes(2 * size))
+        """
+        the generation of each slot, 0 for the empty slots
+        """
+        self.__generations = array('I', bytes(4 * size))
+
+    """
+    retrieves the entry of a position, as (depth, score, bound, best column), or None
+    """
+    def probe(self, key: int):
+        slot = key & self.__mask
+        if self.__generations[slot] == 0 or self.__keys[slot] != key:
+            return None
+        return self.__depths[slot], self.__scores[slot], self.__bounds[slot], self.__moves[slot]
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int, generation: int):
+        slot = key & self.__mask
+        if self.__generations[slot] == generation and self.__keys[slot] != key and self.__depths[slot] > depth:
+            return
+
+        self.__keys[slot] = key
+        self.__depths[slot] = depth
+        self.__scores[slot] = score
+        self.__bounds[slot] = bound
+        self.__moves[slot] = move
+        self.__generations[slot] = generation
+
+    def clear(self):
+        self.__generations = array('I', bytes(4 * len(self.__generations)))
+
+
+class AlphaBetaSearch:
+    """
+    negamax search with alpha-beta pruning and iterative deepening, for Connect4.
+        - the positions are stored in a transposition table that is kept between the moves of a game
+        - the moves are ordered by: best move from the transposition table, killer moves (moves that caused a cutoff
+          at the same depth) and history scores (how often, and how deep, a column caused a cutoff)
+        - each iteration searches one more ply, until the maximum depth or until the time budget runs out, in which
+          case the best move of the last complete iteration is played
+    The leaves are scored by the open windows of each player (see Connect4State.get_heuristic_score), which the state
+    updates on every move.
+    The scores are from the point of view of the acting player.
+    """
+
+    """
+    score of a win at the root, wins found deeper score one point less per ply
+    """
+    WIN_SCORE = 1000000
+
+    """
+    scores over this are wins (or losses) at a known distance
+    """
+    WIN_THRESHOLD = WIN_SCORE - 1000
+
+    """
+    number of nodes between two checks of the time budget
+    """
+    TIME_CHECK_INTERVAL = 1024
+
+    """
+    :param table_size_bits: the transposition table has 2 ** table_size_bits slots
+    """
+    def __init__(self, table_size_bits: int = 20):
+        self.__table = TranspositionTable(table_size_bits)
+        self.__generation = 0
+        """
+        the board the tables below were built for, as (rows, cols, connect length)
+        """
+        self.__board_shape = None
+        """
+        the history score of each player and column, and the two killer moves of each ply
+        """
+        self.__history = []
+        self.__killers = []
+        """
+        the deadline of the current search (None if there is no time budget)
+        """
+        self.__deadline = None
+        """
+        totals of all the searches
+        """
+        self.__num_nodes = 0
+        self.__num_probes = 0
+        self.__num_hits = 0
+        self.__search_time = 0.0
+        """
+        depth and score of the last complete iteration
+        """
+        self.__last_depth = 0
+        self.__last_score = 0
+
+    """
+    forgets everything that was learned by the previous searches (e.g. when a new game starts)
+    """
+    def reset(self):
+        self.__table.clear()
+        self.__generation = 0
+        self.__board_shape = None
+
+    """
+    searches the best column to play
+    :param max_depth: the maximum depth, in plies (by default, until the board is full)
+    :param time_budget: the maximum number of seconds of the search, which always completes the first iteration
+    :return: the best column
+    """
+    def search(self, state: Connect4State, max_depth: int = None, time_budget: float = None):
+        self.__prepare(state)
+        start_time = time.perf_counter()
+        self.__generation += 1
+        self.__killers = [[-1, -1] for _ in range(state.get_num_rows() * state.get_num_cols() + 1)]
+        # the history of the previous moves is still useful, but less than the new one
+        self.__history = [[score // 2 for score in scores] for scores in self.__history]
+
+        if max_depth is None:
+            max_depth = state.get_num_rows() * state.get_num_cols()
+
+        # the search plays and undoes the columns on its own copy of the state
+        state = state.clone()
+
+        best_col = None
+        try:
+            for depth in range(1, max_depth + 1):
+                # the first iteration is never interrupted, so that there is always a move to play
+                self.__deadline = start_time + time_budget if time_budget is not None and depth > 1 else None
+                score = self.__negamax(state, depth, -AlphaBetaSearch.WIN_SCORE - 1, AlphaBetaSearch.WIN_SCORE + 1, 0)
+                best_col = self.__table.probe(state.get_zobrist_key())[3]
+                self.__last_depth = depth
+                self.__last_score = score
+
+                # a forced result was found, searching deeper won't change it
+                if abs(score) > AlphaBetaSearch.WIN_THRESHOLD:
+                    break
+        except SearchTimeout:
+            pass
+
+        self.__search_time += time.perf_counter() - start_time
+        return best_col
+
+    """
+    retrieves the depth of the last complete iteration of the last search
+    """
+    def get_last_depth(self):
+        return self.__last_depth
+
+    """
+    retrieves the score of the best column of the last search (positive if it favors the acting player)
+    """
+    def get_last_score(self):
+        return self.__last_score
+
+    def get_num_nodes(self):
+        return self.__num_nodes
+
+    def get_nodes_per_second(self):
+        return self.__num_nodes / self.__search_time if self.__search_time > 0 else 0.0
+
+    """
+    retrieves the ratio of transposition table probes that found the position
+    """
+    def get_table_hit_rate(self):
+        return self.__num_hits / self.__num_probes if self.__num_probes > 0 else 0.0
+
+    """
+    retrieves the totals of all the searches, e.g. to add them to another search (see merge_stats)
+    """
+    def get_stats(self):
+        return {"nodes": self.__num_nodes, "probes": self.__num_probes, "hits": self.__num_hits,
+                "search_time": self.__search_time}
+
+    """
+    adds the totals of another search (e.g. the search of the same player in a worker process)
+    """
+    def merge_stats(self, stats):
+        self.__num_nodes += stats["nodes"]
+        self.__num_probes += stats["probes"]
+        self.__num_hits += stats["hits"]
+        self.__search_time += stats["search_time"]
+
+    def __negamax(self, state: Connect4State, depth, alpha, beta, ply):
+        self.__num_nodes += 1
+        if self.__deadline is not None and self.__num_nodes % AlphaBetaSearch.TIME_CHECK_INTERVAL == 0 and \
+                time.perf_counter() > self.__deadline:
+            raise SearchTimeout()
+
+        if depth == 0:
+            return self.__evaluate(state)
+
+        original_alpha = alpha
+        key = state.get_zobrist_key()
+        table_move = -1
+        self.__num_probes += 1
+        entry = self.__table.probe(key)
+        if entry is not None:
+            self.__num_hits += 1
+            entry_depth, entry_score, bound, table_move = entry
+            if entry_depth >= depth:
+                score = AlphaBetaSearch.__from_table(entry_score, ply)
+                if bound == TranspositionTable.EXACT:
+                    return score
+                if bound == TranspositionTable.LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        player = state.get_acting_player()
+        best_score = -AlphaBetaSearch.WIN_SCORE - 1
+        best_col = -1
+        for col in self.__order_cols(state, table_move, ply):
+            # the column is played on the state itself, and undone once it was searched
+            state.play(Connect4Action(col))
+            if state.is_finished():
+                # the game can only end with a win of the player that moved, or a draw
+                score = AlphaBetaSearch.WIN_SCORE - ply - 1 if state.get_result(player) > 0 else 0
+            else:
+                score = -self.__negamax(state, depth - 1, -beta, -alpha, ply + 1)
+            state.undo()
+
+            if score > best_score:
+                best_score = score
+                best_col = col
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                killers = self.__killers[ply]
+                if killers[0] != col:
+                    killers[1] = killers[0]
+                    killers[0] = col
+                self.__history[player][col] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            bound = TranspositionTable.UPPER
+        elif best_score >= beta:
+            bound = TranspositionTable.LOWER
+        else:
+            bound = TranspositionTable.EXACT
+        self.__table.store(key, depth, AlphaBetaSearch.__to_table(best_score, ply), bound, best_col,
+                           self.__generation)
+        return best_score
+
+    """
+    the legal columns, in the order they should be searched
+    """
+    def __order_cols(self, state: Connect4State, table_move, ply):
+        legal_cols = state.get_legal_cols()
+        killers = self.__killers[ply]
+        history = self.__history[state.get_acting_player()]
+        center = (state.get_num_cols() - 1) / 2
+
+        def priority(col):
+            return (col == table_move, col in killers, history[col], -abs(col - center))
+
+        return sorted((col for col in range(state.get_num_cols()) if legal_cols & (1 << col)), key=priority,
+                      reverse=True)
+
+    """
+    scores a position that is not finished, from the point of view of the acting player
+    """
+    def __evaluate(self, state: Connect4State):
+        score = state.get_heuristic_score(state.get_acting_player())
+
+        # on huge boards, the score must not be mistaken for a win
+        return max(-AlphaBetaSearch.WIN_THRESHOLD, min(AlphaBetaSearch.WIN_THRESHOLD, score))
+
+    """
+    builds the tables that depend on the board, unless they were built for the same board
+    """
+    def __prepare(self, state: Connect4State):
+        num_rows = state.get_num_rows()
+        num_cols = state.get_num_cols()
+        connect_length = state.get_connect_length()
+        if self.__board_shape == (num_rows, num_cols, connect_length):
+            return
+
+        self.__board_shape = (num_rows, num_cols, connect_length)
+        self.__table.clear()
+        self.__history = [[0] * num_cols for _ in range(2)]
+
+    """
+    the wins are stored in the table as a distance from the position, not from the root
+    """
+    @staticmethod
+    def __to_table(score, ply):
+        if score > AlphaBetaSearch.WIN_THRESHOLD:
+            return score + ply
+        if score < -AlphaBetaSearch.WIN_THRESHOLD:
+            return score - ply
+        return score
+
+    @staticmethod
+    def __from_table(score, ply):
+        if score > AlphaBetaSearch.WIN_THRESHOLD:
+            return score - ply
+        if score < -AlphaBetaSearch.WIN_THRESHOLD:
+            return score + ply
+        return score
@@ -1,21 +1,27 @@
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
+from games.connect4.result import Connect4Result
 from games.connect4.state import Connect4State
 from games.game_simulator import GameSimulator
 
 
 class Connect4Simulator(GameSimulator):
 
-    def __init__(self, players, num_rows: int = 6, num_cols: int = 7):
-        super(Connect4Simulator, self).__init__(players)
+    def __init__(self, players, num_rows: int = 6, num_cols: int = 7, connect_length: int = 4,
+                 keep_history: bool = False, keep_metadata: bool = False):
+        super(Connect4Simulator, self).__init__(players, keep_history, keep_metadata)
         """
         the number of rows and cols from the connect4 grid
         """
         self.__num_rows = num_rows
         self.__num_cols = num_cols
+        """
+        the number of aligned checkers needed to win
+        """
+        self.__connect_length = connect_length
 
     def on_init_game(self):
-        return Connect4State(self.__num_rows, self.__num_cols)
+        return Connect4State(self.__num_rows, self.__num_cols, self.__connect_length)
 
     def on_before_end_game(self, state: Connect4State):
         # ignored for this simulator
@@ -29,6 +35,15 @@ class Connect4Simulator(GameSimulator):
         # ignored for this simulator
         pass
 
+    @staticmethod
+    def get_result_typecode():
+        # results are -1, 0 or 1
+        return "b"
+
+    @staticmethod
+    def get_result_range():
+        return Connect4Result.LOOSE.value, Connect4Result.WIN.value
+
     @staticmethod
     def get_player_type():
         return Connect4Player
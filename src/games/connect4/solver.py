@@ -0,0 +1,403 @@
+import argparse
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from games.connect4.action import Connect4Action
+from games.connect4.state import Connect4State
+
+
+class Connect4Solver:
+    """
+    perfect Connect4 solver: finds the exact score of a position, assuming both players play perfectly.
+    The search works directly on two integers, like the bitboards of Connect4State (see its documentation for the
+    layout): the checkers of the acting player and the occupied cells. On top of negamax with alpha-beta pruning:
+        - the score is found with null window searches (a window of width 1 only tells if the score is above a
+          value), whose value is moved towards the score, like a binary search
+        - the immediate wins are played right away, the forced moves (blocking a winning cell of the opponent) are
+          the only ones searched, and the moves that drop a checker right under a winning cell of the opponent are
+          never searched
+        - the moves that create the most winning cells (threats) are searched first, then the central columns
+        - the bounds found for the positions are kept in a transposition table
+    The score of a position is 0 for a draw, and otherwise positive if the acting player wins: the earlier the win,
+    the higher the score. A player that wins with its n-th checker scores (cells / 2 + 1 - n), where cells is the
+    number of cells of the board, and the opponent scores the opposite.
+    The positions are stored in 64 bits integers, so the board must fit in 64 bits (see fits).
+    """
+
+    """
+    :param table_size: the number of slots of the transposition table (a prime number spreads the keys better)
+    """
+    def __init__(self, table_size: int = 1048573):
+        self.__table_size = table_size
+        self.__table_keys = array('Q', bytes(8 * table_size))
+        self.__table_values = array('b', bytes(table_size))
+        """
+        the board the masks below were built for, as (rows, cols, connect length)
+        """
+        self.__board_shape = None
+        self.__num_cells = 0
+        """
+        the value added to the scores stored in the table, so that they are never 0 (an empty slot)
+        """
+        self.__table_offset = 0
+        """
+        the bottom cell of every column, all the cells of the board, and all the cells of each column
+        """
+        self.__bottom_mask = 0
+        self.__board_mask = 0
+        self.__col_masks = []
+        """
+        the columns, from the center to the sides
+        """
+        self.__col_order = []
+        """
+        the shifts that bring the checkers of a line onto its missing cell, for each line direction and missing cell
+        """
+        self.__line_shifts = []
+        """
+        totals of all the searches
+        """
+        self.__num_nodes = 0
+        self.__search_time = 0.0
+
+    """
+    checks if a board can be solved, i.e. if it fits in 64 bits
+    """
+    @staticmethod
+    def fits(num_rows: int, num_cols: int) -> bool:
+        return num_cols * (num_rows + 1) <= 64
+
+    """
+    forgets the positions of the previous searches
+    """
+    def reset(self):
+        self.__table_keys = array('Q', bytes(8 * self.__table_size))
+        self.__table_values = array('b', bytes(self.__table_size))
+
+    """
+    computes the exact score of a position that is not finished
+    :param weak: only finds if the position is won (1), drawn (0) or lost (-1), which is faster
+    """
+    def solve(self, state: Connect4State, weak: bool = False) -> int:
+        start_time = time.perf_counter()
+        position, mask, moves = self.__prepare(state)
+        score = self.__solve(position, mask, moves, weak)
+        self.__search_time += time.perf_counter() - start_time
+        return score
+
+    """
+    computes the exact score of each column of a position that is not finished
+    :return: the score of each column for the acting player (None for the full columns)
+    """
+    def analyze(self, state: Connect4State, weak: bool = False):
+        start_time = time.perf_counter()
+        position, mask, moves = self.__prepare(state)
+        winning_cells = self.__get_winning_cells(position, mask)
+
+        scores = [None] * len(self.__col_masks)
+        for col, col_mask in enumerate(self.__col_masks):
+            move = (mask + self.__bottom_mask) & col_mask
+            if not move:
+                continue
+            if move & winning_cells:
+                scores[col] = 1 if weak else (self.__num_cells + 1 - moves) // 2
+            elif moves + 1 == self.__num_cells:
+                scores[col] = 0
+            else:
+                scores[col] = -self.__solve(position ^ mask, mask | move, moves + 1, weak)
+
+        self.__search_time += time.perf_counter() - start_time
+        return scores
+
+    """
+    retrieves the best column of a position that is not finished, which is cheaper than analyze: once the score of the
+    position is known, a null window search on each column (from the center) tells if it reaches this score
+    :return: the column and its score
+    """
+    def get_best_col(self, state: Connect4State):
+        start_time = time.perf_counter()
+        position, mask, moves = self.__prepare(state)
+        score = self.__solve(position, mask, moves, False)
+
+        winning_cells = self.__get_winning_cells(position, mask)
+        best_col = None
+        for col in self.__col_order:
+            move = (mask + self.__bottom_mask) & self.__col_masks[col]
+            if not move:
+                continue
+            if move & winning_cells:
+                col_score = (self.__num_cells + 1 - moves) // 2
+            elif moves + 1 == self.__num_cells:
+                col_score = 0
+            else:
+                opponent_position = position ^ mask
+                opponent_mask = mask | move
+                if self.__get_winning_cells(opponent_position, opponent_mask) & \
+                        (opponent_mask + self.__bottom_mask) & self.__board_mask:
+                    # the opponent wins on its next move
+                    col_score = -((self.__num_cells - moves) // 2)
+                else:
+                    # the score of the column is at least the score of the position if the opponent's is at most -score
+                    col_score = -self.__negamax(opponent_position, opponent_mask, moves + 1, -score, -score + 1)
+            if col_score >= score:
+                best_col = col
+                break
+
+        self.__search_time += time.perf_counter() - start_time
+        return best_col, score
+
+    def get_num_nodes(self):
+        return self.__num_nodes
+
+    def get_nodes_per_second(self):
+        return self.__num_nodes / self.__search_time if self.__search_time > 0 else 0.0
+
+    """
+    retrieves the totals of all the searches, e.g. to add them to another solver (see merge_stats)
+    """
+    def get_stats(self):
+        return {"nodes": self.__num_nodes, "search_time": self.__search_time}
+
+    """
+    adds the totals of another solver (e.g. the solver of the same player in a worker process)
+    """
+    def merge_stats(self, stats):
+        self.__num_nodes += stats["nodes"]
+        self.__search_time += stats["search_time"]
+
+    def __solve(self, position, mask, moves, weak):
+        # a win on the next move is not searched
+        if self.__get_winning_cells(position, mask) & (mask + self.__bottom_mask) & self.__board_mask:
+            return 1 if weak else (self.__num_cells + 1 - moves) // 2
+
+        min_score = -((self.__num_cells - moves) // 2)
+        max_score = (self.__num_cells + 1 - moves) // 2
+        if weak:
+            min_score = -1
+            max_score = 1
+
+        # null window searches, first around 0 (the scores near a draw are the cheapest to prove)
+        while min_score < max_score:
+            med = min_score + (max_score - min_score) // 2
+            if med <= 0 and int(min_score / 2) < med:
+                med = int(min_score / 2)
+            elif med >= 0 and int(max_score / 2) > med:
+                med = int(max_score / 2)
+
+            score = self.__negamax(position, mask, moves, med, med + 1)
+            if score <= med:
+                max_score = score
+            else:
+                min_score = score
+
+        # the bounds found by the weak searches can be outside of [-1, 1], only their sign matters
+        if weak:
+            return (min_score > 0) - (min_score < 0)
+        return min_score
+
+    """
+    searches a position where the acting player can't win on the next move
+    :return: the score if it is between alpha and beta, otherwise a bound of the score on the same side of the window
+    """
+    def __negamax(self, position, mask, moves, alpha, beta):
+        self.__num_nodes += 1
+        num_cells = self.__num_cells
+
+        possible = (mask + self.__bottom_mask) & self.__board_mask
+        opponent_winning_cells = self.__get_winning_cells(position ^ mask, mask)
+        forced = possible & opponent_winning_cells
+        if forced:
+            # two winning cells of the opponent can't both be blocked
+            if forced & (forced - 1):
+                return -((num_cells - moves) // 2)
+            possible = forced
+        # a checker under a winning cell of the opponent lets it win
+        possible &= ~(opponent_winning_cells >> 1)
+        if not possible:
+            return -((num_cells - moves) // 2)
+
+        # the opponent can't win on the next move, so neither player can win before the board is full
+        if moves >= num_cells - 2:
+            return 0
+
+        # the opponent can't win on its next move, so the score is at least the one of a loss two moves later
+        min_score = -((num_cells - 2 - moves) // 2)
+        if alpha < min_score:
+            alpha = min_score
+            if alpha >= beta:
+                return alpha
+
+        # we can't win on this move, so the score is at most the one of a win two moves later
+        max_score = (num_cells - 1 - moves) // 2
+        key = position + mask
+        slot = key % self.__table_size
+        if self.__table_keys[slot] == key:
+            value = self.__table_values[slot]
+            if value > 0:
+                # upper bounds are stored as positive values, lower bounds as negative ones
+                max_score = value - self.__table_offset
+            elif value < 0:
+                min_score = -value - self.__table_offset
+                if alpha < min_score:
+                    alpha = min_score
+                    if alpha >= beta:
+                        return alpha
+        if beta > max_score:
+            beta = max_score
+            if alpha >= beta:
+                return beta
+
+        # the moves that create the most winning cells first, then the central ones
+        candidates = []
+        for order, col in enumerate(self.__col_order):
+            move = possible & self.__col_masks[col]
+            if move:
+                threats = self.__get_winning_cells(position | move, mask | move).bit_count()
+                candidates.append((-threats, order, move))
+        candidates.sort()
+
+        for _, _, move in candidates:
+            # the position of the opponent after the move: its checkers are the occupied cells that are not ours
+            score = -self.__negamax(position ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.__table_keys[slot] = key
+                self.__table_values[slot] = -(score + self.__table_offset)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.__table_keys[slot] = key
+        self.__table_values[slot] = alpha + self.__table_offset
+        return alpha
+
+    """
+    retrieves the empty cells (reachable or not) that would complete a line of a player
+    :param position: the checkers of the player
+    """
+    def __get_winning_cells(self, position, mask):
+        cells = 0
+        for shifts in self.__line_shifts:
+            line = self.__board_mask
+            for shift in shifts:
+                line &= (position << shift) if shift > 0 else (position >> -shift)
+            cells |= line
+        return cells & (self.__board_mask ^ mask)
+
+    """
+    builds the masks that depend on the board, unless they were built for the same board
+    :return: the checkers of the acting player, the occupied cells and the number of moves of the state
+    """
+    def __prepare(self, state: Connect4State):
+        num_rows = state.get_num_rows()
+        num_cols = state.get_num_cols()
+        connect_length = state.get_connect_length()
+        if state.is_finished():
+            raise ValueError("The game is already finished")
+
+        if self.__board_shape != (num_rows, num_cols, connect_length):
+            if not Connect4Solver.fits(num_rows, num_cols):
+                raise ValueError(f"A {num_rows}x{num_cols} board does not fit in 64 bits")
+
+            self.__board_shape = (num_rows, num_cols, connect_length)
+            self.__num_cells = num_rows * num_cols
+            self.__table_offset = self.__num_cells // 2 + 2
+            col_height = num_rows + 1
+            column = (1 << num_rows) - 1
+            self.__col_masks = [column << (col * col_height) for col in range(num_cols)]
+            self.__bottom_mask = sum(1 << (col * col_height) for col in range(num_cols))
+            self.__board_mask = sum(self.__col_masks)
+            center = (num_cols - 1) / 2
+            self.__col_order = sorted(range(num_cols), key=lambda col: abs(col - center))
+
+            # a cell completes a line if the other cells of the line, at (i - missing) * direction from it, are ours.
+            # The shifts never bring a checker to a wrong cell: the lines that cross the top or the bottom of a column
+            # go through an extra bit of Connect4State, which is never set, or end on one, which is not a cell
+            self.__line_shifts = []
+            for direction in (1, col_height, col_height - 1, col_height + 1):
+                for missing in range(connect_length):
+                    # vertically, only the cell above the line can be empty
+                    if direction == 1 and missing != connect_length - 1:
+                        continue
+                    self.__line_shifts.append([(missing - i) * direction for i in range(connect_length) if i != missing])
+
+            self.reset()
+
+        boards = state.get_boards()
+        mask = boards[0] | boards[1]
+        return boards[state.get_acting_player()], mask, mask.bit_count()
+
+
+"""
+The benchmark positions that are bundled with the solver
+"""
+BENCHMARK_PATH = Path(__file__).parent / "data" / "solver_benchmark.txt"
+
+
+"""
+Reads a file of benchmark positions: each line holds the moves of a position (its columns, from 1) and its score, if
+the score was verified independently of the solver (the positions without a score are only timed).
+The lines that start with # name the set of the positions that follow
+:return: the (moves, score) of each position, by set (the score is None if it is not given)
+"""
+def read_benchmark(path=BENCHMARK_PATH):
+    sets = {}
+    positions = sets.setdefault("positions", [])
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                positions = sets.setdefault(line[1:].strip(), [])
+            else:
+                moves, *score = line.split()
+                positions.append(([int(col) - 1 for col in moves], int(score[0]) if score else None))
+    return {name: positions for name, positions in sets.items() if positions}
+
+
+"""
+Solves every position of a benchmark file with a new solver per set, and prints the number of positions solved per
+second and the number of wrong scores (among the positions that have a score)
+:return: True if all the scores are right
+"""
+def run_benchmark(path=BENCHMARK_PATH, weak=False):
+    all_right = True
+    for name, positions in read_benchmark(path).items():
+        solver = Connect4Solver()
+        num_wrong = 0
+        num_checked = 0
+        start_time = time.perf_counter()
+        for moves, score in positions:
+            state = Connect4State()
+            for col in moves:
+                state.play(Connect4Action(col))
+            solved_score = solver.solve(state, weak)
+            if score is not None:
+                num_checked += 1
+                expected_score = (score > 0) - (score < 0) if weak else score
+                if solved_score != expected_score:
+                    num_wrong += 1
+        elapsed_time = time.perf_counter() - start_time
+
+        all_right = all_right and num_wrong == 0
+        print(f"{name:<16} | Positions: {len(positions)} | Positions per second: {len(positions) / elapsed_time:.2f} | "
+              f"Mean time: {1000 * elapsed_time / len(positions):.1f}ms | "
+              f"Nodes per second: {solver.get_nodes_per_second():.0f} | "
+              f"Wrong scores: {f'{num_wrong}/{num_checked}' if num_checked else 'not checked'}")
+    return all_right
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Connect4 solver benchmark.')
+    parser.add_argument('--positions', type=Path, default=BENCHMARK_PATH, help='The file of benchmark positions.')
+    parser.add_argument('--weak', action='store_true', help='Only find if the positions are won, drawn or lost.')
+    args = parser.parse_args()
+
+    if not run_benchmark(args.positions, args.weak):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
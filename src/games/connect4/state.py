@@ -1,3 +1,4 @@
+import random
 from typing import Optional
 
 from termcolor import colored
@@ -8,15 +9,54 @@ from games.state import State
 
 
 class Connect4State(State):
+    """
+    the board is stored as two bitboards (one integer per player). The cells are numbered column by column,
+    from the bottom to the top, and each column has one extra (always empty) bit on top, so that shifting a board
+    never carries a checker from one column into the next:
+
+        5 12 19 26 33 40 47   <- extra row
+        4 11 18 25 32 39 46
+        3 10 17 24 31 38 45
+        2  9 16 23 30 37 44
+        1  8 15 22 29 36 43
+        0  7 14 21 28 35 42   <- bottom row
+
+    dropping a checker is a single bit operation, and a winner is found by only walking the four lines (vertical,
+    horizontal and both diagonals) that go through the last dropped checker, so the cost of a move does not depend on
+    the size of the board. Walking a line never wraps into the next column, as it always stops on an extra bit
+
+    the state can also score the positions for the search players (see get_heuristic_score), from the number of open
+    windows of each player: the connect_length aligned cells that only hold checkers of the player. The windows are
+    only counted once a score is asked for, and from then on every move only updates the windows through its cell
+    """
+
     EMPTY_CELL = -1
 
-    def __init__(self, num_rows: int = 6, num_cols: int = 7):
+    """
+    the random keys of each player and bit index, by board size, used to compute the Zobrist keys of the states
+    """
+    __ZOBRIST_KEYS = {}
+
+    """
+    the windows of each board size and connect length: their cells (as a bitmask), and the windows of each bit index
+    """
+    __WINDOWS = {}
+
+    """
+    the heuristic score of an open window, for each number of checkers: a window is worth 4 times more with every
+    checker
+    """
+    WINDOW_SCORE_FACTOR = 4
+
+    def __init__(self, num_rows: int = 6, num_cols: int = 7, connect_length: int = 4):
         super().__init__()
 
-        if num_rows < 4:
-            raise Exception("the number of rows must be 4 or over")
-        if num_cols < 4:
-            raise Exception("the number of cols must be 4 or over")
+        if connect_length < 2:
+            raise Exception("the connect length must be 2 or over")
+        if num_rows < connect_length:
+            raise Exception(f"the number of rows must be {connect_length} or over")
+        if num_cols < connect_length:
+            raise Exception(f"the number of cols must be {connect_length} or over")
 
         """
         the dimensions of the board
@@ -25,9 +65,35 @@ class Connect4State(State):
         self.__num_cols = num_cols
 
         """
-        the grid
+        the number of aligned checkers needed to win
+        """
+        self.__connect_length = connect_length
+
+        """
+        the number of bits of each column (the rows plus the extra row)
+        """
+        self.__col_height = num_rows + 1
+
+        """
+        the bitboard of each player
+        """
+        self.__boards = [0, 0]
+
+        """
+        the index of the bit where the next checker of each column will be dropped
+        """
+        self.__heights = [col * self.__col_height for col in range(0, num_cols)]
+
+        """
+        bitmask of the columns that are not full (bit c is set if column c can be played)
+        """
+        self.__legal_cols = (1 << num_cols) - 1
+
+        """
+        the Zobrist key of the position: the xor of the random keys of every checker on the board
         """
-        self.__grid = [[Connect4State.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
+        self.__zobrist_keys = Connect4State.__get_zobrist_keys(num_rows, num_cols)
+        self.__zobrist_key = 0
 
         """
         counts the number of turns in the current game
@@ -40,51 +106,212 @@ class Connect4State(State):
         self.__acting_player = 0
 
         """
-        determine if a winner was found already 
+        determine if a winner was found already
         """
         self.__has_winner = False
 
-    def __check_winner(self, player):
-        # check for 4 across
-        for row in range(0, self.__num_rows):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row][col + 1] == player and \
-                        self.__grid[row][col + 2] == player and \
-                        self.__grid[row][col + 3] == player:
-                    return True
-
-        # check for 4 up and down
-        for row in range(0, self.__num_rows - 3):
-            for col in range(0, self.__num_cols):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row + 1][col] == player and \
-                        self.__grid[row + 2][col] == player and \
-                        self.__grid[row + 3][col] == player:
-                    return True
-
-        # check upward diagonal
-        for row in range(3, self.__num_rows):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row - 1][col + 1] == player and \
-                        self.__grid[row - 2][col + 2] == player and \
-                        self.__grid[row - 3][col + 3] == player:
-                    return True
-
-        # check downward diagonal
-        for row in range(0, self.__num_rows - 3):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row + 1][col + 1] == player and \
-                        self.__grid[row + 2][col + 2] == player and \
-                        self.__grid[row + 3][col + 3] == player:
-                    return True
+        """
+        one record per action, to undo them: the column, shifted left, and whether there was a winner before
+        """
+        self.__undo_records = []
+
+        """
+        the number of checkers of each player in each window, and the number of open windows of each player by number
+        of checkers (None until a score is asked for, see get_open_windows)
+        """
+        self.__cell_windows = None
+        self.__window_counts = None
+        self.__open_windows = None
+
+    """
+    retrieves the random keys of a board size, which are always the same (they are generated from a fixed seed)
+    """
+    @staticmethod
+    def __get_zobrist_keys(num_rows, num_cols):
+        board_size = (num_rows, num_cols)
+        if board_size not in Connect4State.__ZOBRIST_KEYS:
+            rng = random.Random(f"connect4-zobrist-{num_rows}x{num_cols}")
+            num_bits = num_cols * (num_rows + 1)
+            Connect4State.__ZOBRIST_KEYS[board_size] = [[rng.getrandbits(64) for _ in range(num_bits)] for _ in range(2)]
+        return Connect4State.__ZOBRIST_KEYS[board_size]
+
+    """
+    retrieves the windows of a board, which are only built once per board size and connect length
+    :return: the bitmask of each window, and the indexes of the windows of each bit index
+    """
+    @staticmethod
+    def __get_windows(num_rows, num_cols, connect_length):
+        board_shape = (num_rows, num_cols, connect_length)
+        if board_shape not in Connect4State.__WINDOWS:
+            col_height = num_rows + 1
+            windows = []
+            cell_windows = [[] for _ in range(num_cols * col_height)]
+            for col in range(num_cols):
+                for row in range(num_rows):
+                    for col_step, row_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                        last_col = col + col_step * (connect_length - 1)
+                        last_row = row + row_step * (connect_length - 1)
+                        if last_col < num_cols and 0 <= last_row < num_rows:
+                            window = 0
+                            for step in range(connect_length):
+                                index = (col + col_step * step) * col_height + row + row_step * step
+                                window |= 1 << index
+                                cell_windows[index].append(len(windows))
+                            windows.append(window)
+            Connect4State.__WINDOWS[board_shape] = windows, [tuple(indexes) for indexes in cell_windows]
+        return Connect4State.__WINDOWS[board_shape]
+
+    """
+    counts the checkers of every window, the first time the windows are needed
+    """
+    def __count_windows(self):
+        windows, self.__cell_windows = Connect4State.__get_windows(self.__num_rows, self.__num_cols,
+                                                                  self.__connect_length)
+        self.__window_counts = [bytearray(len(windows)), bytearray(len(windows))]
+        self.__open_windows = [[0] * (self.__connect_length + 1) for _ in range(2)]
+        for window_index, window in enumerate(windows):
+            counts = [(window & board).bit_count() for board in self.__boards]
+            for player in range(2):
+                self.__window_counts[player][window_index] = counts[player]
+                if counts[player] and not counts[1 - player]:
+                    self.__open_windows[player][counts[player]] += 1
+
+    """
+    adds a checker of a player to the windows of its bit index
+    """
+    def __add_to_windows(self, player, index):
+        counts = self.__window_counts[player]
+        opponent_counts = self.__window_counts[1 - player]
+        open_windows = self.__open_windows[player]
+        opponent_open_windows = self.__open_windows[1 - player]
+        for window in self.__cell_windows[index]:
+            count = counts[window]
+            opponent_count = opponent_counts[window]
+            if not opponent_count:
+                # the window stays open, with one more checker
+                if count:
+                    open_windows[count] -= 1
+                open_windows[count + 1] += 1
+            elif not count:
+                # the window of the opponent is blocked
+                opponent_open_windows[opponent_count] -= 1
+            counts[window] = count + 1
+
+    """
+    removes a checker of a player from the windows of its bit index
+    """
+    def __remove_from_windows(self, player, index):
+        counts = self.__window_counts[player]
+        opponent_counts = self.__window_counts[1 - player]
+        open_windows = self.__open_windows[player]
+        opponent_open_windows = self.__open_windows[1 - player]
+        for window in self.__cell_windows[index]:
+            count = counts[window] - 1
+            opponent_count = opponent_counts[window]
+            if not opponent_count:
+                open_windows[count + 1] -= 1
+                if count:
+                    open_windows[count] += 1
+            elif not count:
+                # the window of the opponent is open again
+                opponent_open_windows[opponent_count] += 1
+            counts[window] = count
+
+    """
+    checks if the checker of a player at the given bit index completes a line
+    """
+    def __check_winner(self, player, index):
+        board = self.__boards[player]
+
+        # vertical, horizontal and both diagonals
+        for direction in (1, self.__col_height, self.__col_height - 1, self.__col_height + 1):
+            count = 1
+
+            # walk both ways from the checker, until a cell of another player, an empty cell or an extra bit
+            position = index + direction
+            while (board >> position) & 1:
+                count += 1
+                position += direction
+
+            position = index - direction
+            while position >= 0 and (board >> position) & 1:
+                count += 1
+                position -= direction
+
+            if count >= self.__connect_length:
+                return True
 
         return False
 
+    def __get_bit(self, row, col):
+        return 1 << (col * self.__col_height + self.__num_rows - 1 - row)
+
+    """
+    retrieves the value of a cell: the index of the player that owns it, or EMPTY_CELL
+    :param row: the row of the cell (0 is the top row)
+    :param col: the column of the cell
+    """
+    def get_cell(self, row, col):
+        bit = self.__get_bit(row, col)
+        if self.__boards[0] & bit:
+            return 0
+        if self.__boards[1] & bit:
+            return 1
+        return Connect4State.EMPTY_CELL
+
+    """
+    builds the grid (a list of rows, the top row first) from the bitboards
+    the grid is a new list on every call, changing it has no effect on the state
+    """
     def get_grid(self):
-        return self.__grid
+        return [[self.get_cell(row, col) for col in range(self.__num_cols)] for row in range(self.__num_rows)]
+
+    """
+    retrieves the bitboards of both players (see the class documentation for the layout)
+    """
+    def get_boards(self):
+        return tuple(self.__boards)
+
+    """
+    retrieves the bitmask of the columns that can be played (bit c is set if column c is not full)
+    """
+    def get_legal_cols(self):
+        return self.__legal_cols
+
+    """
+    retrieves the Zobrist key of the position, a 64 bit hash that is updated on every move.
+    The key only depends on the checkers on the board (the acting player is given by their number)
+    """
+    def get_zobrist_key(self):
+        return self.__zobrist_key
+
+    """
+    retrieves the number of open windows of a player (windows that hold checkers of the player and none of the
+    opponent), by number of checkers: the item at index n is the number of open windows with n checkers (the item at
+    index 0 is always 0)
+    """
+    def get_open_windows(self, player):
+        if self.__open_windows is None:
+            self.__count_windows()
+        return list(self.__open_windows[player])
+
+    """
+    scores the position for a player: its open windows minus the ones of the opponent, each window worth
+    WINDOW_SCORE_FACTOR ** (checkers - 1). The first call counts all the windows, the following ones cost the same on
+    any board size
+    """
+    def get_heuristic_score(self, player):
+        if self.__open_windows is None:
+            self.__count_windows()
+
+        score = 0
+        window_score = 1
+        open_windows = self.__open_windows[player]
+        opponent_open_windows = self.__open_windows[1 - player]
+        for count in range(1, self.__connect_length + 1):
+            score += window_score * (open_windows[count] - opponent_open_windows[count])
+            window_score *= Connect4State.WINDOW_SCORE_FACTOR
+        return score
 
     def get_num_players(self):
         return 2
@@ -97,7 +324,7 @@ class Connect4State(State):
             return False
 
         # full column
-        if self.__grid[0][col] != Connect4State.EMPTY_CELL:
+        if not self.__legal_cols & (1 << col):
             return False
 
         return True
@@ -105,22 +332,46 @@ class Connect4State(State):
     def update(self, action: Connect4Action):
         col = action.get_col()
 
+        self.__undo_records.append(col << 1 | self.__has_winner)
+
         # drop the checker
-        for row in range(self.__num_rows - 1, -1, -1):
-            if self.__grid[row][col] < 0:
-                self.__grid[row][col] = self.__acting_player
-                break
+        index = self.__heights[col]
+        self.__boards[self.__acting_player] |= 1 << index
+        self.__zobrist_key ^= self.__zobrist_keys[self.__acting_player][index]
+        self.__heights[col] += 1
+        if self.__heights[col] == col * self.__col_height + self.__num_rows:
+            self.__legal_cols &= ~(1 << col)
 
-        # determine if there is a winner
-        self.__has_winner = self.__check_winner(self.__acting_player)
+        if self.__window_counts is not None:
+            self.__add_to_windows(self.__acting_player, index)
+
+        # determine if there is a winner, only the lines through the new checker can be complete
+        self.__has_winner = self.__check_winner(self.__acting_player, index)
 
         # switch to next player
         self.__acting_player = 1 if self.__acting_player == 0 else 0
 
         self.__turns_count += 1
 
+    def undo(self):
+        record = self.__undo_records.pop()
+        col = record >> 1
+
+        self.__turns_count -= 1
+        self.__acting_player = 1 if self.__acting_player == 0 else 0
+
+        # remove the checker
+        self.__heights[col] -= 1
+        index = self.__heights[col]
+        self.__boards[self.__acting_player] &= ~(1 << index)
+        self.__zobrist_key ^= self.__zobrist_keys[self.__acting_player][index]
+        self.__legal_cols |= 1 << col
+        if self.__window_counts is not None:
+            self.__remove_from_windows(self.__acting_player, index)
+        self.__has_winner = bool(record & 1)
+
     def __display_cell(self, row, col):
-        cell_value = self.__grid[row][col]
+        cell_value = self.get_cell(row, col)
         if cell_value == 0:
             # Player 1 - Red
             print(colored('●', 'red'), end="")
@@ -168,13 +419,28 @@ class Connect4State(State):
         return self.__acting_player
 
     def clone(self):
-        cloned_state = Connect4State(self.__num_rows, self.__num_cols)
+        # the constructor is skipped, all the attributes are copied
+        cloned_state = Connect4State.__new__(Connect4State)
+        cloned_state.__num_rows = self.__num_rows
+        cloned_state.__num_cols = self.__num_cols
+        cloned_state.__connect_length = self.__connect_length
+        cloned_state.__col_height = self.__col_height
+        cloned_state.__boards = self.__boards.copy()
+        cloned_state.__zobrist_keys = self.__zobrist_keys
+        cloned_state.__zobrist_key = self.__zobrist_key
+        cloned_state.__heights = self.__heights.copy()
+        cloned_state.__legal_cols = self.__legal_cols
         cloned_state.__turns_count = self.__turns_count
         cloned_state.__acting_player = self.__acting_player
         cloned_state.__has_winner = self.__has_winner
-        for row in range(0, self.__num_rows):
-            for col in range(0, self.__num_cols):
-                cloned_state.__grid[row][col] = self.__grid[row][col]
+        cloned_state.__undo_records = []
+        cloned_state.__cell_windows = self.__cell_windows
+        if self.__window_counts is not None:
+            cloned_state.__window_counts = [counts.copy() for counts in self.__window_counts]
+            cloned_state.__open_windows = [open_windows.copy() for open_windows in self.__open_windows]
+        else:
+            cloned_state.__window_counts = None
+            cloned_state.__open_windows = None
         return cloned_state
 
     def get_result(self, pos):
@@ -190,13 +456,12 @@ class Connect4State(State):
     def get_num_cols(self):
         return self.__num_cols
 
+    def get_connect_length(self):
+        return self.__connect_length
+
     def before_results(self):
         pass
 
     def get_possible_actions(self):
-        return list(filter(
-            lambda action: self.validate_action(action),
-            map(
-                lambda pos: Connect4Action(pos),
-                range(0, self.get_num_cols()))
-        ))
+        legal_cols = self.__legal_cols
+        return [Connect4Action(col) for col in range(0, self.__num_cols) if legal_cols & (1 << col)]
@@ -1,12 +1,25 @@
+import random
+import time
+import weakref
 from abc import ABC, abstractmethod
 
 from games.player import Player
+from games.result_store import ResultStore
+from games.rng import create_rng, derive_seed
+from games.score_accumulator import ScoreAccumulator
 from games.state import State
+from games.state_view import StateView
 
 
 class GameSimulator(ABC):
 
-    def __init__(self, players: list):
+    """
+    :param players: the players of the game
+    :param keep_history: if True, the result of every game is also stored and can be retrieved with get_results
+    :param keep_metadata: if True (and keep_history is True), the seat permutation, number of turns and duration
+    of every game are also stored
+    """
+    def __init__(self, players: list, keep_history: bool = False, keep_metadata: bool = False):
         # only allow list of players
         assert len(list(filter(lambda p: not isinstance(p, Player), players))) <= 0
 
@@ -22,8 +35,21 @@ class GameSimulator(ABC):
         # the selected permutation for the current game
         self.__current_permutation = 0
 
-        # the results of all games between all players
-        self.__results = []
+        # running totals of the scores of each player
+        self.__accumulators = {name: ScoreAccumulator() for name in names}
+
+        # the results of all games between all players (only stored if the history is kept)
+        self.__results = ResultStore(names, self.get_result_typecode(), keep_metadata) if keep_history else None
+
+        # random number generator of the simulator, replaced at the start of each game when the simulation is seeded
+        self.__rng = random.Random()
+
+        # the seed of the simulation (None if not seeded) and the index of the next game
+        self.__seed = None
+        self.__game_index = 0
+
+        # weak references to the state views handed to the players since the live state last changed
+        self.__views = []
 
     """
     Adapted from https://www.geeksforgeeks.org/heaps-algorithm-for-generating-permutations/
@@ -105,12 +131,40 @@ class GameSimulator(ABC):
     def get_player_positions(self):
         return self.__permutations[self.__current_permutation]
 
+    """
+    seeds the simulation. Each game then gets its own random streams, derived from the seed and the index of the game:
+    one for the simulator (see get_rng), one for each seat (see Player.get_rng) and one for the global random module,
+    used by players that don't use their own generator. A game can thus be replayed on its own, and splitting the
+    games across simulators gives the same results as playing them all in a single one.
+    :param seed: the seed of the matchup
+    :param first_game: the index of the next game to be played
+    """
+    def set_seed(self, seed, first_game: int = 0):
+        self.__seed = seed
+        self.__game_index = first_game
+
+    """
+    retrieves the random number generator the simulator must use for all its random decisions
+    """
+    def get_rng(self):
+        return self.__rng
+
     """
     runs the simulation
     """
     def run_simulation(self):
-        state = self.on_init_game()
+        start_time = time.perf_counter()
+        turns = 0
+
         players = self.get_player_positions()
+        if self.__seed is not None:
+            self.__rng = create_rng(self.__seed, self.__game_index, "simulator")
+            for pos in range(0, len(players)):
+                players[pos].set_rng(create_rng(self.__seed, self.__game_index, "seat", pos))
+            random.seed(derive_seed(self.__seed, self.__game_index, "global"))
+        self.__game_index += 1
+
+        state = self.on_init_game()
 
         # notify players a new game is starting
         for pos in range(0, len(players)):
@@ -124,20 +178,23 @@ class GameSimulator(ABC):
 
             # obtain a valid action
             while True:
-                selected_action = players[pos].get_action(state.clone())
+                selected_action = players[pos].get_action(self.__view(state))
                 if state.validate_action(selected_action):
                     break
 
+            self.__detach_views()
             state.play(selected_action)
+            turns += 1
 
             # notify players of the action
             for player in players:
-                player.event_action(pos, selected_action, state.clone())
+                player.event_action(pos, selected_action, self.__view(state))
 
             # the simulator will run an optional hanlder for each updated state
             self.on_state_update(state)
 
         # handler to run before the game ends
+        self.__detach_views()
         self.on_before_end_game(state)
 
         result = {}
@@ -148,19 +205,53 @@ class GameSimulator(ABC):
 
             # store the result for that player
             result[player.get_name()] = state.get_result(player.get_current_pos())
-            player.event_end_game(state.clone())
+            self.__accumulators[player.get_name()].add(result[player.get_name()])
+            # the final state is never changed again, so these views don't need to be detached
+            player.event_end_game(self.__view(state))
 
-        self.__results.append(result)
+        if self.__results is not None:
+            self.__results.add(result, self.__current_permutation, turns, time.perf_counter() - start_time)
 
         # handler to run after a game ends
         self.on_end_game(state)
 
-    # prints the stats for all players
+    """
+    creates a read-only view of the live state for a player
+    no reference is kept to the view, so it is released as soon as the player drops it
+    """
+    def __view(self, state):
+        view = StateView(state)
+        self.__views.append(weakref.ref(view))
+        return view
+
+    """
+    must be called before the live state changes: the views still held by players become real copies
+    of the state they were given, the others were already released and cost nothing
+    """
+    def __detach_views(self):
+        for view_ref in self.__views:
+            view = view_ref()
+            if view is not None:
+                view.detach()
+        self.__views.clear()
+
+    # prints the stats for all players: their scores, then the stats that each player reports (see Player.print_stats)
     def print_stats(self):
         scores = self.get_global_score()
         for player in self.__permutations[0]:
             name = player.get_name()
-            print(f"Player {name} | Total score: {scores[name]}$ | Avg. score per game: {scores[name] / len(self.__results)}$")
+            print(f"Player {name} | Total score: {scores[name]}$ | Avg. score per game: {scores[name] / self.get_num_games()}$")
+        for player in self.__permutations[0]:
+            player.print_stats()
+
+    # gets the counters of every player (see Player.get_stats), by name
+    def get_player_stats(self):
+        return {player.get_name(): player.get_stats() for player in self.__permutations[0]}
+
+    # adds the counters of the players of another simulator with the same players (e.g. in a worker process)
+    def merge_player_stats(self, player_stats):
+        for player in self.__permutations[0]:
+            player.merge_stats(player_stats[player.get_name()])
 
     # returns the list of players
     def get_players(self):
@@ -174,20 +265,59 @@ class GameSimulator(ABC):
     def num_players(self):
         return len(self.__permutations[0])
 
-    # gets the results of all games
+    # gets the number of games that were played
+    def get_num_games(self):
+        return next(iter(self.__accumulators.values())).get_count()
+
+    # gets the results of all games as a lazy sequence of dicts (empty if the history is not kept)
     def get_results(self):
+        if self.__results is None:
+            return []
+        return self.__results.get_view()
+
+    # gets the columnar store with the results of all games (None if the history is not kept)
+    def get_result_store(self):
         return self.__results
 
+    # gets the running score totals of all players
+    def get_accumulators(self):
+        return self.__accumulators
+
+    # adds the results of games played by another simulator with the same players (e.g. in a worker process)
+    def merge_results(self, accumulators, result_store):
+        for name, accumulator in accumulators.items():
+            self.__accumulators[name].merge(accumulator)
+        if self.__results is not None and result_store is not None:
+            self.__results.extend(result_store)
+
     # gets the scores of all players
     def get_global_score(self):
-        scores = {}
-        for player in self.__permutations[0]:
-            name = player.get_name()
-            scores[name] = 0
-            for result in self.__results:
-                scores[name] += result[name]
-        return scores
+        return {name: accumulator.get_sum() for name, accumulator in self.__accumulators.items()}
+
+    # gets the average score per game of all players
+    def get_mean_score(self):
+        return {name: accumulator.get_mean() for name, accumulator in self.__accumulators.items()}
 
+    # gets the variance of the score per game of all players
+    def get_score_variance(self):
+        return {name: accumulator.get_variance() for name, accumulator in self.__accumulators.items()}
+
+    """
+    the array typecode used to store the results of the games (see the array module)
+    simulators with small integer results can override it to use less memory
+    """
+    @staticmethod
+    def get_result_typecode():
+        return "d"
+
+    """
+    the lowest and the highest result a player can get in a game, e.g. for the stop rules, which need to know the range
+    of the score differences in advance
+    """
+    @staticmethod
+    @abstractmethod
+    def get_result_range():
+        pass
 
     @staticmethod
     @abstractmethod
@@ -1,6 +1,5 @@
 from enum import Enum
 
-from enum import Enum
 
 class Rank(Enum):
     Two = 2
@@ -56,6 +55,20 @@ class Suit(Enum):
         return SUIT_SYMBOLS[self.value]
 
 
+"""
+The cards are dealt as integers from 0 to 51, in the encoding of phevaluator: rank_index * 4 + suit_index, where the
+rank index goes from 0 (Two) to 12 (Ace) and the suit index follows the order clubs, diamonds, hearts, spades.
+The Card objects are only needed to display the cards (see to_card)
+"""
+NUM_CARDS = 52
+
+"""
+the ranks and suits of the card integers, by rank index and by suit index
+"""
+RANKS = tuple(Rank)
+SUITS = (Suit.Clubs, Suit.Diamonds, Suit.Hearts, Suit.Spades)
+
+
 class Card:
     def __init__(self, rank, suit):
         self.rank = rank
@@ -69,3 +82,43 @@ class Card:
 
     def to_symbol_str(self):
         return f"{self.rank}{self.suit.symbol()}"
+
+    """
+    retrieves the integer of the card (see NUM_CARDS)
+    """
+    def to_int(self):
+        return to_int(self.rank, self.suit)
+
+
+"""
+the Card object of each card integer, created once
+"""
+CARDS = tuple(Card(RANKS[card >> 2], SUITS[card & 3]) for card in range(NUM_CARDS))
+
+
+"""
+retrieves the integer of the card with the given rank and suit
+"""
+def to_int(rank: Rank, suit: Suit) -> int:
+    return (rank.value - Rank.Two.value) * 4 + SUITS.index(suit)
+
+
+"""
+retrieves the Card object of a card integer, e.g. to display it (the objects are shared, they must not be changed)
+"""
+def to_card(card: int) -> Card:
+    return CARDS[card]
+
+
+"""
+retrieves the rank of a card integer
+"""
+def get_rank(card: int) -> Rank:
+    return RANKS[card >> 2]
+
+
+"""
+retrieves the suit of a card integer
+"""
+def get_suit(card: int) -> Suit:
+    return SUITS[card & 3]
@@ -0,0 +1,237 @@
+import time
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from games.hlpoker.card import NUM_CARDS
+from games.hlpoker.evaluator import HandEvaluator
+
+"""
+Every pair of cards an opponent can hold, as an array of 1326 x 2 cards (the smallest card first). The ranges of the
+opponent are given as one weight per pair, in this order
+"""
+ALL_HANDS = np.array(list(combinations(range(NUM_CARDS), 2)), dtype=np.int64)
+
+
+"""
+retrieves the index of a pair of cards in ALL_HANDS
+"""
+def get_hand_index(card1: int, card2: int) -> int:
+    low, high = min(card1, card2), max(card1, card2)
+    # the pairs are sorted by their first card, and card c is the first card of (NUM_CARDS - 1 - c) pairs
+    return comb(NUM_CARDS, 2) - comb(NUM_CARDS - low, 2) + high - low - 1
+
+
+class Equity:
+    """
+    the equity of a hand against the range of the opponent:
+        - win_probability and tie_probability: the probabilities to win and to tie at the showdown
+        - equity: the share of the pot won on average, win_probability + tie_probability / 2. It is also the expected
+          hand strength (EHS): the mean, over the boards the game can end with, of the strength of the hand on that
+          board (the share of the pot it wins against the range)
+        - ehs2: the mean of the squared hand strengths (EHS²), which is higher for the hands whose strength depends
+          more on the next cards (draws)
+        - num_boards: the number of final boards that were evaluated
+        - exact: True if every final board and hand of the opponent was evaluated, False if they were sampled
+    """
+    def __init__(self, win_probability, tie_probability, ehs2, num_boards, exact):
+        self.win_probability = win_probability
+        self.tie_probability = tie_probability
+        self.equity = win_probability + tie_probability / 2
+        self.ehs = self.equity
+        self.ehs2 = ehs2
+        self.num_boards = num_boards
+        self.exact = exact
+
+    def __str__(self):
+        return f"equity {self.equity:.3f} (win {self.win_probability:.3f}, tie {self.tie_probability:.3f}) | " \
+               f"EHS² {self.ehs2:.3f} | {'exact' if self.exact else 'sampled'} on {self.num_boards} boards"
+
+
+class EquityCalculator:
+    """
+    computes the equity of a hand (see Equity) from its private cards and the board cards, against a range of hands of
+    the opponent (every hand by default), with HandEvaluator:
+        - when few cards are missing, every final board is enumerated with every hand of the opponent
+        - otherwise, final boards are sampled, with several hands of the opponent per board so that the strength of the
+          hand on each board can be estimated (its square too, without bias)
+    In both cases, a pair of board and opponent hand is as likely as the weight of the hand in the range (the pairs
+    that share a card are impossible).
+    """
+
+    """
+    :param max_exact_evaluations: the enumeration is used when it evaluates at most this number of hands
+    :param opponents_per_board: the number of hands of the opponent sampled for each sampled board
+    """
+    def __init__(self, evaluator: HandEvaluator = None, max_exact_evaluations: int = 50000,
+                 opponents_per_board: int = 8):
+        self.__evaluator = evaluator if evaluator is not None else HandEvaluator()
+        self.max_exact_evaluations = max_exact_evaluations
+        self.opponents_per_board = opponents_per_board
+
+    """
+    computes the equity of a hand
+    :param private_cards: the two cards of the hand
+    :param board_cards: the 0 to 5 cards of the board
+    :param opponent_range: the weight of every hand of the opponent (see ALL_HANDS), or a list of hands (pairs of
+    cards), or a dict with the weight of each hand. By default, every hand has the same weight
+    :param num_samples: the number of hands of the opponent evaluated when sampling
+    :param time_budget: if given, samples are evaluated (by batches of num_samples) until this number of seconds
+    :param rng: the NumPy random generator used to sample (players should derive it from their own one, see get_rng)
+    """
+    def compute(self, private_cards, board_cards, opponent_range=None, num_samples: int = 4096,
+                time_budget: float = None, rng: np.random.Generator = None) -> Equity:
+        start_time = time.perf_counter()
+        private_cards = list(private_cards)
+        board_cards = list(board_cards)
+        known_cards = private_cards + board_cards
+        if len(private_cards) != 2 or len(board_cards) > 5 or len(set(known_cards)) != len(known_cards):
+            raise ValueError("There must be 2 private cards and up to 5 different board cards")
+
+        weights = EquityCalculator.__get_weights(opponent_range)
+        # the hands of the opponent that hold a known card are impossible
+        known = np.zeros(NUM_CARDS, dtype=bool)
+        known[known_cards] = True
+        weights[known[ALL_HANDS[:, 0]] | known[ALL_HANDS[:, 1]]] = 0
+        hands = np.flatnonzero(weights)
+        if len(hands) == 0:
+            raise ValueError("The range of the opponent has no possible hand")
+
+        deck = np.flatnonzero(~known)
+        num_missing = 5 - len(board_cards)
+        if comb(len(deck), num_missing) * len(hands) <= self.max_exact_evaluations:
+            return self.__enumerate(private_cards, board_cards, deck, hands, weights[hands])
+
+        if rng is None:
+            rng = np.random.default_rng()
+        totals = np.zeros(4)
+        num_boards = 0
+        while True:
+            totals += self.__sample(private_cards, board_cards, deck, hands, weights, num_samples, rng)
+            num_boards += max(1, num_samples // self.opponents_per_board)
+            if time_budget is None or time.perf_counter() - start_time >= time_budget:
+                break
+
+        board_weight, win, tie, ehs2 = totals
+        return Equity(win / board_weight, tie / board_weight, ehs2 / board_weight, num_boards, False)
+
+    """
+    evaluates every final board against every hand of the opponent
+    """
+    def __enumerate(self, private_cards, board_cards, deck, hands, hand_weights):
+        num_missing = 5 - len(board_cards)
+        missing_cards = list(combinations(deck, num_missing))
+        missing_cards = np.array(missing_cards, dtype=np.int64).reshape(len(missing_cards), num_missing)
+        boards = np.hstack([np.tile(board_cards, (len(missing_cards), 1)).astype(np.int64), missing_cards])
+
+        # the hands of the opponent that hold a card of the board are impossible on that board, the other pairs of
+        # board and hand are evaluated
+        opponent_cards = ALL_HANDS[hands]
+        on_board = np.zeros((len(boards), NUM_CARDS), dtype=bool)
+        on_board[np.arange(len(boards))[:, None], missing_cards] = True
+        conflicts = on_board[:, opponent_cards[:, 0]] | on_board[:, opponent_cards[:, 1]]
+        board_indexes, hand_indexes = np.nonzero(~conflicts)
+
+        ranks = self.__evaluator.evaluate(np.hstack([np.tile(private_cards, (len(boards), 1)), boards]))
+        opponent_ranks = self.__evaluator.evaluate(np.hstack([boards[board_indexes], opponent_cards[hand_indexes]]))
+
+        # lower ranks are better
+        pair_weights = hand_weights[hand_indexes]
+        outcomes = ranks[board_indexes] - opponent_ranks.astype(np.int32)
+        wins = np.bincount(board_indexes, weights=pair_weights * (outcomes < 0), minlength=len(boards))
+        ties = np.bincount(board_indexes, weights=pair_weights * (outcomes == 0), minlength=len(boards))
+        board_weights = np.bincount(board_indexes, weights=pair_weights, minlength=len(boards))
+        strengths = (wins + ties / 2) / np.maximum(board_weights, 1e-300)
+
+        total_weight = board_weights.sum()
+        return Equity(wins.sum() / total_weight, ties.sum() / total_weight,
+                      (board_weights * strengths ** 2).sum() / total_weight, len(boards), True)
+
+    """
+    samples boards, and hands of the opponent on each board
+    :return: the sums, over the boards, of the weight of the board and of its weighted win probability, tie
+    probability and squared hand strength
+    """
+    def __sample(self, private_cards, board_cards, deck, hands, weights, num_samples, rng):
+        num_missing = 5 - len(board_cards)
+        opponents_per_board = self.opponents_per_board
+        num_boards = max(1, num_samples // opponents_per_board)
+
+        # the missing cards of each board, drawn without replacement from the deck
+        missing_cards = deck[np.argsort(rng.random((num_boards, len(deck))), axis=1)[:, :num_missing]]
+        boards = np.hstack([np.tile(board_cards, (num_boards, 1)).astype(np.int64), missing_cards])
+
+        # the boards are drawn uniformly, but a board is as likely as the total weight of the hands it leaves to the
+        # opponent: the weight of the range, minus the hands that hold one of its cards (the hands that hold two of
+        # them were subtracted twice)
+        card_weights = np.bincount(ALL_HANDS.ravel(), weights=np.repeat(weights, 2), minlength=NUM_CARDS)
+        board_weights = weights.sum() - card_weights[missing_cards].sum(axis=1)
+        for first, second in combinations(range(num_missing), 2):
+            board_weights += weights[EquityCalculator.__get_hand_indexes(missing_cards[:, first],
+                                                                       missing_cards[:, second])]
+        # the boards that leave no hand to the opponent are impossible
+        possible = board_weights > weights.sum() * 1e-9
+        if not possible.any():
+            return np.zeros(4)
+        missing_cards = missing_cards[possible]
+        boards = boards[possible]
+        board_weights = board_weights[possible]
+        num_boards = len(boards)
+
+        # the hands of the opponent of each board, drawn from the range until none of them holds a card of the board
+        on_board = np.zeros((num_boards, NUM_CARDS), dtype=bool)
+        on_board[np.arange(num_boards)[:, None], missing_cards] = True
+        probabilities = weights[hands] / weights[hands].sum()
+        opponent_hands = hands[rng.choice(len(hands), size=(num_boards, opponents_per_board), p=probabilities)]
+        board_indexes = np.arange(num_boards)[:, None]
+        while True:
+            conflicts = on_board[board_indexes, ALL_HANDS[opponent_hands, 0]] | \
+                on_board[board_indexes, ALL_HANDS[opponent_hands, 1]]
+            num_conflicts = np.count_nonzero(conflicts)
+            if num_conflicts == 0:
+                break
+            opponent_hands[conflicts] = hands[rng.choice(len(hands), size=num_conflicts, p=probabilities)]
+
+        ranks = self.__evaluator.evaluate(np.hstack([np.tile(private_cards, (num_boards, 1)), boards]))
+        opponent_cards = ALL_HANDS[opponent_hands]
+        opponent_ranks = self.__evaluator.evaluate(
+            np.concatenate([np.repeat(boards[:, None, :], opponents_per_board, axis=1), opponent_cards], axis=2)
+            .reshape(-1, 7)).reshape(num_boards, opponents_per_board)
+
+        wins = (ranks[:, None] < opponent_ranks).mean(axis=1)
+        ties = (ranks[:, None] == opponent_ranks).mean(axis=1)
+        # the square of the strength of a board is estimated without bias from its samples: the mean of the products
+        # of two different samples
+        outcomes = (ranks[:, None] < opponent_ranks) + (ranks[:, None] == opponent_ranks) / 2
+        if opponents_per_board > 1:
+            sums = outcomes.sum(axis=1)
+            num_products = opponents_per_board * (opponents_per_board - 1)
+            squared_strengths = (sums ** 2 - (outcomes ** 2).sum(axis=1)) / num_products
+        else:
+            squared_strengths = outcomes[:, 0] ** 2
+
+        return np.array([board_weights.sum(), (board_weights * wins).sum(), (board_weights * ties).sum(),
+                         (board_weights * squared_strengths).sum()])
+
+    """
+    the weight of every hand of the opponent (see ALL_HANDS), from a range given in any of the accepted forms
+    """
+    @staticmethod
+    def __get_weights(opponent_range):
+        if opponent_range is None:
+            return np.ones(len(ALL_HANDS))
+        if isinstance(opponent_range, np.ndarray) and opponent_range.shape == (len(ALL_HANDS),):
+            return opponent_range.astype(np.float64)
+
+        weights = np.zeros(len(ALL_HANDS))
+        items = opponent_range.items() if isinstance(opponent_range, dict) else ((hand, 1.0) for hand in opponent_range)
+        for (card1, card2), weight in items:
+            weights[get_hand_index(card1, card2)] = weight
+        return weights
+
+    @staticmethod
+    def __get_hand_indexes(cards1, cards2):
+        low = np.minimum(cards1, cards2)
+        high = np.maximum(cards1, cards2)
+        return comb(NUM_CARDS, 2) - (NUM_CARDS - low) * (NUM_CARDS - low - 1) // 2 + high - low - 1
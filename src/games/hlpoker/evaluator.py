@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+from math import comb
+from pathlib import Path
+
+import numpy as np
+from phevaluator.evaluator import evaluate_cards
+
+from games.hlpoker.card import NUM_CARDS
+
+
+class HandEvaluator:
+    """
+    evaluates many 7 card hands at once with NumPy, with the same ranks as phevaluator (lower is better).
+    The cards are integers (see games.hlpoker.card), so the rank index of a card is card >> 2 and its suit card & 3.
+    Two tables, built once from phevaluator (see build) and memory mapped, give the rank of every hand:
+        - with 5 or more cards of the same suit, the hand is a flush (in 7 cards, a flush can't be beaten by quads or a
+          full house). Its rank only depends on the ranks of the cards of that suit: the flush table is indexed by
+          their 13 bits mask
+        - otherwise, the rank only depends on the multiset of the ranks, which is indexed by a perfect hash: with the
+          rank indexes sorted, r_0 <= ... <= r_6, the numbers r_i + i are all different, so the hash is their index in
+          the combinatorial number system, the sum of C(r_i + i, i + 1), below C(19, 7)
+    """
+
+    NUM_HAND_CARDS = 7
+
+    """
+    the size of the flush table (one entry per mask of 13 ranks) and of the rank multiset table
+    """
+    FLUSH_TABLE_SIZE = 1 << 13
+    RANK_TABLE_SIZE = comb(13 + NUM_HAND_CARDS - 1, NUM_HAND_CARDS)
+
+    """
+    the file of the tables, which is built the first time it is needed
+    """
+    DEFAULT_PATH = Path(__file__).parent / "data" / "hand_ranks.npy"
+
+    """
+    the rank index, the rank bit (for the flush masks) and the suit field (see evaluate) of each card
+    """
+    __CARD_RANKS = np.arange(NUM_CARDS, dtype=np.uint8) >> 2
+    __CARD_RANK_BITS = np.left_shift(1, np.arange(NUM_CARDS) >> 2).astype(np.uint16)
+    __CARD_SUIT_FIELDS = np.left_shift(1, 4 * (np.arange(NUM_CARDS) & 3)).astype(np.uint16)
+
+    """
+    the term of the hash of the i-th sorted card, C(r_i + i, i + 1), for each card position and rank index
+    """
+    __HASH_TERMS = [np.array([comb(rank + index, index + 1) for rank in range(13)], dtype=np.int32)
+                    for index in range(NUM_HAND_CARDS)]
+
+    """
+    the optimal sorting network of 7 items: the pairs of positions to compare and swap, in order
+    """
+    __SORTING_NETWORK = ((0, 6), (2, 3), (4, 5), (0, 2), (1, 4), (3, 6), (0, 1), (2, 5), (3, 4), (1, 2), (4, 6),
+                         (2, 3), (4, 5), (1, 2), (3, 4), (5, 6))
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.__path = Path(path)
+        """
+        the flush table and the rank multiset table, mapped the first time the evaluator is used
+        """
+        self.__flush_ranks = None
+        self.__multiset_ranks = None
+
+    """
+    evaluates hands of 7 cards
+    :param hands: an array of N x 7 card integers
+    :return: the N ranks, as phevaluator.evaluate_cards would return them
+    """
+    def evaluate(self, hands) -> np.ndarray:
+        self.__load()
+        hands = np.asarray(hands)
+        if hands.ndim != 2 or hands.shape[1] != HandEvaluator.NUM_HAND_CARDS:
+            raise ValueError(f"The hands must be an array of N x {HandEvaluator.NUM_HAND_CARDS} cards")
+
+        # the rank indexes of each card position, sorted with a sorting network, which is much faster than sorting
+        # each hand on its own
+        ranks = [HandEvaluator.__CARD_RANKS[hands[:, index]] for index in range(HandEvaluator.NUM_HAND_CARDS)]
+        for first, second in HandEvaluator.__SORTING_NETWORK:
+            ranks[first], ranks[second] = np.minimum(ranks[first], ranks[second]), np.maximum(ranks[first], ranks[second])
+
+        hashes = HandEvaluator.__HASH_TERMS[0][ranks[0]]
+        for index in range(1, HandEvaluator.NUM_HAND_CARDS):
+            hashes += HandEvaluator.__HASH_TERMS[index][ranks[index]]
+        hand_ranks = self.__multiset_ranks[hashes]
+
+        # the number of cards of each suit is counted in a field of 4 bits: a field holds 5 or more when adding 3 to
+        # it sets its top bit
+        suit_counts = HandEvaluator.__CARD_SUIT_FIELDS[hands].sum(axis=1, dtype=np.uint16)
+        flush_bits = (suit_counts + 0x3333) & 0x8888
+        flushes = np.flatnonzero(flush_bits)
+        if len(flushes):
+            # the flushes, which are rare, replace the ranks of their hands (there is at most one flush suit)
+            flush_bits = flush_bits[flushes]
+            flush_suits = (flush_bits > 0x8).astype(np.int64) + (flush_bits > 0x80) + (flush_bits > 0x800)
+            flush_hands = hands[flushes]
+            in_suit = (flush_hands & 3) == flush_suits[:, None]
+            # the ranks of a suit are all different, so their bits can be added
+            masks = np.where(in_suit, HandEvaluator.__CARD_RANK_BITS[flush_hands], 0).sum(axis=1)
+            hand_ranks[flushes] = self.__flush_ranks[masks]
+
+        return hand_ranks
+
+    """
+    builds the tables with phevaluator and writes them to a file
+    """
+    @staticmethod
+    def build(path=DEFAULT_PATH):
+        table = np.zeros(HandEvaluator.FLUSH_TABLE_SIZE + HandEvaluator.RANK_TABLE_SIZE, dtype='<u2')
+
+        # the flushes: cards of a single suit (clubs)
+        for mask in range(HandEvaluator.FLUSH_TABLE_SIZE):
+            num_cards = mask.bit_count()
+            if 5 <= num_cards <= HandEvaluator.NUM_HAND_CARDS:
+                table[mask] = evaluate_cards(*[rank * 4 for rank in range(13) if mask & (1 << rank)])
+
+        # the rank multisets, the cards of a rank get different suits and no suit gets 5 cards
+        def add_multisets(multiset, first_rank):
+            if len(multiset) == HandEvaluator.NUM_HAND_CARDS:
+                cards = [rank * 4 + index % 4 for index, rank in enumerate(multiset)]
+                multiset_hash = sum(comb(rank + index, index + 1) for index, rank in enumerate(multiset))
+                table[HandEvaluator.FLUSH_TABLE_SIZE + multiset_hash] = evaluate_cards(*cards)
+                return
+            for rank in range(first_rank, 13):
+                if multiset[-4:].count(rank) < 4:
+                    add_multisets(multiset + [rank], rank)
+
+        add_multisets([], 0)
+
+        # the file is replaced at once, so that other processes never read a partial file
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+        np.save(temporary_path, table)
+        os.replace(temporary_path, path)
+
+    def __load(self):
+        if self.__multiset_ranks is not None:
+            return
+
+        if not self.__path.is_file():
+            HandEvaluator.build(self.__path)
+        table = np.load(self.__path, mmap_mode='r')
+        if table.shape != (HandEvaluator.FLUSH_TABLE_SIZE + HandEvaluator.RANK_TABLE_SIZE,):
+            raise ValueError(f"{self.__path} is not a table of hand ranks")
+
+        # plain views of the mapped file, the pages are only read when they are used
+        self.__flush_ranks = np.asarray(table[:HandEvaluator.FLUSH_TABLE_SIZE])
+        self.__multiset_ranks = np.asarray(table[HandEvaluator.FLUSH_TABLE_SIZE:])
+
+
+"""
+Checks the evaluator against phevaluator on random hands, and prints the number of hands evaluated per second
+"""
+def main():
+    evaluator = HandEvaluator()
+    rng = np.random.default_rng(0)
+    num_hands = 200000
+    hands = np.argsort(rng.random((num_hands, NUM_CARDS)), axis=1)[:, :HandEvaluator.NUM_HAND_CARDS]
+
+    start_time = time.perf_counter()
+    ranks = evaluator.evaluate(hands)
+    elapsed_time = time.perf_counter() - start_time
+
+    expected_ranks = np.array([evaluate_cards(*hand) for hand in hands.tolist()])
+    num_wrong = int(np.count_nonzero(ranks != expected_ranks))
+    print(f"Hands: {num_hands} | Hands per second: {num_hands / elapsed_time:.0f} | Wrong ranks: {num_wrong}")
+    if num_wrong:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
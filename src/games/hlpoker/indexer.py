@@ -0,0 +1,361 @@
+import sys
+import time
+from itertools import product
+from math import comb
+
+import numpy as np
+
+from games.hlpoker.card import NUM_CARDS
+from games.hlpoker.round import Round
+
+NUM_RANKS = 13
+NUM_SUITS = 4
+
+"""
+the number of private cards, and the number of board cards of each round
+"""
+NUM_PRIVATE_CARDS = 2
+BOARD_CARDS = {Round.Preflop: 0, Round.Flop: 3, Round.Turn: 4, Round.River: 5}
+
+"""
+the number of bits of the count of private or board cards of a suit, of the code of a suit (both counts, see
+HandIndexer), and of the index of a suit, in the sort keys of the suits
+"""
+COUNT_BITS = 3
+CODE_BITS = 2 * COUNT_BITS
+SUIT_INDEX_BITS = 32
+
+
+class HandIndexer:
+    """
+    maps the private cards and the board cards of a round to a dense index, where the hands that only differ by a
+    permutation of the suits share the same index (e.g. 2.6M flops with their private cards become 1.3M hands, and
+    2.8 billion rivers become 123M hands), and back to a canonical hand of each index. The private cards and the board
+    cards are two sets, their order does not matter. Hands are indexed in batches with NumPy, as in "A Fast and Optimal
+    Hand Isomorphism Algorithm" (Waugh, 2013):
+        - each suit holds a set of ranks in the private cards and one in the board cards. Its code is the number of
+          cards of each set, and its index is the mixed radix number of the index of the private ranks and of the
+          index of the board ranks among the ranks that are not private (in colex order)
+        - the suits are sorted by code and index. The sorted codes are the configuration of the hand, and the hands of
+          a configuration are numbered after the hands of the previous configurations
+        - within a configuration, the suits that share a code are interchangeable, so the sorted indexes of each group
+          of such suits are a multiset, numbered in the combinatorial number system, and the groups are combined as a
+          mixed radix number
+    """
+
+    """
+    the masks of 13 ranks sorted by number of ranks and then in colex order (the numeric order of their bits), the
+    position of the first mask of each number of ranks, and the index of every mask among the masks of its number of
+    ranks
+    """
+    __POPCOUNTS = np.array([bin(mask).count("1") for mask in range(1 << NUM_RANKS)], dtype=np.int64)
+    __COLEX_MASKS = np.lexsort((np.arange(1 << NUM_RANKS), __POPCOUNTS))
+    __COLEX_STARTS = np.concatenate([[0], np.cumsum(np.bincount(__POPCOUNTS))])
+    __COLEX_INDEXES = np.argsort(__COLEX_MASKS) - __COLEX_STARTS[__POPCOUNTS]
+
+    def __init__(self, round: Round):
+        if round not in BOARD_CARDS:
+            raise ValueError(f"There is no hand to index in the {round} round")
+        self.__round = round
+        """
+        the number of cards of each set of cards of a hand: the private cards, and the board cards if there are some
+        """
+        self.__cards_per_set = (NUM_PRIVATE_CARDS, BOARD_CARDS[round]) if BOARD_CARDS[round] else (NUM_PRIVATE_CARDS,)
+        self.__num_cards = sum(self.__cards_per_set)
+        """
+        the set of each card of a hand
+        """
+        self.__card_sets = np.repeat(np.arange(len(self.__cards_per_set)), self.__cards_per_set)
+
+        # the possible codes of a suit, and the number of indexes of each of them
+        num_sets = len(self.__cards_per_set)
+        self.__suit_counts = list(product(*[range(cards + 1) for cards in self.__cards_per_set]))
+        self.__num_suit_indexes = np.zeros(1 << CODE_BITS, dtype=np.int64)
+        for counts in self.__suit_counts:
+            num_indexes = 1
+            num_used = 0
+            for count in counts:
+                num_indexes *= comb(NUM_RANKS - num_used, count)
+                num_used += count
+            self.__num_suit_indexes[HandIndexer.__get_code(counts)] = num_indexes
+
+        # the configurations (sorted codes of the 4 suits) and the number of hands of each of them
+        configurations = []
+        self.__add_configurations([], [0] * num_sets, configurations)
+        configurations.sort(key=HandIndexer.__get_configuration_key)
+        self.__configuration_keys = np.array([HandIndexer.__get_configuration_key(codes) for codes in configurations],
+                                             dtype=np.int64)
+        self.__configuration_codes = np.array(configurations, dtype=np.int64)
+        sizes = [self.__get_configuration_size(codes) for codes in configurations]
+        self.__offsets = np.array([0] + sizes, dtype=np.int64).cumsum()
+        self.__size = int(self.__offsets[-1])
+
+        # for the groups of 2 or more suits of a configuration, the combinations with repetition of their indexes are
+        # unranked with a binary search in these tables
+        max_group_index = max([int(self.__num_suit_indexes[code]) + NUM_SUITS
+                               for codes in configurations for code in set(codes) if codes.count(code) > 1] + [0])
+        self.__comb_tables = [None, None] + [np.array([comb(value, size) for value in range(max_group_index + 1)],
+                                                      dtype=np.int64) for size in range(2, NUM_SUITS + 1)]
+
+    def get_round(self):
+        return self.__round
+
+    def get_num_cards(self):
+        return self.__num_cards
+
+    """
+    retrieves the number of indexes, i.e. the number of hands that differ by more than a permutation of the suits
+    """
+    def get_size(self):
+        return self.__size
+
+    """
+    indexes a hand
+    :param private_cards: the 2 private cards
+    :param board_cards: the board cards of the round (0, 3, 4 or 5)
+    """
+    def index(self, private_cards, board_cards) -> int:
+        return int(self.index_batch([list(private_cards) + list(board_cards)])[0])
+
+    """
+    retrieves the canonical hand of an index
+    :return: the private cards and the board cards, each in increasing order
+    """
+    def unindex(self, index: int):
+        cards = self.unindex_batch([index])[0].tolist()
+        return cards[:NUM_PRIVATE_CARDS], cards[NUM_PRIVATE_CARDS:]
+
+    """
+    indexes hands
+    :param hands: an array of N hands, the private cards followed by the board cards of the round
+    :return: the N indexes
+    """
+    def index_batch(self, hands) -> np.ndarray:
+        hands = np.asarray(hands, dtype=np.int64)
+        if hands.ndim != 2 or hands.shape[1] != self.__num_cards:
+            raise ValueError(f"The hands must be an array of N x {self.__num_cards} cards")
+        if hands.size and (hands.min() < 0 or hands.max() >= NUM_CARDS):
+            raise ValueError(f"The cards must be integers from 0 to {NUM_CARDS - 1}")
+        num_hands = len(hands)
+        rows = np.arange(num_hands)
+
+        # the ranks of each suit in each set of cards
+        masks = np.zeros((num_hands, NUM_SUITS, len(self.__cards_per_set)), dtype=np.int64)
+        for position, card_set in enumerate(self.__card_sets):
+            masks[rows, hands[:, position] & 3, card_set] |= 1 << (hands[:, position] >> 2)
+        counts = HandIndexer.__POPCOUNTS[masks]
+        if np.any(counts.sum(axis=1) != self.__cards_per_set):
+            raise ValueError("The cards of a hand must all be different")
+
+        # the code and the index of each suit
+        codes = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        suit_indexes = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        used = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        for card_set in range(len(self.__cards_per_set)):
+            set_masks = masks[:, :, card_set]
+            num_free = NUM_RANKS - HandIndexer.__POPCOUNTS[used]
+            set_index = HandIndexer.__COLEX_INDEXES[HandIndexer.__extract_bits(set_masks, used)]
+            suit_indexes = suit_indexes * HandIndexer.__comb(num_free, counts[:, :, card_set]) + set_index
+            codes |= counts[:, :, card_set] << (COUNT_BITS * card_set)
+            used |= set_masks
+
+        # the suits sorted by code and index, and the configuration of each hand
+        keys = np.sort((codes << SUIT_INDEX_BITS) | suit_indexes, axis=1)
+        codes = keys >> SUIT_INDEX_BITS
+        suit_indexes = keys & ((1 << SUIT_INDEX_BITS) - 1)
+        configurations = np.searchsorted(self.__configuration_keys, HandIndexer.__get_configuration_key(codes.T))
+
+        # the index within the configuration: the groups of suits with the same code, as a mixed radix number
+        indexes = np.zeros(num_hands, dtype=np.int64)
+        group_index = np.zeros(num_hands, dtype=np.int64)
+        position_in_group = np.zeros(num_hands, dtype=np.int64)
+        for position in range(NUM_SUITS):
+            if position > 0:
+                same_group = codes[:, position] == codes[:, position - 1]
+                group_size = self.__get_group_size(codes[:, position - 1], position_in_group + 1)
+                indexes = np.where(same_group, indexes, indexes * group_size + group_index)
+                group_index = np.where(same_group, group_index, 0)
+                position_in_group = np.where(same_group, position_in_group + 1, 0)
+            group_index += HandIndexer.__comb(suit_indexes[:, position] + position_in_group, position_in_group + 1)
+        group_size = self.__get_group_size(codes[:, -1], position_in_group + 1)
+        indexes = indexes * group_size + group_index
+
+        return self.__offsets[configurations] + indexes
+
+    """
+    retrieves the canonical hands of indexes
+    :param indexes: an array of N indexes
+    :return: the N x get_num_cards() cards of the hands, the private cards followed by the board cards, in increasing
+    order within each set
+    """
+    def unindex_batch(self, indexes) -> np.ndarray:
+        indexes = np.asarray(indexes, dtype=np.int64).ravel()
+        if indexes.size and (indexes.min() < 0 or indexes.max() >= self.__size):
+            raise ValueError(f"The indexes must be integers from 0 to {self.__size - 1}")
+        num_hands = len(indexes)
+
+        configurations = np.searchsorted(self.__offsets, indexes, side='right') - 1
+        remainders = indexes - self.__offsets[configurations]
+        codes = self.__configuration_codes[configurations]
+
+        # the groups of suits, unranked from the last one (the least significant digit of the configuration index)
+        last_in_group = np.ones((num_hands, NUM_SUITS), dtype=bool)
+        last_in_group[:, :-1] = codes[:, 1:] != codes[:, :-1]
+        positions_in_group = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        for position in range(1, NUM_SUITS):
+            positions_in_group[:, position] = np.where(codes[:, position] == codes[:, position - 1],
+                                                       positions_in_group[:, position - 1] + 1, 0)
+
+        suit_indexes = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        group_index = np.zeros(num_hands, dtype=np.int64)
+        for position in reversed(range(NUM_SUITS)):
+            position_in_group = positions_in_group[:, position]
+            last = last_in_group[:, position]
+            group_size = self.__get_group_size(codes[:, position], position_in_group + 1)
+            group_index = np.where(last, remainders % group_size, group_index)
+            remainders = np.where(last, remainders // group_size, remainders)
+
+            # the largest value whose combination fits in the rest of the group index
+            values = group_index.copy()
+            for size in range(2, NUM_SUITS + 1):
+                in_size = position_in_group + 1 == size
+                if in_size.any():
+                    table = self.__comb_tables[size]
+                    values[in_size] = np.searchsorted(table, group_index[in_size], side='right') - 1
+            suit_indexes[:, position] = values - position_in_group
+            group_index = group_index - HandIndexer.__comb(values, position_in_group + 1)
+
+        # the ranks of each suit in each set of cards, from the digits of its index
+        num_sets = len(self.__cards_per_set)
+        counts = [(codes >> (COUNT_BITS * card_set)) & ((1 << COUNT_BITS) - 1) for card_set in range(num_sets)]
+        num_free = [NUM_RANKS - sum(counts[:card_set]) for card_set in range(num_sets)]
+        set_indexes = [None] * num_sets
+        for card_set in reversed(range(num_sets)):
+            radix = HandIndexer.__comb(num_free[card_set], counts[card_set])
+            set_indexes[card_set] = suit_indexes % radix
+            suit_indexes = suit_indexes // radix
+
+        cards = []
+        used = np.zeros((num_hands, NUM_SUITS), dtype=np.int64)
+        for card_set in range(num_sets):
+            compressed = HandIndexer.__COLEX_MASKS[HandIndexer.__COLEX_STARTS[counts[card_set]] +
+                                                   set_indexes[card_set]]
+            set_masks = HandIndexer.__deposit_bits(compressed, used)
+            used |= set_masks
+
+            # the cards of the set, the suits of the hand taking the canonical suits 0 to 3 in their sorted order
+            present = np.zeros((num_hands, NUM_RANKS, NUM_SUITS), dtype=bool)
+            for rank in range(NUM_RANKS):
+                present[:, rank, :] = (set_masks >> rank) & 1
+            _, set_cards = np.nonzero(present.reshape(num_hands, NUM_CARDS))
+            cards.append(set_cards.reshape(num_hands, self.__cards_per_set[card_set]))
+
+        return np.hstack(cards)
+
+    """
+    adds the configurations that start with the given sorted codes, which hold used_counts cards of each set
+    """
+    def __add_configurations(self, codes, used_counts, configurations):
+        if len(codes) == NUM_SUITS:
+            if all(count == cards for count, cards in zip(used_counts, self.__cards_per_set)):
+                configurations.append(tuple(codes))
+            return
+        for counts in self.__suit_counts:
+            code = HandIndexer.__get_code(counts)
+            if codes and code < codes[-1]:
+                continue
+            new_counts = [used + count for used, count in zip(used_counts, counts)]
+            if all(used <= cards for used, cards in zip(new_counts, self.__cards_per_set)):
+                self.__add_configurations(codes + [code], new_counts, configurations)
+
+    def __get_configuration_size(self, codes):
+        size = 1
+        for code in set(codes):
+            size *= comb(int(self.__num_suit_indexes[code]) + codes.count(code) - 1, codes.count(code))
+        return size
+
+    """
+    the number of multisets of group_length indexes of suits with a code
+    """
+    def __get_group_size(self, codes, group_lengths):
+        return HandIndexer.__comb(self.__num_suit_indexes[codes] + group_lengths - 1, group_lengths)
+
+    @staticmethod
+    def __get_code(counts):
+        return sum(count << (COUNT_BITS * card_set) for card_set, count in enumerate(counts))
+
+    """
+    the key of sorted codes, which orders the configurations (the codes can be numbers or arrays)
+    """
+    @staticmethod
+    def __get_configuration_key(codes):
+        return sum(code << (CODE_BITS * position) for position, code in enumerate(codes))
+
+    """
+    C(values, sizes) for arrays of values and of sizes, computed with exact integer divisions
+    """
+    @staticmethod
+    def __comb(values, sizes):
+        values = np.asarray(values, dtype=np.int64)
+        results = np.ones(np.broadcast(values, sizes).shape, dtype=np.int64)
+        for size in range(1, int(np.max(sizes, initial=0)) + 1):
+            results = np.where(size <= sizes, results * (values - size + 1) // size, results)
+        return np.where(values >= sizes, results, 0)
+
+    """
+    removes the bits of the used ranks from masks, moving the bits above them down (as the PEXT instruction)
+    """
+    @staticmethod
+    def __extract_bits(masks, used):
+        results = np.zeros_like(masks)
+        positions = np.zeros_like(masks)
+        for rank in range(NUM_RANKS):
+            free = ((used >> rank) & 1) == 0
+            results |= np.where(free, ((masks >> rank) & 1) << positions, 0)
+            positions += free
+        return results
+
+    """
+    spreads the bits of masks over the ranks that are not used (as the PDEP instruction)
+    """
+    @staticmethod
+    def __deposit_bits(masks, used):
+        results = np.zeros_like(masks)
+        positions = np.zeros_like(masks)
+        for rank in range(NUM_RANKS):
+            free = ((used >> rank) & 1) == 0
+            results |= np.where(free, ((masks >> positions) & 1) << rank, 0)
+            positions += free
+        return results
+
+
+"""
+Prints the number of indexes of each round, and checks that random hands get the index of their canonical hand and of
+their suit permutations
+"""
+def main():
+    rng = np.random.default_rng(0)
+    num_hands = 100000
+    num_wrong = 0
+    for round in (Round.Preflop, Round.Flop, Round.Turn, Round.River):
+        indexer = HandIndexer(round)
+        hands = np.argsort(rng.random((num_hands, NUM_CARDS)), axis=1)[:, :indexer.get_num_cards()]
+
+        start_time = time.perf_counter()
+        indexes = indexer.index_batch(hands)
+        elapsed_time = time.perf_counter() - start_time
+
+        suits = np.array([rng.permutation(NUM_SUITS) for _ in range(num_hands)])
+        permuted_hands = (hands & ~3) | np.take_along_axis(suits, hands & 3, axis=1)
+        canonical_hands = indexer.unindex_batch(indexes)
+        num_wrong += int(np.count_nonzero(indexer.index_batch(permuted_hands) != indexes))
+        num_wrong += int(np.count_nonzero(indexer.index_batch(canonical_hands) != indexes))
+        print(f"{round}: {indexer.get_size()} indexes | Hands indexed per second: {num_hands / elapsed_time:.0f}")
+
+    print(f"Wrong indexes: {num_wrong}")
+    if num_wrong:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 
 from termcolor import colored
 
-from games.hlpoker.card import Card, Suit
+from games.hlpoker.card import Suit, get_suit, to_card
 from games.hlpoker.round import Round
 from games.hlpoker.state import HLPokerState
 from games.player import Player
@@ -61,7 +61,7 @@ class HLPokerPlayer(Player, ABC):
     indicate to the player which private cards they will start with
     """
 
-    def event_show_private_cards(self, c1: Card, c2: Card):
+    def event_show_private_cards(self, c1: int, c2: int):
         self.__private_cards[0] = c1
         self.__private_cards[1] = c2
 
@@ -70,7 +70,7 @@ class HLPokerPlayer(Player, ABC):
     where we will get to know the cards of our opponent
     """
 
-    def event_show_opponent_cards(self, c1: Card, c2: Card):
+    def event_show_opponent_cards(self, c1: int, c2: int):
         self.__opponent_cards[0] = c1
         self.__opponent_cards[1] = c2
         pass
@@ -82,14 +82,14 @@ class HLPokerPlayer(Player, ABC):
     :param round new rounds that is being played
     """
 
-    def event_show_board_cards(self, cards: [Card], round):
+    def event_show_board_cards(self, cards: [int], round):
         self.__board_cards.extend(cards)
         self.__current_round = round
         self.event_new_round(self.__current_round)
 
     def print_stats(self):
-        print(
-            f"Player {self.get_name()} | Total profit: ${self.__score} | Profit per game: ${self.get_expected_value()}")
+        # the profit of the player is already printed by the simulator, with the scores of all its games
+        pass
 
     """
     Overrides the original get_action method but includes the cards
@@ -102,8 +102,8 @@ class HLPokerPlayer(Player, ABC):
     @staticmethod
     def print_colored_cards(card_list):
         for card in card_list:
-            color = "black" if card.suit in [Suit.Clubs, Suit.Spades] else "red"
-            colored_card = colored(card.to_symbol_str(), color)
+            color = "black" if get_suit(card) in [Suit.Clubs, Suit.Spades] else "red"
+            colored_card = colored(to_card(card).to_symbol_str(), color)
             print(colored_card, end=" ")
         print()
 
@@ -3,9 +3,8 @@ from games.hlpoker.player import HLPokerPlayer
 from games.hlpoker.round import Round
 from games.hlpoker.state import HLPokerState
 from collections import Counter
-from games.hlpoker.card import Rank, Suit
+from games.hlpoker.card import Rank, get_rank, get_suit
 from games.state import State
-import random
 
 class CFRHLPokerPlayer(HLPokerPlayer):
     def __init__(self, name):
@@ -27,7 +26,7 @@ class CFRHLPokerPlayer(HLPokerPlayer):
             call_probability *= 0.8  # Reduz a probabilidade de call em resposta a raises do oponente
 
         # Escolhe uma ação com base nas probabilidades calculadas
-        action_choice = random.uniform(0, 1)
+        action_choice = self.get_rng().uniform(0, 1)
         if action_choice < raise_probability:
             return HLPokerAction.RAISE
         elif action_choice < raise_probability + call_probability:
@@ -40,13 +39,13 @@ class CFRHLPokerPlayer(HLPokerPlayer):
         Avalia a força de uma mão de poker com base nas cartas fornecidas.
 
         Args:
-            cards (list[Card]): Lista de cartas que compõem a mão.
+            cards (list[int]): Lista de cartas que compõem a mão (ver games.hlpoker.card).
 
         Returns:
             float: Pontuação da mão. Quanto maior, mais forte a mão.
         """
-        rank_counts = Counter(card.rank for card in cards)
-        suit_counts = Counter(card.suit for card in cards)
+        rank_counts = Counter(get_rank(card) for card in cards)
+        suit_counts = Counter(get_suit(card) for card in cards)
 
         # Verifica se há um flush
         flush = any(count >= 5 for count in suit_counts.values())
@@ -37,12 +37,8 @@ class DynamicCacheHeuristicHLPokerPlayer(HLPokerPlayer):
             return HLPokerAction.FOLD
 
     def evaluate_hand_strength(self, private_cards, board_cards):
-        # Converter as instâncias de Card em tuplas hashable
-        private_card_keys = [(card.rank.value, card.suit.value) for card in private_cards]
-        board_card_keys = [(card.rank.value, card.suit.value) for card in board_cards]
-
-        # Verificar se a avaliação já está em cache
-        key = tuple(private_card_keys + board_card_keys)
+        # Verificar se a avaliação já está em cache (as cartas são inteiros, ver games.hlpoker.card)
+        key = tuple(private_cards + board_cards)
         if key in self.hand_strength_cache:
             # Atualizar o contador de hits para a entrada do cache
             self.cache_hit_count[key] += 1
@@ -1,5 +1,9 @@
+import numpy as np
+
 from games.hlpoker.action import HLPokerAction
+from games.hlpoker.equity import EquityCalculator
 from games.hlpoker.player import HLPokerPlayer
+from games.hlpoker.preflop import PreflopEquity
 from games.hlpoker.round import Round
 from games.hlpoker.state import HLPokerState
 from games.state import State
@@ -11,6 +15,8 @@ class AdvancedHeuristicHLPokerPlayer(HLPokerPlayer):
     def __init__(self, name):
         super().__init__(name)
         self.hand_strength_cache = OrderedDict()  # Cache para armazenar as avaliações de força da mão
+        self.equity_calculator = EquityCalculator()
+        self.preflop_equity = PreflopEquity()
         self.max_cache_size = 1000  # Tamanho máximo do cache
         self.cache_hit_count = defaultdict(int)  # Contador de quantas vezes cada avaliação foi usada
 
@@ -21,13 +27,19 @@ class AdvancedHeuristicHLPokerPlayer(HLPokerPlayer):
         # Com base na força da mão e nas informações do jogo, escolher uma ação
         if hand_strength >= 0.7:
             # Se a mão for forte o suficiente, aumentar agressivamente
-            return HLPokerAction.RAISE
+            action = HLPokerAction.RAISE
         elif hand_strength >= 0.5:
             # Se a mão for moderadamente forte, fazer call
-            return HLPokerAction.CALL
+            action = HLPokerAction.CALL
         else:
             # Se a mão for fraca, fazer fold
-            return HLPokerAction.FOLD
+            action = HLPokerAction.FOLD
+
+        # O simulador volta a pedir uma ação enquanto ela não for válida: sem aumentos por pagar não se pode fazer fold,
+        # e depois do máximo de aumentos não se pode aumentar, por isso nesses casos a mão faz call
+        if not state.validate_action(action):
+            return HLPokerAction.CALL
+        return action
 
     def evaluate_hand_strength(self, private_cards, board_cards):
         # Verificar se a avaliação já está em cache
@@ -59,10 +71,12 @@ class AdvancedHeuristicHLPokerPlayer(HLPokerPlayer):
         self.cache_hit_count[key] += 1
 
     def calculate_hand_strength(self, private_cards, board_cards):
-        # Implementar uma heurística simples para avaliar a força da mão
-        # Aqui, podemos considerar critérios como valor do par, número de outs, textura do board, etc.
-        # Utilizar algum algoritmo de avaliação de mãos de poker pode ser útil
-        return 0.5  # Valor fictício para demonstração
+        # A força da mão é a sua equidade contra todas as mãos do adversário (ver games.hlpoker.equity): exata no
+        # turn e no river, estimada por amostragem antes. No preflop, vem da tabela das 169 classes de mãos
+        if not board_cards and self.preflop_equity.is_available():
+            return self.preflop_equity.get_equity(*private_cards)
+        rng = np.random.default_rng(self.get_rng().getrandbits(64))
+        return self.equity_calculator.compute(private_cards, board_cards, rng=rng).equity
 
     # Métodos de eventos não alterados
     def event_my_action(self, action, new_state):
@@ -72,7 +86,8 @@ class AdvancedHeuristicHLPokerPlayer(HLPokerPlayer):
         pass
 
     def event_new_game(self):
-        # Não precisa limpar o cache entre os jogos para manter as avaliações de força da mão
+        # O cache já foi limpo no início do preflop (ver event_new_round), por isso as equidades estimadas por
+        # amostragem nunca passam de um jogo para o outro e cada jogo só depende do seu próprio gerador
         pass
 
     def event_end_game(self, final_state: State):
@@ -82,5 +97,7 @@ class AdvancedHeuristicHLPokerPlayer(HLPokerPlayer):
         pass
 
     def event_new_round(self, round: round):
-        # Limpar o cache no início de um novo round para reavaliar as mãos com base nas novas cartas do tabuleiro
-        self.hand_strength_cache = {}
\ No newline at end of file
+        # Limpar o cache no início de um novo round para reavaliar as mãos com base nas novas cartas do tabuleiro,
+        # com os contadores de hits, que senão cresceriam de jogo para jogo
+        self.hand_strength_cache = OrderedDict()
+        self.cache_hit_count.clear()
\ No newline at end of file
@@ -1,10 +1,13 @@
+import numpy as np
+
 from games.hlpoker.action import HLPokerAction
+from games.hlpoker.card import get_rank, get_suit
+from games.hlpoker.equity import EquityCalculator
 from games.hlpoker.player import HLPokerPlayer
+from games.hlpoker.preflop import PreflopEquity
 from games.hlpoker.state import HLPokerState
 from games.hlpoker.round import Round
-from concurrent.futures import ProcessPoolExecutor
 from collections import Counter
-import random
 import math
 
 class MonteCarloPlayer(HLPokerPlayer):
@@ -20,24 +23,33 @@ class MonteCarloPlayer(HLPokerPlayer):
             "two_pair": 4,
             "pair": 2
         }
+        self.equity_calculator = EquityCalculator()
+        self.preflop_equity = PreflopEquity()
+        self.win_probability_cache = {}
 
     def get_action_with_cards(self, state, private_cards, board_cards):
-        num_simulations_per_process = 200 // 10  # Dividindo o número total de simulações entre 5 processos
-        # Use o número adequado de simulações e ajuste conforme necessário
-        with ProcessPoolExecutor() as executor:
-            futures = [executor.submit(self.run_simulations, state.clone(), private_cards, board_cards, num_simulations_per_process) for _ in range(10)]
-            results = [future.result() for future in futures]
-        return max(state.get_possible_actions(), key=lambda a: self.ucb_value(a))
-
-    def run_simulations(self, state, private_cards, board_cards, num_simulations):
+        num_simulations = 200
+        # As simulações correm neste processo (desfazem as suas ações, por isso são rápidas), para que os contadores
+        # que decidem a ação sejam os atualizados por elas. A probabilidade de vencer só depende das cartas, por isso
+        # é calculada uma vez por decisão
+        hand_strength = self.evaluate_hand(private_cards, board_cards)
+        win_probability = self.calculate_win_probability(hand_strength, state, private_cards, board_cards)
+        self.run_simulations(state.clone(), private_cards, board_cards, win_probability, num_simulations)
+        # A ação escolhida é a mais jogada nas simulações (a que a probabilidade de vencer indica). Em caso de empate,
+        # por exemplo quando essa ação já não é possível, prefere-se o CALL
+        return max(state.get_possible_actions(), key=lambda a: (self.plays[a], a == HLPokerAction.CALL))
+
+    def run_simulations(self, state, private_cards, board_cards, win_probability, num_simulations):
+        # every simulation undoes its actions, so they can all run on the same state
         for _ in range(num_simulations):
-            self.simulate(state.clone(), private_cards, board_cards)
+            self.simulate(state, private_cards, board_cards, win_probability)
 
-    def simulate(self, state, private_cards, board_cards):
+    def simulate(self, state, private_cards, board_cards, win_probability):
         visited = set()
         current_round = state.get_current_round()
         state_tuple = tuple(state.get_sequence())
         own_position = self.get_current_pos()
+        num_actions = 0
 
         while not state.is_finished():
             possible_actions = state.get_possible_actions()
@@ -54,15 +66,10 @@ class MonteCarloPlayer(HLPokerPlayer):
             visited.add(state_tuple)
 
             state.update(action)
+            num_actions += 1
             if tuple(state.get_sequence()) in visited:
                 break
 
-            # Avaliação da mão atual
-            hand_strength = self.evaluate_hand(private_cards, board_cards)
-
-            # Probabilidade de vencer
-            win_probability = self.calculate_win_probability(hand_strength, state, private_cards, board_cards)
-
             # Ajuste da estratégia com base na situação atual
             if win_probability > 0.5:
                 action = HLPokerAction.RAISE  # Aumentar se a probabilidade de vitória for alta
@@ -76,11 +83,19 @@ class MonteCarloPlayer(HLPokerPlayer):
             if state.get_result(own_position) > 0:
                 self.wins[action] += 1
 
+        for _ in range(num_actions):
+            state.undo()
+
     def calculate_win_probability(self, hand_strength, state, private_cards, board_cards):
-        # Lógica para calcular a probabilidade de vitória com base na avaliação da mão e na situação atual do jogo
-        # Você pode implementar uma lógica mais avançada aqui, considerando as informações disponíveis
-        # Como exemplo, retornarei uma probabilidade fixa de 0.5
-        return 0.5
+        # Probabilidade de vencer (com metade dos empates) contra todas as mãos do adversário, calculada uma vez para
+        # cada combinação de cartas (ver games.hlpoker.equity). No preflop, vem da tabela das 169 classes de mãos
+        if not board_cards and self.preflop_equity.is_available():
+            return self.preflop_equity.get_equity(*private_cards)
+        key = tuple(private_cards + board_cards)
+        if key not in self.win_probability_cache:
+            rng = np.random.default_rng(self.get_rng().getrandbits(64))
+            self.win_probability_cache[key] = self.equity_calculator.compute(private_cards, board_cards, rng=rng).equity
+        return self.win_probability_cache[key]
 
     def choose_action_based_on_strategy(self, state, private_cards, board_cards):
         possible_actions = state.get_possible_actions()
@@ -113,7 +128,7 @@ class MonteCarloPlayer(HLPokerPlayer):
     def evaluate_hand_sophisticated(self, private_cards, board_cards):
         hand_combinations = private_cards + board_cards
         # Exemplo: Pontuação baseada na força das cartas mais altas
-        score = sum(card.rank.value for card in hand_combinations) / len(hand_combinations)
+        score = sum(get_rank(card).value for card in hand_combinations) / len(hand_combinations)
         # Adicione lógica para verificar flush, straight, three of a kind, etc.
         # Atualize a pontuação com base na presença dessas combinações
         return score
@@ -137,7 +152,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def evaluate_flush(self, hand):
         # Avalia se há um flush
-        suits = [card.suit for card in hand]
+        suits = [get_suit(card) for card in hand]
         suit_count = Counter(suits)
         if max(suit_count.values()) >= 5:
             return 1
@@ -145,7 +160,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def evaluate_straight(self, hand):
         # Avalia se há uma sequência
-        ranks = sorted([card.rank.value for card in hand])  # Usar os valores das classificações em vez dos objetos Rank
+        ranks = sorted([get_rank(card).value for card in hand])  # Usar os valores das classificações em vez dos objetos Rank
         straight_count = 1
         for i in range(1, len(ranks)):
             if ranks[i] == ranks[i - 1] + 1:
@@ -158,7 +173,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def evaluate_three_of_a_kind(self, hand):
         # Avalia se há uma trinca
-        rank_count = Counter([card.rank for card in hand])
+        rank_count = Counter([get_rank(card) for card in hand])
         for rank, count in rank_count.items():
             if count >= 3:
                 return 1
@@ -166,7 +181,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def evaluate_two_pair(self, hand):
         # Avalia se há dois pares
-        rank_count = Counter([card.rank for card in hand])
+        rank_count = Counter([get_rank(card) for card in hand])
         pairs = [rank for rank, count in rank_count.items() if count >= 2]
         if len(pairs) >= 2:
             return 1
@@ -174,7 +189,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def evaluate_pair(self, hand):
         # Avalia se há um par
-        rank_count = Counter([card.rank for card in hand])
+        rank_count = Counter([get_rank(card) for card in hand])
         for count in rank_count.values():
             if count >= 2:
                 return 1
@@ -182,7 +197,7 @@ class MonteCarloPlayer(HLPokerPlayer):
 
     def random_choice_weighted(self, weighted_choices):
         total = sum(weight for _, weight in weighted_choices)
-        r = random.uniform(0, total)
+        r = self.get_rng().uniform(0, total)
         upto = 0
         for choice, weight in weighted_choices:
             if upto + weight >= r:
@@ -198,7 +213,12 @@ class MonteCarloPlayer(HLPokerPlayer):
         pass
 
     def event_new_game(self):
-        pass
+        # As estatísticas das simulações e as probabilidades estimadas por amostragem só são reutilizadas durante o
+        # jogo, para que cada jogo dependa apenas do seu próprio gerador (ver get_rng) e possa ser repetido sozinho
+        self.total_simulations = 0
+        self.wins = {action: 0 for action in HLPokerAction}
+        self.plays = {action: 0 for action in HLPokerAction}
+        self.win_probability_cache.clear()
 
     def event_end_game(self, final_state: HLPokerState):
         pass
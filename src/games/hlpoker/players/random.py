@@ -2,7 +2,6 @@ from games.hlpoker.player import HLPokerPlayer
 from games.hlpoker.round import Round
 from games.hlpoker.state import HLPokerState
 from games.state import State
-from random import choice
 
 
 class RandomHLPokerPlayer(HLPokerPlayer):
@@ -10,7 +9,7 @@ class RandomHLPokerPlayer(HLPokerPlayer):
         super().__init__(name)
 
     def get_action_with_cards(self, state: HLPokerState, private_cards, board_cards):
-        return choice(state.get_possible_actions())
+        return self.get_rng().choice(state.get_possible_actions())
 
     def event_my_action(self, action, new_state):
         pass
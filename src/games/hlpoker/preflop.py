@@ -0,0 +1,227 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+from games.hlpoker.card import NUM_CARDS, RANKS
+from games.hlpoker.equity import EquityCalculator
+
+"""
+The 169 classes of starting hands: the equity of two private cards before the flop only depends on their ranks and on
+whether they are suited. The classes are the cells of a 13 x 13 grid indexed by rank indexes (see games.hlpoker.card):
+the pairs on the diagonal, the suited hands at (high rank, low rank) and the offsuit hands at (low rank, high rank), so
+the index of a class is row * 13 + col
+"""
+NUM_RANKS = len(RANKS)
+NUM_CLASSES = NUM_RANKS * NUM_RANKS
+
+
+"""
+retrieves the class of two private cards
+"""
+def get_class(card1: int, card2: int) -> int:
+    high, low = max(card1 >> 2, card2 >> 2), min(card1 >> 2, card2 >> 2)
+    if (card1 & 3) == (card2 & 3):
+        return high * NUM_RANKS + low
+    return low * NUM_RANKS + high
+
+
+"""
+retrieves the name of a class, e.g. "AA", "AKs" or "72o"
+"""
+def get_class_name(hand_class: int) -> str:
+    row, col = divmod(hand_class, NUM_RANKS)
+    high, low = RANKS[max(row, col)], RANKS[min(row, col)]
+    if row == col:
+        return f"{high}{low}"
+    return f"{high}{low}{'s' if row > col else 'o'}"
+
+
+"""
+the pairs of cards of each class (6 for a pair, 4 for a suited hand and 12 for an offsuit hand)
+"""
+CLASS_HANDS = tuple([] for _ in range(NUM_CLASSES))
+for _hand in combinations(range(NUM_CARDS), 2):
+    CLASS_HANDS[get_class(*_hand)].append(_hand)
+
+
+"""
+lists the pairs of cards of a class
+"""
+def get_class_hands(hand_class: int):
+    return list(CLASS_HANDS[hand_class])
+
+
+class PreflopEquity:
+    """
+    table of the preflop equities of the 169 classes of starting hands (see get_class), built offline (see
+    build_table) and read through a memory mapped file:
+        - the equity of each class against a random hand
+        - the equity of each class against each class, where the hands of both classes are equally likely (the pairs
+          of hands that share a card excluded)
+    The file holds a header of 4 little endian int64 (magic number, version, number of classes and number of samples
+    of each equity, see EquityCalculator), followed by the equities against a random hand and the matrix of the
+    equities of the classes against each other, row by row, as float32.
+    """
+
+    MAGIC = 0x51455046504c48   # "HLPFPEQ"
+    VERSION = 1
+    HEADER_SIZE = 32
+
+    """
+    the table that the players use, bundled with the game
+    """
+    DEFAULT_PATH = Path(__file__).parent / "data" / "preflop_equity.bin"
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.__path = Path(path)
+        """
+        the arrays of the file, mapped the first time the table is used (None if the file does not exist)
+        """
+        self.__loaded = False
+        self.__num_samples = 0
+        self.__equities = None
+        self.__matrix = None
+
+    def get_path(self):
+        return self.__path
+
+    """
+    checks if the table can be used, i.e. if its file exists
+    """
+    def is_available(self):
+        self.__load()
+        return self.__equities is not None
+
+    def get_num_samples(self):
+        self.__load()
+        return self.__num_samples
+
+    """
+    retrieves the equity of two private cards against a random hand
+    :return: the equity, or None if the table is not available
+    """
+    def get_equity(self, card1: int, card2: int):
+        self.__load()
+        if self.__equities is None:
+            return None
+        return float(self.__equities[get_class(card1, card2)])
+
+    """
+    retrieves the equity of a class against another class
+    :return: the equity, or None if the table is not available
+    """
+    def get_matchup_equity(self, hand_class: int, opponent_class: int):
+        self.__load()
+        if self.__matrix is None:
+            return None
+        return float(self.__matrix[hand_class, opponent_class])
+
+    """
+    retrieves the equities of all the classes against a random hand, as an array of NUM_CLASSES (None if the table is
+    not available)
+    """
+    def get_equities(self):
+        self.__load()
+        return self.__equities
+
+    """
+    retrieves the equities of all the classes against each other, as an array of NUM_CLASSES x NUM_CLASSES (None if
+    the table is not available)
+    """
+    def get_matrix(self):
+        self.__load()
+        return self.__matrix
+
+    """
+    writes a table file
+    """
+    @staticmethod
+    def write(path, num_samples, equities, matrix):
+        header = np.array([PreflopEquity.MAGIC, PreflopEquity.VERSION, NUM_CLASSES, num_samples], dtype='<i8')
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(header.tobytes())
+            file.write(np.asarray(equities, dtype='<f4').tobytes())
+            file.write(np.asarray(matrix, dtype='<f4').tobytes())
+
+    def __load(self):
+        if self.__loaded:
+            return
+        self.__loaded = True
+        if not self.__path.is_file():
+            return
+
+        header = np.fromfile(self.__path, dtype='<i8', count=PreflopEquity.HEADER_SIZE // 8)
+        magic, version, num_classes, num_samples = (int(v) for v in header)
+        if magic != PreflopEquity.MAGIC or version != PreflopEquity.VERSION or num_classes != NUM_CLASSES:
+            raise ValueError(f"{self.__path} is not a preflop equity table of version {PreflopEquity.VERSION}")
+
+        self.__num_samples = num_samples
+        offset = PreflopEquity.HEADER_SIZE
+        self.__equities = np.memmap(self.__path, dtype='<f4', mode='r', offset=offset, shape=(NUM_CLASSES,))
+        offset += 4 * NUM_CLASSES
+        self.__matrix = np.memmap(self.__path, dtype='<f4', mode='r', offset=offset, shape=(NUM_CLASSES, NUM_CLASSES))
+
+
+"""
+Entry point of the workers of build_table: computes the equities of a class, with its own random generator so that
+the results do not depend on the number of workers. All the hands of a class have the same equities (a permutation of
+the suits maps them to each other, and leaves every class unchanged), so one of them is evaluated.
+:return: the equity of the class against a random hand, and against each of the following classes
+"""
+def compute_class_equities(hand_class, num_samples, seed):
+    calculator = EquityCalculator()
+    rng = np.random.default_rng([seed, hand_class])
+    hand = get_class_hands(hand_class)[0]
+
+    equity = calculator.compute(hand, [], num_samples=num_samples, rng=rng).equity
+    matchup_equities = [calculator.compute(hand, [], opponent_range=get_class_hands(opponent_class),
+                                           num_samples=num_samples, rng=rng).equity
+                        for opponent_class in range(hand_class + 1, NUM_CLASSES)]
+    return equity, matchup_equities
+
+
+"""
+Builds the preflop equity table: the classes are spread over worker processes, each equity is estimated from
+num_samples samples (see EquityCalculator), and the table is written to path. The equity of a class against itself is
+0.5, and the equity of the opponent of a matchup is one minus the equity of the hand.
+"""
+def build_table(path, num_samples=1 << 15, workers=None, seed=0):
+    equities = np.zeros(NUM_CLASSES)
+    matrix = np.full((NUM_CLASSES, NUM_CLASSES), 0.5)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(compute_class_equities, hand_class, num_samples, seed)
+                   for hand_class in range(NUM_CLASSES)]
+        for hand_class, future in enumerate(futures):
+            equities[hand_class], matchup_equities = future.result()
+            matrix[hand_class, hand_class + 1:] = matchup_equities
+            matrix[hand_class + 1:, hand_class] = 1 - np.array(matchup_equities)
+
+    PreflopEquity.write(path, num_samples, equities, matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the preflop equity table of Limit Holdem.')
+    parser.add_argument('--output', type=Path, default=PreflopEquity.DEFAULT_PATH,
+                        help='The table file to write (by default, the table used by the players).')
+    parser.add_argument('--num-samples', type=int, default=1 << 15,
+                        help='The number of samples of each equity.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='The number of worker processes (by default, the number of cores).')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the samples.')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    build_table(args.output, args.num_samples, args.workers, args.seed)
+    print(f"Preflop equities written to {args.output} in {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,8 @@
-from random import shuffle
-
 from termcolor import cprint
 
 from games.game_simulator import GameSimulator
 from games.hlpoker.action import HLPokerAction
-from games.hlpoker.card import Card, Suit, Rank
+from games.hlpoker.card import Suit, Rank, to_int
 from games.hlpoker.round import Round
 from games.hlpoker.state import HLPokerState
 from games.hlpoker.player import HLPokerPlayer
@@ -12,12 +10,17 @@ from games.hlpoker.player import HLPokerPlayer
 
 class HLPokerSimulator(GameSimulator):
 
-    def __init__(self, players: list[HLPokerPlayer]):
-        super().__init__(players)
+    def __init__(self, players: list[HLPokerPlayer], keep_history: bool = False,
+                 keep_metadata: bool = False):
+        super().__init__(players, keep_history, keep_metadata)
+        """
+        deck of cards (as integers, see games.hlpoker.card), in its initial order
         """
-        deck of cards
+        self.__ordered_deck = [to_int(rank, suit) for suit in Suit for rank in Rank]
         """
-        self.__deck = [Card(rank, suit) for suit in Suit for rank in Rank]
+        deck of cards of the current game
+        """
+        self.__deck = self.__ordered_deck.copy()
         """
         stores the current round of the current game being simulated
         """
@@ -28,8 +31,9 @@ class HLPokerSimulator(GameSimulator):
         self.__used_card_count = None
 
     def on_init_game(self):
-        # shuffle the deck
-        shuffle(self.__deck)
+        # shuffle the deck, always from the same order so that each game only depends on its own random stream
+        self.__deck[:] = self.__ordered_deck
+        self.get_rng().shuffle(self.__deck)
 
         self.__used_card_count = 0
         self.__current_round = Round.Preflop
@@ -81,6 +85,17 @@ class HLPokerSimulator(GameSimulator):
         # ignored for this simulator
         pass
 
+    @staticmethod
+    def get_result_typecode():
+        # results are multiples of half a bet, which float32 stores exactly
+        return "f"
+
+    @staticmethod
+    def get_result_range():
+        # a player can raise up to the maximum in each betting round, and loses at most what they bet
+        max_bet = HLPokerState.MAX_RAISES * HLPokerState.BET_SIZE * Round.Showdown.value
+        return -max_bet, max_bet
+
     @staticmethod
     def get_player_type():
         return HLPokerPlayer
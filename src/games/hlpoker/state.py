@@ -7,6 +7,7 @@ from phevaluator.evaluator import evaluate_cards
 class HLPokerState(State):
     BET_SIZE = 1.0
     MAX_RAISES = 4
+    UNSAFE_METHODS = State.UNSAFE_METHODS | {"get_sequence", "compute_results"}
 
     def __init__(self, num_players: int):
         super().__init__()
@@ -49,9 +50,18 @@ class HLPokerState(State):
         """
         self.__actions_this_round = 0
         """
-        number of actions in the current round.
+        the player that won by a fold (None if nobody folded)
         """
         self.__winner = None
+        """
+        the player that won the showdown (None for a tie), computed by compute_results once the showdown is reached,
+        and reset when its last action is undone
+        """
+        self.__showdown_winner = None
+        """
+        one record per action, to undo them: the values of the fields that the action changes, before the action
+        """
+        self.__undo_records = []
 
     def get_num_players(self):
         return self.__num_players
@@ -71,6 +81,9 @@ class HLPokerState(State):
         return True
 
     def update(self, action):
+        self.__undo_records.append((self.__acting_player, self.__is_finished, self.__bets[0], self.__bets[1],
+                                    self.__round, self.__raise_count, self.__actions_this_round, self.__winner))
+
         # update sequence of actions
         self.__sequence.append(action)
 
@@ -115,6 +128,12 @@ class HLPokerState(State):
         if self.__round == Round.Showdown:
             self.__is_finished = True
 
+    def undo(self):
+        (self.__acting_player, self.__is_finished, self.__bets[0], self.__bets[1], self.__round, self.__raise_count,
+         self.__actions_this_round, self.__winner) = self.__undo_records.pop()
+        self.__showdown_winner = None
+        self.__sequence.pop()
+
     def display(self):
         for action in self.__sequence:
             print(f"{action}", end=" > ")
@@ -143,14 +162,16 @@ class HLPokerState(State):
         cloned.__num_players = self.__num_players
         cloned.__actions_this_round = self.__actions_this_round
         cloned.__winner = self.__winner
+        cloned.__showdown_winner = self.__showdown_winner
         return cloned
 
     def get_result(self, pos):
-        if self.__winner is None:
+        winner = self.__showdown_winner if self.is_showdown() else self.__winner
+        if winner is None:
             # tie, nobody wins anything
             return 0
 
-        if self.__winner == pos:
+        if winner == pos:
             # I will get the amount the other player betted
             return self.__bets[1 if pos == 0 else 0]
         else:
@@ -172,25 +193,24 @@ class HLPokerState(State):
         return self.__bets[pos]
 
     '''
-    get the evaluation of a group of cards
+    get the evaluation of a group of 5 to 7 cards, given as integers (see games.hlpoker.card). Lower is better
     '''
     @staticmethod
     def evaluate_hand(cards):
-        return evaluate_cards(*[card.__str__() for card in cards])
+        return evaluate_cards(*cards)
 
     def compute_results(self, p0cards, p1cards, board_cards):
         if self.is_showdown():
 
-            # Helper function to convert cards to strings and evaluate
             p0_score = HLPokerState.evaluate_hand(p0cards + board_cards)
             p1_score = HLPokerState.evaluate_hand(p1cards + board_cards)
 
             if p0_score > p1_score:
-                self.__winner = 1
+                self.__showdown_winner = 1
             elif p1_score > p0_score:
-                self.__winner = 0
+                self.__showdown_winner = 0
             else:
-                self.__winner = None  # Tie
+                self.__showdown_winner = None  # Tie
 
         else:
             if self.__winner is None:
@@ -1,5 +1,3 @@
-from random import randint, choice
-
 from games.minesweeper.action import MinesweeperAction
 from games.minesweeper.player import MinesweeperPlayer
 from games.minesweeper.state import MinesweeperState
@@ -12,7 +10,7 @@ class RandomMinesweeperPlayer(MinesweeperPlayer):
         super().__init__(name)
 
     def get_action(self, state: MinesweeperState):
-        return choice(list(state.get_possible_actions()))
+        return self.get_rng().choice(list(state.get_possible_actions()))
 
     def event_action(self, pos: int, action, new_state: State):
         # ignore
@@ -1,13 +1,15 @@
 from games.minesweeper.action import MinesweeperAction
 from games.minesweeper.player import MinesweeperPlayer
+from games.minesweeper.result import MinesweeperResult
 from games.minesweeper.state import MinesweeperState
 from games.game_simulator import GameSimulator
 
 
 class MinesweeperSimulator(GameSimulator):
 
-    def __init__(self, players, num_rows: int = 7, num_cols: int = 7):
-        super(MinesweeperSimulator, self).__init__(players)
+    def __init__(self, players, num_rows: int = 7, num_cols: int = 7, keep_history: bool = False,
+                 keep_metadata: bool = False):
+        super(MinesweeperSimulator, self).__init__(players, keep_history, keep_metadata)
         """
         the number of rows and cols from the Minesweeper grid
         """
@@ -15,7 +17,7 @@ class MinesweeperSimulator(GameSimulator):
         self.__num_cols = num_cols
 
     def on_init_game(self):
-        return MinesweeperState(self.__num_rows, self.__num_cols)
+        return MinesweeperState(self.__num_rows, self.__num_cols, rng=self.get_rng())
 
     def on_before_end_game(self, state: MinesweeperState):
         # ignored for this simulator
@@ -29,6 +31,15 @@ class MinesweeperSimulator(GameSimulator):
         # ignored for this simulator
         pass
 
+    @staticmethod
+    def get_result_typecode():
+        # results are -1 or 1
+        return "b"
+
+    @staticmethod
+    def get_result_range():
+        return MinesweeperResult.LOOSE.value, MinesweeperResult.WIN.value
+
     @staticmethod
     def get_player_type():
         return MinesweeperPlayer
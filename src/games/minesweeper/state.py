@@ -10,8 +10,13 @@ from games.state import State
 class MinesweeperState(State):
     EMPTY_CELL = -1
     MINE_CELL = -2
+    UNSAFE_METHODS = State.UNSAFE_METHODS | {"get_grid"}
 
-    def __init__(self, num_rows: int = 7, num_cols: int = 7, num_mines: int = 11):
+    """
+    :param rng: random number generator used to place the mines (defaults to the global random module)
+    :param mines: the positions of the mines, placed randomly if not given
+    """
+    def __init__(self, num_rows: int = 7, num_cols: int = 7, num_mines: int = 11, rng=None, mines: set = None):
         super().__init__()
 
         if num_rows < 4:
@@ -33,15 +38,19 @@ class MinesweeperState(State):
         """
         self.__grid = [[MinesweeperState.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
         self.__grid_players = [[MinesweeperState.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
-        self.__mines = self.__place_mines()
+        self.__mines = mines if mines is not None else self.__place_mines(rng if rng is not None else random)
         self.__acting_player = 0
         self.__mines_hit = [0, 0]
         self.__has_winner = False
+        """
+        one record per action, to undo them: the cell and its values before the action
+        """
+        self.__undo_records = []
 
-    def __place_mines(self):
+    def __place_mines(self, rng):
         mines = set()
         while len(mines) < self.__num_mines:
-            mine = (random.randint(0, self.__num_rows - 1), random.randint(0, self.__num_cols - 1))
+            mine = (rng.randint(0, self.__num_rows - 1), rng.randint(0, self.__num_cols - 1))
             mines.add(mine)
         return mines
 
@@ -66,6 +75,7 @@ class MinesweeperState(State):
 
     def update(self, action: MinesweeperAction):
         row, col = action.get_row(), action.get_col()
+        self.__undo_records.append((row, col, self.__grid[row][col], self.__grid_players[row][col]))
         self.__grid_players[row][col] = self.__acting_player
 
         if (row, col) in self.__mines:
@@ -77,6 +87,16 @@ class MinesweeperState(State):
         self.__acting_player = 1 - self.__acting_player
         self.__has_winner = len(self.__mines) == sum(self.__mines_hit)
 
+    def undo(self):
+        row, col, cell_value, cell_player = self.__undo_records.pop()
+        self.__acting_player = 1 - self.__acting_player
+
+        if (row, col) in self.__mines:
+            self.__mines_hit[self.__acting_player] -= 1
+        self.__grid[row][col] = cell_value
+        self.__grid_players[row][col] = cell_player
+        self.__has_winner = len(self.__mines) == sum(self.__mines_hit)
+
     def validate_action(self, action: MinesweeperAction) -> bool:
         row, col = action.get_row(), action.get_col()
 
@@ -136,11 +156,8 @@ class MinesweeperState(State):
         return self.__acting_player
 
     def clone(self):
-        cloned_state = MinesweeperState(self.__num_rows, self.__num_cols)
-        cloned_state.__num_rows = self.__num_rows
-        cloned_state.__num_cols = self.__num_cols
-        cloned_state.__num_mines = self.__num_mines
-        cloned_state.__mines = self.__mines.copy()
+        # the mines are given, so the clone doesn't place (and draw) new ones
+        cloned_state = MinesweeperState(self.__num_rows, self.__num_cols, self.__num_mines, mines=self.__mines.copy())
         cloned_state.__acting_player = self.__acting_player
         cloned_state.__mines_hit = self.__mines_hit.copy()
         cloned_state.__has_winner = self.__has_winner
@@ -1,3 +1,4 @@
+import random
 from abc import ABC, abstractmethod
 
 from games.state import State
@@ -16,6 +17,10 @@ class Player(ABC):
         # in most games, the first player takes the position 0
         self.__current_pos = None
 
+        # random number generator of the player
+        # the simulator replaces it at the start of each game when the simulation is seeded
+        self.__rng = random.Random()
+
     """
     retrieves the name of the player
     """
@@ -35,6 +40,19 @@ class Player(ABC):
     def set_current_pos(self, new_pos):
         self.__current_pos = new_pos
 
+    """
+    retrieves the random number generator that the player should use for all its random decisions
+    """
+    def get_rng(self):
+        return self.__rng
+
+    """
+    sets the random number generator of the player
+    :param rng: the new random number generator
+    """
+    def set_rng(self, rng: random.Random):
+        self.__rng = rng
+
     """
     prints to the console the stats of the player
     """
@@ -42,6 +60,20 @@ class Player(ABC):
     def print_stats(self):
         pass
 
+    """
+    retrieves the counters behind the stats of the player (e.g. the number of nodes searched), as a dict of numbers.
+    The games of a matchup can be played by other instances of the player in worker processes, whose counters are
+    sent back and added to this instance (see merge_stats)
+    """
+    def get_stats(self) -> dict:
+        return {}
+
+    """
+    adds the counters of another instance of the player (see get_stats)
+    """
+    def merge_stats(self, stats: dict):
+        pass
+
     """
     Method that returns an action for a certain game state
     :param state: the current game state
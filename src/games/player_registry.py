@@ -0,0 +1,180 @@
+import ast
+import importlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+
+class PlayerRegistry:
+    """
+    lazily discovers the player classes of a game.
+    Instead of importing every module of the players folder, the modules are parsed (without being executed) to find
+    the classes they define. The result is kept in a manifest file, which is only refreshed for the modules whose
+    modification time changed. When a player type is requested, only the module that defines it is imported.
+    """
+
+    """
+    version of the manifest format, a manifest with a different version is rebuilt
+    """
+    MANIFEST_VERSION = 1
+
+    """
+    name of the manifest file, stored in the __pycache__ folder of the players package
+    """
+    MANIFEST_NAME = "players-manifest.json"
+
+    """
+    :param simulator_path: full path of the simulator class of the game (e.g. games.connect4.simulator.Connect4Simulator)
+    """
+    def __init__(self, simulator_path: str):
+        self.__simulator_module, self.__simulator_name = simulator_path.rsplit('.', 1)
+        """
+        the players package is always next to the simulator module
+        """
+        self.__players_package = self.__simulator_module.rsplit('.', 1)[0] + '.players'
+        """
+        the simulator class, once imported
+        """
+        self.__simulator_type = None
+        """
+        the classes defined in each module of the players package, once the manifest is loaded
+        """
+        self.__modules = None
+        """
+        the modules that could not be parsed, with the error message
+        """
+        self.__errors = None
+
+    """
+    imports and retrieves the simulator class of the game
+    """
+    def get_simulator_type(self):
+        if self.__simulator_type is None:
+            module = importlib.import_module(self.__simulator_module)
+            self.__simulator_type = getattr(module, self.__simulator_name)
+        return self.__simulator_type
+
+    """
+    retrieves the names of the available player classes, without importing them
+    """
+    def get_player_type_names(self):
+        base_name = self.get_simulator_type().get_player_type().__name__
+        defined_bases = {}
+        for classes in self.__get_modules().values():
+            for class_name, bases in classes.items():
+                defined_bases.setdefault(class_name, bases)
+
+        # a class is a player if it extends the base player class, directly or through other player classes
+        names = set()
+        found_new = True
+        while found_new:
+            found_new = False
+            for class_name, bases in defined_bases.items():
+                if class_name not in names and any(base == base_name or base in names for base in bases):
+                    names.add(class_name)
+                    found_new = True
+        return sorted(names)
+
+    """
+    imports and retrieves a player class. Only the module that defines the class is imported
+    :param class_name: the name of the player class
+    :raises ValueError: if the class does not exist or is not a player of this game
+    :raises ImportError: if the module that defines the class can't be imported
+    """
+    def get_player_type(self, class_name: str):
+        base_class = self.get_simulator_type().get_player_type()
+
+        for module_name, classes in sorted(self.__get_modules().items()):
+            if class_name not in classes:
+                continue
+
+            player_type = getattr(importlib.import_module(module_name), class_name, None)
+            if isinstance(player_type, type) and issubclass(player_type, base_class) and player_type is not base_class:
+                return player_type
+
+        message = f"Player type '{class_name}' is not available"
+        if self.__errors:
+            message += " (modules that could not be parsed: " + \
+                       ", ".join(f"{module_name}: {error}" for module_name, error in self.__errors.items()) + ")"
+        raise ValueError(message)
+
+    def __get_modules(self):
+        if self.__modules is None:
+            entries = self.__load_manifest()
+            self.__modules = {module_name: entry['classes'] for module_name, entry in entries.items()}
+            self.__errors = {module_name: entry['error'] for module_name, entry in entries.items() if entry['error']}
+        return self.__modules
+
+    """
+    loads the manifest, reparses the modules that changed since it was written and saves it again if needed
+    """
+    def __load_manifest(self):
+        players_dir = self.__get_players_dir()
+        manifest_path = players_dir / '__pycache__' / PlayerRegistry.MANIFEST_NAME
+
+        cached = {}
+        try:
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('version') == PlayerRegistry.MANIFEST_VERSION:
+                cached = manifest['modules']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        entries = {}
+        changed = False
+        for module_name, path in self.__find_modules(players_dir):
+            mtime = os.stat(path).st_mtime_ns
+            entry = cached.get(module_name)
+            if entry is None or entry['mtime'] != mtime:
+                try:
+                    entry = {'mtime': mtime, 'classes': PlayerRegistry.__parse_classes(path), 'error': None}
+                except SyntaxError as error:
+                    entry = {'mtime': mtime, 'classes': {}, 'error': str(error)}
+                changed = True
+            entries[module_name] = entry
+
+        if changed or entries.keys() != cached.keys():
+            try:
+                manifest_path.parent.mkdir(exist_ok=True)
+                with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+                    json.dump({'version': PlayerRegistry.MANIFEST_VERSION, 'modules': entries}, manifest_file)
+            except OSError:
+                pass  # a read-only source tree only loses the cache
+
+        return entries
+
+    def __get_players_dir(self):
+        spec = importlib.util.find_spec(self.__players_package)
+        if spec is None or not spec.submodule_search_locations:
+            raise ValueError(f"No 'players' package found for {self.__simulator_module}")
+        return Path(list(spec.submodule_search_locations)[0])
+
+    """
+    recursively lists the modules of the players folder, with their module name and path
+    """
+    def __find_modules(self, players_dir: Path):
+        for dir_path, dir_names, file_names in os.walk(players_dir):
+            dir_names[:] = sorted(name for name in dir_names if name != '__pycache__')
+            package = '.'.join([self.__players_package, *Path(dir_path).relative_to(players_dir).parts])
+            for file_name in sorted(file_names):
+                if file_name.endswith('.py') and file_name != '__init__.py':
+                    yield f"{package}.{file_name[:-3]}", Path(dir_path) / file_name
+
+    """
+    parses a module (without executing it) and returns the classes it defines, with the names of their bases
+    """
+    @staticmethod
+    def __parse_classes(path: Path):
+        with open(path, encoding='utf-8') as source:
+            tree = ast.parse(source.read(), filename=str(path))
+
+        classes = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                classes[node.name] = [
+                    base.id if isinstance(base, ast.Name) else base.attr
+                    for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))
+                ]
+        return classes
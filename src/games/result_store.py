@@ -0,0 +1,170 @@
+from array import array
+from collections.abc import Sequence
+
+
+class ResultStore:
+    """
+    stores the results of many games in a columnar way: one typed array per player instead of one dict per game.
+    Optionally, packed metadata about each game is also kept (seat permutation, number of turns and duration)
+    """
+
+    """
+    names of the metadata columns and the typecode of their arrays
+    """
+    METADATA_COLUMNS = {
+        "permutation": "H",
+        "turns": "I",
+        "duration": "f"
+    }
+
+    """
+    :param names: the names of the players
+    :param typecode: the array typecode used to store the results (see the array module)
+    :param keep_metadata: if True, the metadata of each game is also stored
+    """
+    def __init__(self, names: list, typecode: str = "d", keep_metadata: bool = False):
+        if keep_metadata and any(name in ResultStore.METADATA_COLUMNS for name in names):
+            raise ValueError(f"Player names can't be one of {list(ResultStore.METADATA_COLUMNS)} when metadata is kept")
+
+        """
+        the player names, in the order of the columns
+        """
+        self.__names = list(names)
+        """
+        the typecode of the result columns
+        """
+        self.__typecode = typecode
+        """
+        one array with the results of every game per player
+        """
+        self.__scores = {name: array(typecode) for name in self.__names}
+        """
+        one array per metadata column (None if the metadata is not kept)
+        """
+        self.__metadata = {column: array(code) for column, code in ResultStore.METADATA_COLUMNS.items()} \
+            if keep_metadata else None
+
+    """
+    adds the results of a game
+    :param result: dict with the result of each player
+    :param permutation: the index of the seat permutation used in the game
+    :param turns: the number of turns of the game
+    :param duration: the duration of the game, in seconds
+    """
+    def add(self, result: dict, permutation: int = 0, turns: int = 0, duration: float = 0.0):
+        for name in self.__names:
+            self.__scores[name].append(result[name])
+
+        if self.__metadata is not None:
+            self.__metadata["permutation"].append(permutation)
+            self.__metadata["turns"].append(turns)
+            self.__metadata["duration"].append(duration)
+
+    """
+    appends the results of another store with the same players (e.g. one filled in a worker process)
+    """
+    def extend(self, other):
+        for name in self.__names:
+            self.__scores[name].extend(other.__scores[name])
+
+        if self.__metadata is not None:
+            if other.__metadata is None:
+                raise ValueError("Can't merge a store without metadata into a store that keeps metadata")
+            for column in self.__metadata:
+                self.__metadata[column].extend(other.__metadata[column])
+
+    def __len__(self):
+        return len(self.__scores[self.__names[0]])
+
+    def get_names(self):
+        return self.__names
+
+    """
+    retrieves the array with the results of a player
+    """
+    def get_scores(self, name):
+        return self.__scores[name]
+
+    """
+    retrieves the array of a metadata column (None if the metadata is not kept)
+    """
+    def get_metadata(self, column):
+        if self.__metadata is None:
+            return None
+        return self.__metadata[column]
+
+    def has_metadata(self):
+        return self.__metadata is not None
+
+    """
+    retrieves a lazy, read-only view that presents the results as one dict per game
+    """
+    def get_view(self):
+        return ResultView(self)
+
+    """
+    exports the results as a NumPy structured array with one field per player (and per metadata column)
+    """
+    def to_numpy(self):
+        import numpy as np
+
+        columns = [(name, self.__scores[name]) for name in self.__names]
+        if self.__metadata is not None:
+            columns.extend(self.__metadata.items())
+
+        exported = np.empty(len(self), dtype=ResultStore.__numpy_dtype(columns))
+        for name, values in columns:
+            exported[name] = np.frombuffer(values, dtype=values.typecode) if len(values) > 0 else []
+        return exported
+
+    """
+    dumps the results to a .npy file that can be memory-mapped with ResultStore.load
+    :param path: path of the file
+    """
+    def dump(self, path):
+        import numpy as np
+
+        exported = self.to_numpy()
+        mapped = np.lib.format.open_memmap(path, mode="w+", dtype=exported.dtype, shape=exported.shape)
+        mapped[:] = exported
+        mapped.flush()
+
+    """
+    memory-maps (read-only) the results dumped to a file, without loading them into memory
+    :param path: path of the file
+    """
+    @staticmethod
+    def load(path):
+        import numpy as np
+
+        return np.load(path, mmap_mode="r")
+
+    @staticmethod
+    def __numpy_dtype(columns):
+        import numpy as np
+
+        return np.dtype([(name, np.dtype(values.typecode)) for name, values in columns])
+
+
+class ResultView(Sequence):
+    """
+    presents the results of a ResultStore as a sequence of dicts keyed by player name.
+    The dicts are only built when a game is accessed
+    """
+
+    def __init__(self, store: ResultStore):
+        self.__store = store
+
+    def __len__(self):
+        return len(self.__store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("game index out of range")
+
+        return {name: self.__store.get_scores(name)[index] for name in self.__store.get_names()}
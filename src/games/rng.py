@@ -0,0 +1,23 @@
+import hashlib
+import random
+
+"""
+Helpers to derive independent, reproducible random number generators from a master seed.
+Every stream is identified by the master seed and a list of keys (e.g. the matchup, the game index and the seat),
+so the numbers drawn by a game never depend on the games that were played before it, nor on the process playing it
+"""
+
+
+"""
+derives a 64 bit seed from a master seed and a list of keys
+"""
+def derive_seed(seed, *keys) -> int:
+    key = ":".join(str(part) for part in (seed, *keys))
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+
+
+"""
+creates a random number generator for the stream identified by a master seed and a list of keys
+"""
+def create_rng(seed, *keys) -> random.Random:
+    return random.Random(derive_seed(seed, *keys))
@@ -0,0 +1,58 @@
+class ScoreAccumulator:
+    """
+    keeps the running totals of the scores of a player, so that the global score, the mean and the variance
+    can be obtained in O(1) without going through the results of every game
+    """
+
+    def __init__(self):
+        """
+        sum of all scores
+        """
+        self.__sum = 0
+        """
+        sum of the squares of all scores
+        """
+        self.__sum_squares = 0
+        """
+        number of scores that were added
+        """
+        self.__count = 0
+
+    """
+    adds the score of a new game
+    :param score: the score of the player in that game
+    """
+    def add(self, score):
+        self.__sum += score
+        self.__sum_squares += score * score
+        self.__count += 1
+
+    """
+    adds the totals of another accumulator (e.g. one filled in a worker process)
+    :param other: the accumulator to merge into this one
+    """
+    def merge(self, other):
+        self.__sum += other.__sum
+        self.__sum_squares += other.__sum_squares
+        self.__count += other.__count
+
+    def get_sum(self):
+        return self.__sum
+
+    def get_count(self):
+        return self.__count
+
+    def get_mean(self):
+        if self.__count == 0:
+            return 0
+        return self.__sum / self.__count
+
+    """
+    retrieves the (population) variance of the scores
+    """
+    def get_variance(self):
+        if self.__count == 0:
+            return 0
+        mean = self.get_mean()
+        # rounding errors can make the difference slightly negative when all scores are equal
+        return max(0.0, self.__sum_squares / self.__count - mean * mean)
@@ -3,6 +3,12 @@ from abc import ABC, abstractmethod
 
 class State(ABC):
 
+    """
+    methods that change the state or expose its internal (mutable) structures
+    a StateView becomes a real copy of the state before any of them is called
+    """
+    UNSAFE_METHODS = frozenset(["play", "update", "undo", "before_results"])
+
     """
     Retrieve the number of players
     """
@@ -58,6 +64,14 @@ class State(ABC):
         self.update(action)
         return True
 
+    """
+    Reverts the last action applied with play (or update), so that searches can explore the actions in place instead
+    of cloning the state. Only the actions applied to this object can be undone, a clone starts with no history
+    :raises IndexError: if there is no action to undo
+    """
+    def undo(self):
+        raise NotImplementedError(f"{self.__class__.__name__} can't undo actions")
+
     """
     copies the current game state
     """
@@ -0,0 +1,48 @@
+from games.state import State
+
+
+class StateView:
+    """
+    a cheap, read-only view of a live game state, handed by the simulator to the players instead of a clone.
+    Read methods are forwarded to the live state. The view only becomes a real copy (a clone of the live state) when:
+        - a method that changes the state, or exposes its internal structures, is called (see State.UNSAFE_METHODS)
+        - a private attribute of the state is accessed
+        - the simulator is about to change the live state while the player still holds the view (see detach)
+    """
+
+    def __init__(self, state: State):
+        """
+        the live state, replaced by a private copy once the view is detached
+        """
+        self.__state = state
+        """
+        indicates if the view already holds its own copy of the state
+        """
+        self.__detached = False
+
+    """
+    makes the view hold its own copy of the state, so that it no longer depends on the live state
+    """
+    def detach(self):
+        if not self.__detached:
+            self.__state = self.__state.clone()
+            self.__detached = True
+
+    """
+    indicates if the view holds its own copy of the state
+    """
+    def is_detached(self):
+        return self.__detached
+
+    def clone(self):
+        return self.__state.clone()
+
+    def __getattr__(self, name):
+        # the attributes of the view itself are not forwarded (e.g. while it is being unpickled)
+        if name.startswith("_StateView__"):
+            raise AttributeError(name)
+
+        if name.startswith("_") or name in self.__state.UNSAFE_METHODS:
+            self.detach()
+
+        return getattr(self.__state, name)
@@ -1,55 +1,349 @@
+import time
+
+# taken before any other import, so that the startup time includes loading the modules
+START_TIME = time.perf_counter()
+
 import argparse
 import itertools
+import math
+import random
 from collections import namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
-from constants import AVAILABLE_GAME_TYPES, AVAILABLE_PLAYER_TYPES
+from constants import AVAILABLE_GAME_TYPES, PLAYER_REGISTRIES
+from games.rng import derive_seed
+from racing import RacingScheduler
+from stop_rules import BernsteinStopRule, MatchupStatistics, STOP_RULES
+
+"""
+Number of iterations of a matchup played by each shard when the matchups are run in parallel
+"""
+ITERATIONS_PER_SHARD = 100
 
 def run_simulation(game_settings):
     removed_players = []
 
-    while len(game_settings['players']) > 1:
-        scores = defaultdict(int)
-        match_results = defaultdict(dict)
+    # a single pool is shared by all elimination rounds so that workers are only spawned once
+    executor = ProcessPoolExecutor(max_workers=game_settings['workers']) if game_settings['workers'] > 1 else None
 
-        for player1, player2 in itertools.combinations(game_settings['players'], 2):
-            simulator = game_settings['game']([player1, player2])
-            print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+    # parallel runs are always seeded, the seed is printed so that the run can be reproduced
+    if executor is not None and game_settings['seed'] is None:
+        game_settings['seed'] = random.randrange(2 ** 32)
+        print(f"Master seed: {game_settings['seed']}")
 
-            names = {player1.get_name(): player1, player2.get_name(): player2}
+    # global scores of each matchup already played, reused by the following elimination rounds
+    matchup_cache = {}
 
-            # Run initial iterations with progress bar
-            for _ in tqdm(range(game_settings['num_iterations']), desc="Running iterations"):
-                run_game_iteration(simulator, game_settings['seat_permutation'])
+    try:
+        while len(game_settings['players']) > 1:
+            scores = defaultdict(int)
+            match_results = defaultdict(dict)
 
-            # Run additional iterations if there's a draw
-            while check_draw(simulator):
-                run_game_iteration(simulator, game_settings['seat_permutation'])
+            pairs = list(itertools.combinations(game_settings['players'], 2))
 
-            update_scores(scores, simulator, names)
+            # only the new matchups are played (all of them if the players learn between games)
+            if game_settings['replay_matchups']:
+                matchup_cache.clear()
+            pairs_to_play = [pair for pair in pairs if get_matchup_key(pair) not in matchup_cache]
+            for pair, global_scores in zip(pairs_to_play, run_matchups(game_settings, pairs_to_play, executor)):
+                matchup_cache[get_matchup_key(pair)] = global_scores
 
-            # Update match results for cross table
-            update_match_results(match_results, simulator, player1, player2)
+            if len(pairs_to_play) < len(pairs):
+                print(f"Matchups reused from the previous rounds: {len(pairs) - len(pairs_to_play)}")
 
-            simulator.print_stats()
+            for player1, player2 in pairs:
+                global_scores = matchup_cache[get_matchup_key((player1, player2))]
+                names = {player1.get_name(): player1, player2.get_name(): player2}
 
-        # Print cross table and leaderboard before removing a player
-        print_cross_table(match_results)
-        print_leaderboard(scores)
+                update_scores(scores, global_scores, names)
 
-        removed_player = remove_worst_player(game_settings['players'], scores)
-        removed_players.insert(0, removed_player)
+                # Update match results for cross table
+                update_match_results(match_results, global_scores, player1, player2)
+
+            # Print cross table and leaderboard before removing a player
+            print_cross_table(match_results)
+            print_leaderboard(scores)
+
+            removed_player = remove_worst_player(game_settings['players'], scores)
+            removed_players.insert(0, removed_player)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     last_remaining_player = game_settings['players'][0]
     removed_players.insert(0, last_remaining_player)
     print_leaderboard(removed_players, final=True)
 
-def run_game_iteration(simulator, seat_permutation):
+"""
+Racing tournament: games are played in batches of ITERATIONS_PER_SHARD iterations, only on the pairs whose winner is
+still uncertain, and the players that are clearly worse than all the others are eliminated as soon as possible
+(see RacingScheduler)
+"""
+def run_racing(game_settings):
+    scheduler = RacingScheduler(game_settings['players'], game_settings['stop_rule'])
+    executor = ProcessPoolExecutor(max_workers=game_settings['workers']) if game_settings['workers'] > 1 else None
+
+    if executor is not None and game_settings['seed'] is None:
+        game_settings['seed'] = random.randrange(2 ** 32)
+        print(f"Master seed: {game_settings['seed']}")
+
+    # one simulator per pair, which accumulates the scores of all its batches
+    simulators = {}
+    for player1, player2 in itertools.combinations(game_settings['players'], 2):
+        simulator = create_simulator(game_settings, [player1, player2])
+        if game_settings['seed'] is not None:
+            simulator.set_seed(derive_matchup_seed(game_settings['seed'], (player1, player2)))
+        simulators[get_matchup_key((player1, player2))] = simulator
+
+    ranking = []
+    try:
+        while len(scheduler.get_active_players()) > 1:
+            pairs = scheduler.get_pairs_to_play()
+            for (player1, player2), statistics in zip(pairs, run_batches(game_settings, pairs, simulators, scheduler,
+                                                                         executor)):
+                scheduler.add_statistics(player1, player2, statistics)
+
+            # when no pair needs more games, the lowest scored player is eliminated like in the elimination tournament
+            eliminated = scheduler.eliminate(force=not pairs)
+            for player in eliminated:
+                print(f"Eliminated: {player.get_name()} ({player.__class__.__name__}) "
+                      f"after {scheduler.get_num_games()} games")
+            ranking = eliminated + ranking
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    match_results = defaultdict(dict)
+    for player1, player2 in itertools.combinations(game_settings['players'], 2):
+        update_match_results(match_results, simulators[get_matchup_key((player1, player2))].get_global_score(),
+                             player1, player2)
+    print_cross_table(match_results)
+
+    print(f"Games played: {scheduler.get_num_games()}")
+    for player in game_settings['players']:
+        player.print_stats()
+    print_leaderboard(scheduler.get_active_players() + ranking, final=True)
+
+"""
+Plays a batch of ITERATIONS_PER_SHARD iterations for every pair and yields the statistics of each batch
+"""
+def run_batches(game_settings, pairs, simulators, scheduler, executor=None):
+    if executor is None:
+        for player1, player2 in pairs:
+            statistics = MatchupStatistics()
+            for _ in range(ITERATIONS_PER_SHARD):
+                run_game_iteration(simulators[get_matchup_key((player1, player2))], game_settings['seat_permutation'],
+                                   statistics)
+            yield statistics
+        return
+
+    futures = [
+        [executor.submit(run_shard_worker, shard)
+         for shard in build_shards(game_settings, pair, scheduler.get_statistics(*pair).get_num_iterations(),
+                                   ITERATIONS_PER_SHARD)]
+        for pair in pairs
+    ]
+    for pair, pair_futures in zip(pairs, futures):
+        statistics = MatchupStatistics()
+        for future in pair_futures:
+            merge_shard_result(simulators[get_matchup_key(pair)], statistics, future.result())
+        yield statistics
+
+"""
+Creates a simulator of the selected game for the given players, with the game options given on the command line
+"""
+def create_simulator(game_settings, players):
+    return game_settings['game'](players, **game_settings['game_options'])
+
+"""
+Identifies a matchup by the names of its players, which are unique
+"""
+def get_matchup_key(pair):
+    return frozenset(player.get_name() for player in pair)
+
+"""
+Plays every pair and yields the global scores of each matchup, in the same order as the pairs.
+When an executor is given, each matchup is split into shards (see build_shards) which are distributed over the
+worker processes and then merged back into a single simulator
+"""
+def run_matchups(game_settings, pairs, executor=None):
+    if executor is None:
+        for player1, player2 in pairs:
+            simulator = create_simulator(game_settings, [player1, player2])
+            if game_settings['seed'] is not None:
+                simulator.set_seed(derive_matchup_seed(game_settings['seed'], (player1, player2)))
+            print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+
+            statistics = run_matchup(simulator, game_settings)
+
+            simulator.print_stats()
+            print_stop_report(game_settings['stop_rule'], statistics)
+            yield simulator.get_global_score()
+        return
+
+    # the shards of all pairs are submitted upfront so that the pool never runs out of work
+    shard_futures = [
+        [executor.submit(run_shard_worker, shard)
+         for shard in build_shards(game_settings, pair, 0, get_max_iterations(game_settings))]
+        for pair in pairs
+    ]
+
+    for (player1, player2), futures in zip(pairs, shard_futures):
+        simulator = create_simulator(game_settings, [player1, player2])
+        statistics = MatchupStatistics()
+        print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+
+        # shards are merged in iteration order, so the merged results do not depend on the number of workers
+        for index, future in enumerate(futures):
+            merge_shard_result(simulator, statistics, future.result())
+
+            # the stop rule is checked at the end of each shard, the shards that are not needed anymore are cancelled
+            if game_settings['stop_rule'] is not None and game_settings['stop_rule'].should_stop(statistics):
+                for remaining_future in futures[index + 1:]:
+                    remaining_future.cancel()
+                break
+
+        # Run additional iterations if there's a draw, one single iteration shard at a time
+        next_iteration = statistics.get_num_iterations()
+        while check_draw(simulator):
+            for shard in build_shards(game_settings, (player1, player2), next_iteration, 1):
+                merge_shard_result(simulator, statistics, run_shard_worker(shard))
+            next_iteration += 1
+
+        simulator.print_stats()
+        print_stop_report(game_settings['stop_rule'], statistics)
+        yield simulator.get_global_score()
+
+"""
+Plays a matchup in the main process and returns its statistics
+Without a stop rule, exactly num_iterations iterations are played. With a stop rule, the matchup ends as soon as
+the rule is satisfied, which is checked every ITERATIONS_PER_SHARD iterations (like when the matchup is sharded)
+"""
+def run_matchup(simulator, game_settings):
+    stop_rule = game_settings['stop_rule']
+    seat_permutation = game_settings['seat_permutation']
+    statistics = MatchupStatistics()
+
+    # Run initial iterations with progress bar
+    for iteration in tqdm(range(get_max_iterations(game_settings)), desc="Running iterations"):
+        run_game_iteration(simulator, seat_permutation, statistics)
+        if stop_rule is not None and (iteration + 1) % ITERATIONS_PER_SHARD == 0 and stop_rule.should_stop(statistics):
+            break
+
+    # Run additional iterations if there's a draw
+    while check_draw(simulator):
+        run_game_iteration(simulator, seat_permutation, statistics)
+
+    return statistics
+
+"""
+The number of iterations of a matchup, before resolving draws
+"""
+def get_max_iterations(game_settings):
+    if game_settings['stop_rule'] is None:
+        return game_settings['num_iterations']
+    return math.ceil(game_settings['stop_rule'].get_max_games() / games_per_iteration(game_settings['seat_permutation']))
+
+def merge_shard_result(simulator, statistics, shard_result):
+    accumulators, result_store, shard_statistics, player_stats = shard_result
+    simulator.merge_results(accumulators, result_store)
+    simulator.merge_player_stats(player_stats)
+    statistics.merge(shard_statistics)
+
+def print_stop_report(stop_rule, statistics):
+    if stop_rule is not None:
+        print(f"Stopped after {statistics.get_num_games()} games "
+              f"with {stop_rule.get_reached_confidence(statistics):.2%} confidence")
+
+"""
+Splits the iterations [first_iteration, first_iteration + num_iterations[ of a matchup into shards of
+ITERATIONS_PER_SHARD iterations. The shard boundaries only depend on the iteration indexes, and every game is seeded
+from the matchup seed and its own index, so the results never depend on the number of workers.
+Only the player types and names are sent, each shard builds its own player instances
+"""
+def build_shards(game_settings, pair, first_iteration, num_iterations):
+    player_specs = [(player.__class__, player.get_name()) for player in pair]
+    matchup_seed = derive_matchup_seed(game_settings['seed'], pair)
+    last_iteration = first_iteration + num_iterations
+
+    shards = []
+    for shard_start in range(first_iteration, last_iteration, ITERATIONS_PER_SHARD):
+        shard_size = min(ITERATIONS_PER_SHARD, last_iteration - shard_start)
+        shards.append((game_settings['game'], game_settings['game_options'], player_specs,
+                       game_settings['seat_permutation'], shard_start, shard_size, matchup_seed))
+    return shards
+
+"""
+The seed of a matchup, from which the random streams of each of its games are derived
+"""
+def derive_matchup_seed(master_seed, pair):
+    return derive_seed(master_seed, "matchup", *[player.get_name() for player in pair])
+
+"""
+Moves a new simulator to the game with the given index: the next game will be seeded and seated as it would be
+after playing all the previous games of the matchup
+"""
+def move_to_game(simulator, matchup_seed, game_index, seat_permutation):
+    simulator.set_seed(matchup_seed, game_index)
+
+    # with seat permutation, every game but the first moves the seats forward once
+    if seat_permutation:
+        for _ in range(((game_index + 1) // 2) % math.factorial(simulator.num_players())):
+            simulator.change_player_positions()
+
+"""
+Entry point of the worker processes: plays the iterations of a shard with a fresh simulator and fresh player
+instances and sends back the score totals of its games (and their results, if the simulator keeps the history),
+the statistics used by the stop rules and the counters of its players (e.g. the nodes they searched)
+"""
+def run_shard_worker(shard):
+    game_type, game_options, player_specs, seat_permutation, first_iteration, num_iterations, matchup_seed = shard
+
+    simulator = game_type([player_type(name) for player_type, name in player_specs], **game_options)
+    move_to_game(simulator, matchup_seed, first_iteration * games_per_iteration(seat_permutation), seat_permutation)
+
+    statistics = MatchupStatistics()
+    for _ in range(num_iterations):
+        run_game_iteration(simulator, seat_permutation, statistics)
+
+    return simulator.get_accumulators(), simulator.get_result_store(), statistics, simulator.get_player_stats()
+
+"""
+Replays a single game of every matchup, e.g. to profile it on its own
+"""
+def replay_game(game_settings, game_index):
+    for player1, player2 in itertools.combinations(game_settings['players'], 2):
+        simulator = create_simulator(game_settings, [player1, player2])
+        print(f"Replay of game {game_index}: {player1.get_name()} VS {player2.get_name()}")
+
+        move_to_game(simulator, derive_matchup_seed(game_settings['seed'], (player1, player2)), game_index,
+                     game_settings['seat_permutation'])
+        simulator.run_simulation()
+
+        simulator.print_stats()
+
+def games_per_iteration(seat_permutation):
+    return 2 if seat_permutation else 1
+
+"""
+Plays an iteration, i.e. one game for each seat permutation
+:param statistics: if given, the score difference of the iteration is added to these statistics
+"""
+def run_game_iteration(simulator, seat_permutation, statistics=None):
+    scores_before = simulator.get_global_score()
+
     simulator.run_simulation()
     if seat_permutation:
         simulator.change_player_positions()
         simulator.run_simulation()
 
+    if statistics is not None:
+        scores_after = simulator.get_global_score()
+        name1, name2 = [player.get_name() for player in simulator.get_players()]
+        difference = (scores_after[name1] - scores_before[name1]) - (scores_after[name2] - scores_before[name2])
+        statistics.add(difference, games_per_iteration(seat_permutation))
+
 def check_draw(simulator):
     global_scores = simulator.get_global_score()
     # Assuming there are only two players in each game
@@ -58,9 +352,8 @@ def check_draw(simulator):
         return True  # It's a draw
     return False  # Not a draw
 
-def update_scores(scores, simulator, names):
+def update_scores(scores, global_scores, names):
     # Update global scores for each player
-    global_scores = simulator.get_global_score()
     for player_name, score in global_scores.items():
         scores[names[player_name]] += score
 
@@ -70,8 +363,7 @@ def remove_worst_player(players, scores):
     players.remove(lowest_score_player)
     return lowest_score_player
 
-def update_match_results(match_results, simulator, player1, player2):
-    result = simulator.get_global_score()  # Assuming this method exists and returns the match result
+def update_match_results(match_results, result, player1, player2):
     match_results[player1.get_name()][player2.get_name()] = result[player1.get_name()]
     match_results[player2.get_name()][player1.get_name()] = result[player2.get_name()]
 
@@ -118,6 +410,60 @@ def main():
     parser.add_argument('--num-iterations', type=int, default=10000,
                         help='Number of iterations in the simulation. Defaults to 10000.')
 
+    # Number of worker processes (default: 1)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used to play the matchups in parallel. Defaults to 1.')
+
+    # Master seed (default: None)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Master seed from which independent random streams are derived for every matchup, game '
+                             'and seat. The scores do not depend on the number of workers.')
+
+    # Replay a single game (default: None)
+    parser.add_argument('--replay-game', type=int, default=None, metavar='INDEX',
+                        help='Only play the game with the given index of every matchup. Requires --seed.')
+
+    # Startup time report (default: False)
+    parser.add_argument('--startup-time', action='store_true', default=False,
+                        help='Print the time it took to start up, i.e. to load the game and the selected players.')
+
+    # Replay matchups in every elimination round (default: False)
+    parser.add_argument('--replay-matchups', action='store_true', default=False,
+                        help='Play every matchup again in each elimination round, instead of reusing its results. '
+                             'Useful for players that learn between games.')
+
+    # Tournament mode (default: elimination)
+    parser.add_argument('--tournament', choices=['elimination', 'racing'], default='elimination',
+                        help='Tournament mode. "elimination" plays every pair and removes the worst player in each '
+                             'round. "racing" only plays more games on the pairs whose winner is still uncertain and '
+                             'eliminates the clearly worse players early. Defaults to elimination.')
+
+    # Stop rule (default: None)
+    parser.add_argument('--stop-rule', choices=STOP_RULES.keys(), default=None,
+                        help='End each matchup as soon as its winner is statistically settled, instead of playing '
+                             'exactly --num-iterations iterations.')
+
+    parser.add_argument('--min-games', type=int, default=None,
+                        help='Minimum number of games of a matchup when a stop rule is used. '
+                             'Defaults to 200, or to the maximum number of games if it is lower.')
+
+    parser.add_argument('--max-games', type=int, default=None,
+                        help='Maximum number of games of a matchup when a stop rule is used. '
+                             'Defaults to the number of games of --num-iterations.')
+
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='Confidence required by the stop rule to end a matchup. Defaults to 0.95.')
+
+    # Board options, only for the games that have a board (default: the default of the game)
+    parser.add_argument('--num-rows', type=int, default=None,
+                        help='Number of rows of the board (connect4 and minesweeper).')
+
+    parser.add_argument('--num-cols', type=int, default=None,
+                        help='Number of columns of the board (connect4 and minesweeper).')
+
+    parser.add_argument('--connect-length', type=int, default=None,
+                        help='Number of aligned checkers needed to win (connect4). Defaults to 4.')
+
     # Player argument. This should be specified at least twice.
     parser.add_argument('--player', action='append', nargs=2, metavar=('NAME', 'TYPE'),
                         help='Add a player with a name and type. Requires two values. This option should be specified at least twice.')
@@ -128,11 +474,42 @@ def main():
     if args.player is None or len(args.player) < 2:
         parser.error('At least two --player arguments are required.')
 
-    try:
-        # Retrieve available player types for the selected game
-        available_player_types = AVAILABLE_PLAYER_TYPES[args.game]
-    except KeyError:
-        parser.error(f"No player types available for the game '{args.game}'.")
+    if args.workers < 1:
+        parser.error('The number of workers must be 1 or over.')
+
+    if args.replay_game is not None and (args.seed is None or args.replay_game < 0):
+        parser.error('--replay-game requires --seed and a game index of 0 or over.')
+
+    # Only the selected game is loaded
+    registry = PLAYER_REGISTRIES[args.game]
+
+    stop_rule = None
+    if args.stop_rule is not None or args.tournament == 'racing':
+        max_games = args.max_games
+        if max_games is None:
+            max_games = args.num_iterations * games_per_iteration(args.seat_permutation)
+        min_games = args.min_games if args.min_games is not None else min(200, max_games)
+        # the score difference of a game is within twice the range of the results of a player
+        result_min, result_max = registry.get_simulator_type().get_result_range()
+        score_range = 2 * (result_max - result_min) * games_per_iteration(args.seat_permutation)
+        try:
+            # the racing tournament needs a rule to decide which pairs are settled
+            stop_rule_type = STOP_RULES[args.stop_rule] if args.stop_rule is not None else BernsteinStopRule
+            stop_rule = stop_rule_type(min_games, max_games, args.confidence, score_range)
+        except ValueError as error:
+            parser.error(str(error))
+
+    # the options that were not given keep the default of the simulator
+    game_options = {option: value for option, value in (('num_rows', args.num_rows), ('num_cols', args.num_cols),
+                                                        ('connect_length', args.connect_length))
+                    if value is not None}
+    if game_options:
+        # only imported when needed, as it slows down the startup
+        import inspect
+        game_parameters = inspect.signature(registry.get_simulator_type()).parameters
+        for option in game_options:
+            if option not in game_parameters:
+                parser.error(f"--{option.replace('_', '-')} is not supported by game '{args.game}'.")
 
     used_names = set()
 
@@ -143,28 +520,47 @@ def main():
 
         used_names.add(name)
 
-        # Find the player class that matches the provided type name
-        player_class = None
-        for cls in available_player_types:
-            if cls.__name__ == type_name:
-                player_class = cls
-                break
-
-        if player_class is None:
-            parser.error(f"Player type '{type_name}' is not available for game '{args.game}'.")
+        # Find the player class that matches the provided type name, only its module is imported
+        try:
+            player_class = registry.get_player_type(type_name)
+        except ValueError:
+            parser.error(f"Player type '{type_name}' is not available for game '{args.game}'. "
+                         f"Available types: {', '.join(registry.get_player_type_names())}.")
+        except ImportError as error:
+            parser.error(f"Player type '{type_name}' could not be imported: {error}")
 
         # Create a new player instance
         players.append(player_class(name))
 
     # Your logic to build the object with these arguments
     game_settings = {
-        'game': AVAILABLE_GAME_TYPES[args.game],
+        'game': registry.get_simulator_type(),
+        'game_options': game_options,
         'seat_permutation': args.seat_permutation,
         'num_iterations': args.num_iterations,
+        'workers': args.workers,
+        'seed': args.seed,
+        'stop_rule': stop_rule,
+        'replay_matchups': args.replay_matchups,
         'players': players
     }
 
-    run_simulation(game_settings)
+    # invalid board options are reported before any game is played
+    if game_options:
+        try:
+            create_simulator(game_settings, players).on_init_game()
+        except Exception as error:
+            parser.error(str(error))
+
+    if args.startup_time:
+        print(f"Startup time: {(time.perf_counter() - START_TIME) * 1000:.1f} ms")
+
+    if args.replay_game is not None:
+        replay_game(game_settings, args.replay_game)
+    elif args.tournament == 'racing':
+        run_racing(game_settings)
+    else:
+        run_simulation(game_settings)
 
 if __name__ == '__main__':
     main()
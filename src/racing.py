@@ -0,0 +1,114 @@
+import math
+
+from stop_rules import MatchupStatistics, StopRule
+
+
+class RacingScheduler:
+    """
+    schedules the games of a racing tournament (successive elimination).
+    Instead of playing the same number of games for every pair, games are played in batches and only on the pairs
+    of active players whose winner is still uncertain (according to the stop rule). After each batch, the players
+    whose score is confidently below the score of every other active player are eliminated, so the clearly worse
+    players stop consuming games early.
+    The score of a player is the sum of its mean score difference per iteration against each active opponent,
+    which gives the same ranking as the total scores used by the elimination tournament.
+    """
+
+    """
+    :param players: the players of the tournament
+    :param stop_rule: decides when the winner of a pair is settled (and bounds its number of games)
+    """
+    def __init__(self, players: list, stop_rule: StopRule):
+        self.__active_players = list(players)
+        self.__stop_rule = stop_rule
+        """
+        the statistics of each pair, keyed by the names of its players (in the order they were given)
+        """
+        self.__statistics = {}
+        for index, player1 in enumerate(players):
+            for player2 in players[index + 1:]:
+                self.__statistics[(player1.get_name(), player2.get_name())] = MatchupStatistics()
+
+    def get_active_players(self):
+        return self.__active_players
+
+    """
+    retrieves the pairs of active players that need more games
+    """
+    def get_pairs_to_play(self):
+        pairs = []
+        for index, player1 in enumerate(self.__active_players):
+            for player2 in self.__active_players[index + 1:]:
+                if not self.__stop_rule.should_stop(self.get_statistics(player1, player2)):
+                    pairs.append((player1, player2))
+        return pairs
+
+    def get_statistics(self, player1, player2):
+        return self.__statistics[(player1.get_name(), player2.get_name())]
+
+    """
+    adds the statistics of a batch of games
+    """
+    def add_statistics(self, player1, player2, statistics: MatchupStatistics):
+        self.get_statistics(player1, player2).merge(statistics)
+
+    def get_num_games(self):
+        return sum(statistics.get_num_games() for statistics in self.__statistics.values())
+
+    """
+    retrieves the estimated score of an active player and the half width of its confidence interval
+    """
+    def get_score(self, player):
+        score = 0
+        half_width = 0
+        for opponent in self.__active_players:
+            if opponent is player:
+                continue
+
+            if (player.get_name(), opponent.get_name()) in self.__statistics:
+                statistics = self.get_statistics(player, opponent)
+                sign = 1
+            else:
+                statistics = self.get_statistics(opponent, player)
+                sign = -1
+
+            score += sign * statistics.get_mean()
+            half_width += self.__get_half_width(statistics)
+        return score, half_width
+
+    """
+    eliminates the players that are confidently worse than all the other active players
+    :param force: if True and no player can be eliminated with confidence, the lowest scored player is eliminated
+    :return: the eliminated players, the best first
+    """
+    def eliminate(self, force: bool = False):
+        eliminated = []
+        while len(self.__active_players) > 1:
+            bounds = {player: self.get_score(player) for player in self.__active_players}
+            worst = min(self.__active_players, key=lambda player: bounds[player][0])
+            worst_upper = bounds[worst][0] + bounds[worst][1]
+
+            clearly_worst = all(bounds[player][0] - bounds[player][1] > worst_upper
+                                for player in self.__active_players if player is not worst)
+            if not clearly_worst and not (force and not eliminated):
+                break
+
+            # the scores of the others change once the player is gone, so they are recomputed before the next one
+            self.__active_players.remove(worst)
+            eliminated.insert(0, worst)
+        return eliminated
+
+    """
+    half width of the empirical Bernstein confidence interval of the mean score difference of a pair
+    (see BernsteinStopRule), infinite while the pair has no games
+    """
+    def __get_half_width(self, statistics: MatchupStatistics):
+        n = statistics.get_num_iterations()
+        if n == 0:
+            return math.inf
+
+        # the error probability is split between all pairs and all the checks of each pair
+        num_pairs = len(self.__statistics)
+        delta_n = (1 - self.__stop_rule.get_confidence()) / (num_pairs * n * (n + 1))
+        x = math.log(3 / delta_n)
+        return math.sqrt(2 * statistics.get_variance() * x / n) + 3 * self.__stop_rule.get_score_range() * x / n
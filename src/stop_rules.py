@@ -0,0 +1,215 @@
+import math
+from abc import ABC, abstractmethod
+
+from games.score_accumulator import ScoreAccumulator
+
+
+class MatchupStatistics:
+    """
+    running statistics of a matchup between two players, used by the stop rules.
+    Each sample is the score difference (player 1 - player 2) of an iteration, i.e. of the games played with every
+    seat permutation, which removes most of the advantage of the first seat
+    """
+
+    def __init__(self):
+        """
+        running totals of the score differences
+        """
+        self.__differences = ScoreAccumulator()
+        """
+        number of iterations won by each player (draws are not counted)
+        """
+        self.__wins = [0, 0]
+        """
+        number of games played
+        """
+        self.__num_games = 0
+
+    """
+    adds the result of an iteration
+    :param difference: the score difference of the iteration (player 1 - player 2)
+    :param num_games: the number of games of the iteration
+    """
+    def add(self, difference, num_games: int):
+        self.__differences.add(difference)
+        if difference > 0:
+            self.__wins[0] += 1
+        elif difference < 0:
+            self.__wins[1] += 1
+        self.__num_games += num_games
+
+    """
+    adds the statistics of another part of the same matchup (e.g. a shard played by a worker process)
+    """
+    def merge(self, other):
+        self.__differences.merge(other.__differences)
+        self.__wins[0] += other.__wins[0]
+        self.__wins[1] += other.__wins[1]
+        self.__num_games += other.__num_games
+
+    def get_num_iterations(self):
+        return self.__differences.get_count()
+
+    def get_num_games(self):
+        return self.__num_games
+
+    def get_mean(self):
+        return self.__differences.get_mean()
+
+    def get_variance(self):
+        return self.__differences.get_variance()
+
+    def get_wins(self):
+        return self.__wins
+
+
+class StopRule(ABC):
+    """
+    decides when a matchup can end because its winner is statistically settled
+    """
+
+    """
+    :param min_games: the matchup never stops before this number of games
+    :param max_games: the matchup always stops after this number of games
+    :param confidence: the confidence required to stop, in ]0, 1[
+    :param score_range: the width of the range of the score difference of an iteration, known in advance from the
+    results a game can have (see GameSimulator.get_result_range)
+    """
+    def __init__(self, min_games: int, max_games: int, confidence: float, score_range: float):
+        if not 0 < confidence < 1:
+            raise ValueError("The confidence must be between 0 and 1")
+        if min_games > max_games:
+            raise ValueError("The minimum number of games can't be higher than the maximum")
+        if score_range <= 0:
+            raise ValueError("The range of the score differences must be positive")
+
+        self.__min_games = min_games
+        self.__max_games = max_games
+        self.__confidence = confidence
+        self.__score_range = score_range
+
+    def get_min_games(self):
+        return self.__min_games
+
+    def get_max_games(self):
+        return self.__max_games
+
+    def get_confidence(self):
+        return self.__confidence
+
+    def get_score_range(self):
+        return self.__score_range
+
+    """
+    checks if the matchup should stop
+    :param statistics: the statistics of the matchup so far
+    """
+    def should_stop(self, statistics: MatchupStatistics) -> bool:
+        if statistics.get_num_games() < self.__min_games:
+            return False
+        if statistics.get_num_games() >= self.__max_games:
+            return True
+        return self.get_reached_confidence(statistics) >= self.__confidence
+
+    """
+    retrieves the confidence with which the leading player of the matchup is the better one
+    :param statistics: the statistics of the matchup so far
+    """
+    @abstractmethod
+    def get_reached_confidence(self, statistics: MatchupStatistics) -> float:
+        pass
+
+    """
+    the bounds are checked after every iteration, so the error probability is spread over all iterations:
+    the n-th check is done with delta / (n * (n + 1)), which sums up to delta
+    """
+    @staticmethod
+    def _to_confidence(delta_n: float, num_iterations: int) -> float:
+        return max(0.0, 1 - delta_n * num_iterations * (num_iterations + 1))
+
+
+class HoeffdingStopRule(StopRule):
+    """
+    stops when Hoeffding's bound excludes a zero mean score difference
+    """
+
+    def get_reached_confidence(self, statistics: MatchupStatistics) -> float:
+        n = statistics.get_num_iterations()
+        score_range = self.get_score_range()
+        if n == 0:
+            return 0.0
+
+        mean = statistics.get_mean()
+        delta_n = 2 * math.exp(-2 * n * mean * mean / (score_range * score_range))
+        return StopRule._to_confidence(delta_n, n)
+
+
+class BernsteinStopRule(StopRule):
+    """
+    stops when the empirical Bernstein bound (Audibert et al., 2009) excludes a zero mean score difference.
+    It takes the variance into account, so it stops much earlier than Hoeffding's bound for lopsided matchups
+    """
+
+    def get_reached_confidence(self, statistics: MatchupStatistics) -> float:
+        n = statistics.get_num_iterations()
+        score_range = self.get_score_range()
+        if n == 0:
+            return 0.0
+
+        # the bound is sqrt(2 var x / n) + 3 range x / n with x = ln(3 / delta_n)
+        # we solve bound = |mean| for y = sqrt(x), which is a quadratic equation
+        a = 3 * score_range / n
+        b = math.sqrt(2 * statistics.get_variance() / n)
+        c = -abs(statistics.get_mean())
+        y = (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+        delta_n = 3 * math.exp(-y * y)
+        return StopRule._to_confidence(delta_n, n)
+
+
+class SPRTStopRule(StopRule):
+    """
+    Wald's sequential probability ratio test on the iterations won by each player (draws are ignored).
+    It tests if player 1 wins an iteration with probability 0.5 + epsilon (H1) or 0.5 - epsilon (H0)
+    """
+
+    """
+    :param epsilon: the indifference zone around 0.5, matchups closer than that may end either way
+    """
+    def __init__(self, min_games: int, max_games: int, confidence: float, score_range: float,
+                 epsilon: float = 0.05):
+        super().__init__(min_games, max_games, confidence, score_range)
+        if not 0 < epsilon < 0.5:
+            raise ValueError("Epsilon must be between 0 and 0.5")
+        self.__epsilon = epsilon
+
+    def get_log_likelihood_ratio(self, statistics: MatchupStatistics) -> float:
+        wins, losses = statistics.get_wins()
+        p1 = 0.5 + self.__epsilon
+        p0 = 0.5 - self.__epsilon
+        return wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+
+    def should_stop(self, statistics: MatchupStatistics) -> bool:
+        if statistics.get_num_games() < self.get_min_games():
+            return False
+        if statistics.get_num_games() >= self.get_max_games():
+            return True
+
+        # with alpha = beta, Wald's thresholds are symmetric
+        alpha = 1 - self.get_confidence()
+        threshold = math.log((1 - alpha) / alpha)
+        return abs(self.get_log_likelihood_ratio(statistics)) >= threshold
+
+    def get_reached_confidence(self, statistics: MatchupStatistics) -> float:
+        # posterior probability of the accepted hypothesis, with equal priors
+        return 1 / (1 + math.exp(-abs(self.get_log_likelihood_ratio(statistics))))
+
+
+"""
+The available stop rules
+"""
+STOP_RULES = {
+    "hoeffding":    HoeffdingStopRule,
+    "bernstein":    BernsteinStopRule,
+    "sprt":         SPRTStopRule
+}